@@ -8,10 +8,12 @@ from typing import List, Optional
 from xetrade.models import Pair, OrderRequest, OrderStatus
 from xetrade.services.aggregator import best_across_venues
 from xetrade.services.price_impact import price_impact_pct, walk_book
+from xetrade.services.consolidated_book import fetch_consolidated_book, route_order
+from xetrade.services.nbbo import NBBOService
 from xetrade.services.trading import UnifiedTradingService
 from xetrade.services.position_monitor import PositionMonitorService
-from xetrade.services.historical_data import DataCaptureManager, LocalFileStorage, S3ParquetStorage
-from xetrade.utils.symbol_mapper import UniversalSymbolMapper
+from xetrade.services.historical_data import DataCaptureManager, LocalFileStorage, S3ParquetStorage, ArrowIPCStorage
+from xetrade.utils.symbol_mapper import get_symbol_mapper
 from xetrade.exchanges.base import make_exchanges, available_exchanges
 from xetrade.exchanges import binance  # noqa: F401  # ensure registry side-effect
 from xetrade.exchanges import mock  # noqa: F401  # ensure registry side-effect
@@ -19,14 +21,19 @@ from xetrade.exchanges import mock  # noqa: F401  # ensure registry side-effect
 # Global data capture manager
 data_capture_manager: Optional[DataCaptureManager] = None
 
-def get_data_capture_manager(storage_type: str = "local") -> DataCaptureManager:
+def get_data_capture_manager(storage_type: str = "local", keyframe_interval: Optional[int] = None) -> DataCaptureManager:
     """Get or create the global data capture manager."""
     global data_capture_manager
     if data_capture_manager is None:
         if storage_type == "s3":
-            storage = S3ParquetStorage(mock_mode=True)  # Mock mode for interview
+            if keyframe_interval:
+                storage = S3ParquetStorage(mock_mode=True, layout="nested", keyframe_interval=keyframe_interval)
+            else:
+                storage = S3ParquetStorage(mock_mode=True)  # Mock mode for interview
+        elif storage_type == "hot":
+            storage = ArrowIPCStorage("./data/hot")
         else:
-            storage = LocalFileStorage("./data")
+            storage = LocalFileStorage("./data", keyframe_interval=keyframe_interval)
         data_capture_manager = DataCaptureManager(storage)
     return data_capture_manager
 
@@ -57,6 +64,30 @@ async def cmd_best(args):
         return 1
     return 0
 
+async def cmd_nbbo(args):
+    """Poll venues and print the cross-venue NBBO every time it changes."""
+    pair = Pair.parse(args.pair)
+    exchanges = make_exchanges(args.venues.split(","))
+    service = NBBOService(pair, max_age_ms=args.max_age_ms)
+
+    def _print(nbbo):
+        print(json.dumps({
+            "pair": pair.human(),
+            "bid": {"venue": nbbo.bid_venue, "price": nbbo.bid},
+            "ask": {"venue": nbbo.ask_venue, "price": nbbo.ask},
+            "mid": nbbo.mid,
+            "venues_live": nbbo.venues_live,
+            "ts_ms": nbbo.ts_ms,
+        }), flush=True)
+
+    service.subscribe(_print)
+    service.start_polling(exchanges, interval=args.interval)
+    try:
+        await asyncio.sleep(args.duration)
+    finally:
+        await service.stop()
+    return 0
+
 async def cmd_l2(args):
     pair = Pair.parse(args.pair)
     [ex] = make_exchanges([args.venue])
@@ -88,6 +119,43 @@ async def cmd_impact(args):
         "price_impact_pct": impact,
     }, indent=2))
 
+def parse_fees(spec: Optional[str]) -> dict:
+    """'binance=0.001,okx=0.0008' -> {'binance': 0.001, 'okx': 0.0008}"""
+    fees = {}
+    if spec:
+        for item in spec.split(","):
+            venue, rate = item.split("=", 1)
+            fees[venue.strip().lower()] = float(rate)
+    return fees
+
+async def cmd_route(args):
+    pair = Pair.parse(args.pair)
+    exchanges = make_exchanges(args.venues.split(","))
+    book = await fetch_consolidated_book(exchanges, pair, depth=args.depth, taker_fees=parse_fees(args.fees))
+    fill = route_order(book, args.side, args.quote)
+    print(json.dumps({
+        "pair": pair.human(),
+        "side": args.side,
+        "quote_spend": args.quote,
+        "venues_in_book": list(book.venues),
+        "avg_execution_price": fill.avg_price,
+        "avg_execution_price_net": fill.avg_price_net,
+        "filled_base_qty": fill.filled_base,
+        "fees_quote": fill.fees_quote,
+        "mid": fill.mid,
+        "price_impact_pct": fill.price_impact_pct,
+        "by_venue": [
+            {
+                "venue": vf.venue,
+                "filled_base_qty": vf.filled_base,
+                "notional_quote": vf.notional_quote,
+                "fees_quote": vf.fees_quote,
+                "avg_price": vf.avg_price,
+            }
+            for vf in fill.by_venue
+        ],
+    }, indent=2))
+
 async def cmd_funding(args):
     pair = Pair.parse(args.pair)
     [ex] = make_exchanges([args.venue])
@@ -122,6 +190,58 @@ async def cmd_funding(args):
         return 1
     return 0
 
+async def cmd_funding_history(args):
+    """Funding history summary over a lookback, served from the local cache where possible."""
+    from dataclasses import asdict
+    from xetrade.services.funding import infer_interval_hours, summarize_history
+    from xetrade.services.funding_cache import FundingHistoryCache
+    pair = Pair.parse(args.pair)
+    [ex] = make_exchanges([args.venue])
+    if not ex.supports_funding:
+        print(json.dumps({"error": f"{ex.name} does not support funding rates", "venue": ex.name}, indent=2))
+        return 1
+    import time
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - int(args.days * 86400_000)
+    cache = FundingHistoryCache(args.cache_dir)
+    try:
+        series = await cache.get_history(ex, pair, start_ms, end_ms)
+    except Exception as e:
+        print(json.dumps({"error": str(e), "venue": ex.name, "pair": pair.human()}, indent=2))
+        return 1
+    interval = args.interval_hours or infer_interval_hours(series)
+    summary = summarize_history(series, interval)
+    print(json.dumps({
+        "venue": ex.name,
+        "pair": pair.human(),
+        "start_ms": start_ms,
+        "end_ms": end_ms,
+        "summary": asdict(summary),
+        "cache": cache.metrics(),
+    }, indent=2))
+    return 0
+
+async def cmd_funding_scan(args):
+    """Rank cross-venue funding spreads (long the low-APR venue, short the high one) over a pair universe."""
+    from xetrade.services.funding_scanner import FundingScanner
+    names = args.venues.split(",") if args.venues else available_exchanges()
+    exchanges = [ex for ex in make_exchanges(names) if ex.supports_funding]
+    symbols = args.pairs.split(",") if args.pairs else []
+    if args.pairs_file:
+        with open(args.pairs_file) as f:
+            symbols.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not symbols:
+        print(json.dumps({"error": "no pairs given (use --pairs or --pairs-file)"}, indent=2))
+        return 1
+    scanner = FundingScanner(
+        exchanges, [Pair.parse(s) for s in symbols],
+        taker_fees=parse_fees(args.fees), holding_days=args.holding_days,
+        use_predicted=args.predicted, min_net_apr=args.min_net_apr,
+    )
+    result = await scanner.scan()
+    print(json.dumps(result.to_dict(top=args.top), indent=2))
+    return 0
+
 async def cmd_place_order(args):
     """Place an order on a specific venue."""
     pair = Pair.parse(args.pair)
@@ -306,7 +426,7 @@ async def cmd_monitor(args):
 
 async def cmd_map_symbol(args):
     """Map exchange symbol to universal format."""
-    mapper = UniversalSymbolMapper()
+    mapper = get_symbol_mapper()
     
     try:
         mapping = mapper.map_symbol(args.symbol, args.exchange)
@@ -330,7 +450,7 @@ async def cmd_map_symbol(args):
 
 async def cmd_universal_to_exchange(args):
     """Convert universal symbol to exchange format."""
-    mapper = UniversalSymbolMapper()
+    mapper = get_symbol_mapper()
     
     try:
         exchange_symbol = mapper.get_exchange_symbol(args.symbol, args.exchange)
@@ -350,7 +470,7 @@ async def cmd_universal_to_exchange(args):
 
 async def cmd_validate_mapping(args):
     """Validate symbol mapping."""
-    mapper = UniversalSymbolMapper()
+    mapper = get_symbol_mapper()
     
     try:
         is_valid = mapper.validate_mapping(args.exchange_symbol, args.expected_universal, args.exchange)
@@ -371,9 +491,34 @@ async def cmd_validate_mapping(args):
         return 1
     return 0
 
+async def cmd_map_bulk(args):
+    """Map whole instrument lists (one symbol per line, per venue) and index them by universal symbol."""
+    import time
+    from xetrade.utils.symbol_mapper import map_instruments
+    instruments = {}
+    for item in args.lists.split(","):
+        venue, path = item.split("=", 1)
+        with open(path) as f:
+            instruments[venue.strip().lower()] = [line.strip() for line in f if line.strip()]
+    start = time.perf_counter()
+    table = map_instruments(instruments, processes=args.processes)
+    index = table.reverse_index(min_confidence=args.min_confidence)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    out = {
+        "instruments": len(table),
+        "universal_symbols": len(index),
+        "listed_on_all": sum(len(v) == len(instruments) for v in index.values()),
+        "unparsed": [sym for sym, ok in zip(table.exchange_symbol, table.parsed) if not ok][:20],
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
+    if args.universal:
+        out["matches"] = index.get(args.universal, {})
+    print(json.dumps(out, indent=2))
+    return 0
+
 async def cmd_demo_mapper(args):
     """Demonstrate symbol mapper with examples."""
-    mapper = UniversalSymbolMapper()
+    mapper = get_symbol_mapper()
     
     print(" Universal Symbol Mapper Demo")
     print("=" * 50)
@@ -434,7 +579,7 @@ async def cmd_demo_mapper(args):
 async def cmd_start_capture(args):
     """Start historical data capture for specified pairs."""
     storage_type = getattr(args, 'storage', 'local')
-    manager = get_data_capture_manager(storage_type)
+    manager = get_data_capture_manager(storage_type, getattr(args, 'keyframe_interval', None))
     exchanges = make_exchanges([args.venue])
     pairs = [Pair.parse(pair) for pair in args.pairs.split(",")]
     
@@ -505,6 +650,9 @@ async def cmd_capture_status(args):
                     "session_id": args.session_id,
                     "running": stats["running"],
                     "sequence_counters": stats["sequence_counters"],
+                    "ticks": stats["ticks"],
+                    "missed_deadlines": stats["missed_deadlines"],
+                    "skipped_ticks": stats["skipped_ticks"],
                 }, indent=2))
             else:
                 print(json.dumps({
@@ -527,6 +675,62 @@ async def cmd_capture_status(args):
         return 1
     return 0
 
+async def cmd_compact(args):
+    """Merge small Parquet files in each finished partition of a captured dataset."""
+    from xetrade.utils.parquet import compact_dataset
+    older_than_ms = None
+    if args.older_than_hours is not None:
+        import time
+        older_than_ms = int((time.time() - args.older_than_hours * 3600) * 1000)
+    summary = await asyncio.to_thread(
+        compact_dataset, args.root, min_files=args.min_files, older_than_ms=older_than_ms,
+        row_group_size=args.row_group_size,
+    )
+    print(json.dumps({"root": args.root, **summary}, indent=2))
+    return 0
+
+async def cmd_replay(args):
+    """Replay captured books in timestamp order, printing top of book per snapshot."""
+    from xetrade.services.replay import OrderBookReplay
+    replay = OrderBookReplay(
+        args.path,
+        exchanges=args.venues.split(",") if args.venues else None,
+        pairs=args.pairs.split(",") if args.pairs else None,
+        start_ms=args.start_ms,
+        end_ms=args.end_ms,
+    )
+    count = 0
+    async for ev in replay.replay(speed=args.speed):
+        print(json.dumps({
+            "ts_ms": ev.ts_ms,
+            "venue": ev.exchange,
+            "pair": ev.pair,
+            "best_bid": ev.book.best_bid(),
+            "best_ask": ev.book.best_ask(),
+            "depth": list(ev.book.depth),
+        }), flush=True)
+        count += 1
+        if args.limit and count >= args.limit:
+            break
+    return 0
+
+async def cmd_query(args):
+    """Top-N levels for one venue/pair from the Parquet dataset, optionally resampled."""
+    from xetrade.services.history_query import HistoryQuery
+    q = HistoryQuery(args.root)
+    if args.every_ms:
+        table = await asyncio.to_thread(q.resample, args.venue, args.pair, args.start_ms, args.end_ms,
+                                        every_ms=args.every_ms, n=args.levels, side=args.side)
+    else:
+        table = await asyncio.to_thread(q.top_levels, args.venue, args.pair, args.start_ms, args.end_ms,
+                                        n=args.levels, side=args.side)
+    rows = table.to_pylist()
+    if args.limit:
+        rows = rows[:args.limit]
+    for row in rows:
+        print(json.dumps(row), flush=True)
+    return 0
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="xetrade", description="Simple crypto market CLI")
     sub = p.add_subparsers(dest="cmd", required=True)
@@ -537,6 +741,15 @@ def build_parser() -> argparse.ArgumentParser:
     p_best.add_argument("--venues", default="binance", help=f"comma list. known: {', '.join(available_exchanges()) or 'binance'}")
     p_best.set_defaults(func=cmd_best)
 
+    # live NBBO across venues
+    p_nbbo = sub.add_parser("nbbo", help="Live cross-venue NBBO; prints a line whenever it moves")
+    p_nbbo.add_argument("--pair", required=True, help="e.g., BTC-USDT")
+    p_nbbo.add_argument("--venues", required=True, help="comma list, e.g., binance,okx,kucoin")
+    p_nbbo.add_argument("--interval", type=float, default=1.0, help="Per-venue poll interval in seconds")
+    p_nbbo.add_argument("--duration", type=float, default=60.0, help="Seconds to run")
+    p_nbbo.add_argument("--max-age-ms", type=int, default=5000, help="Drop a venue after this long without a quote")
+    p_nbbo.set_defaults(func=cmd_nbbo)
+
     # l2 book
     p_l2 = sub.add_parser("l2", help="Level-2 order book on a venue")
     p_l2.add_argument("--venue", required=True, help="e.g., binance")
@@ -553,12 +766,41 @@ def build_parser() -> argparse.ArgumentParser:
     p_imp.add_argument("--depth", type=int, default=200)
     p_imp.set_defaults(func=cmd_impact)
 
+    # routed impact across venues
+    p_route = sub.add_parser("route", help="Simulate a market order routed across a consolidated multi-venue book")
+    p_route.add_argument("--venues", required=True, help="comma list, e.g., binance,okx,kucoin")
+    p_route.add_argument("--pair", required=True)
+    p_route.add_argument("--side", choices=("buy", "sell"), required=True)
+    p_route.add_argument("--quote", type=float, required=True, help="Order size in quote currency, e.g., 50000")
+    p_route.add_argument("--depth", type=int, default=200)
+    p_route.add_argument("--fees", help="Per-venue taker fees, e.g., binance=0.001,okx=0.0008")
+    p_route.set_defaults(func=cmd_route)
+
     # funding
     p_fun = sub.add_parser("funding", help="Current & predicted funding on a venue")
     p_fun.add_argument("--venue", required=True)
     p_fun.add_argument("--pair", required=True)
     p_fun.set_defaults(func=cmd_funding)
 
+    p_funh = sub.add_parser("funding-history", help="Funding history summary (APR/APY) from a local cache")
+    p_funh.add_argument("--venue", required=True)
+    p_funh.add_argument("--pair", required=True)
+    p_funh.add_argument("--days", type=float, default=30.0, help="Lookback in days (default: 30)")
+    p_funh.add_argument("--interval-hours", type=float, help="Funding interval (default: inferred from the data)")
+    p_funh.add_argument("--cache-dir", default="./data/funding_cache", help="Cache directory (default: ./data/funding_cache)")
+    p_funh.set_defaults(func=cmd_funding_history)
+
+    p_funs = sub.add_parser("funding-scan", help="Rank cross-venue funding-rate spreads net of fees")
+    p_funs.add_argument("--venues", help="Comma-separated venues (default: every funding-capable venue)")
+    p_funs.add_argument("--pairs", help="Comma-separated pairs, e.g., BTC-USDT,ETH-USDT")
+    p_funs.add_argument("--pairs-file", help="File with one pair per line")
+    p_funs.add_argument("--fees", help="Per-venue taker fees, e.g., binance=0.0005,okx=0.0005")
+    p_funs.add_argument("--holding-days", type=float, default=7.0, help="Holding period fees are spread over (default: 7)")
+    p_funs.add_argument("--predicted", action="store_true", help="Rank on predicted next rates instead of current ones")
+    p_funs.add_argument("--min-net-apr", type=float, help="Drop opportunities below this net APR (e.g., 0.05)")
+    p_funs.add_argument("--top", type=int, default=20)
+    p_funs.set_defaults(func=cmd_funding_scan)
+
     # trading commands
     p_place = sub.add_parser("place", help="Place an order")
     p_place.add_argument("--venue", required=True, help="e.g., okx")
@@ -613,6 +855,13 @@ def build_parser() -> argparse.ArgumentParser:
     p_validate.add_argument("--exchange", required=True, help="Exchange name")
     p_validate.set_defaults(func=cmd_validate_mapping)
 
+    p_mapb = sub.add_parser("map-bulk", help="Map full instrument lists and index them by universal symbol")
+    p_mapb.add_argument("--lists", required=True, help="venue=file pairs, one symbol per line, e.g., binance=binance.txt,okx=okx.txt")
+    p_mapb.add_argument("--universal", help="Show the per-venue symbols for this universal symbol (e.g., BTC/USD)")
+    p_mapb.add_argument("--min-confidence", type=float, default=0.0)
+    p_mapb.add_argument("--processes", type=int, help="Worker processes for very large lists (default: CPU count)")
+    p_mapb.set_defaults(func=cmd_map_bulk)
+
     p_demo = sub.add_parser("demo-mapper", help="Demonstrate symbol mapper with examples")
     p_demo.set_defaults(func=cmd_demo_mapper)
 
@@ -622,7 +871,8 @@ def build_parser() -> argparse.ArgumentParser:
     p_start_capture.add_argument("--pairs", required=True, help="e.g., BTC-USDT,ETH-USDT")
     p_start_capture.add_argument("--interval", type=float, default=1.0, help="Capture interval in seconds")
     p_start_capture.add_argument("--duration", type=int, help="Maximum duration in minutes (optional)")
-    p_start_capture.add_argument("--storage", choices=["local", "s3"], default="local", help="Storage backend (default: local)")
+    p_start_capture.add_argument("--storage", choices=["local", "s3", "hot"], default="local", help="Storage backend; hot = rolling Arrow IPC files (default: local)")
+    p_start_capture.add_argument("--keyframe-interval", type=int, help="Store a full book every N snapshots and level diffs in between")
     p_start_capture.set_defaults(func=cmd_start_capture)
 
     p_stop_capture = sub.add_parser("stop-capture", help="Stop historical data capture")
@@ -633,6 +883,35 @@ def build_parser() -> argparse.ArgumentParser:
     p_capture_status.add_argument("--session-id", help="Specific session ID to check (optional)")
     p_capture_status.set_defaults(func=cmd_capture_status)
 
+    p_replay = sub.add_parser("replay", help="Replay captured order books (JSONL or Parquet) in timestamp order")
+    p_replay.add_argument("--path", required=True, help="Capture file or directory, e.g., ./data or ./data/s3_mock")
+    p_replay.add_argument("--venues", help="comma list to include (default: all)")
+    p_replay.add_argument("--pairs", help="comma list to include, e.g., BTC-USDT (default: all)")
+    p_replay.add_argument("--start-ms", type=int, help="Only snapshots at or after this timestamp")
+    p_replay.add_argument("--end-ms", type=int, help="Only snapshots at or before this timestamp")
+    p_replay.add_argument("--speed", type=float, help="Replay speed multiplier (default: as fast as possible)")
+    p_replay.add_argument("--limit", type=int, help="Stop after this many snapshots")
+    p_replay.set_defaults(func=cmd_replay)
+
+    p_query = sub.add_parser("query", help="Top-N levels from the Parquet dataset (filters pushed into the scan)")
+    p_query.add_argument("--root", default="./data/s3_mock", help="Dataset root (default: ./data/s3_mock)")
+    p_query.add_argument("--venue", required=True, help="e.g., okx")
+    p_query.add_argument("--pair", required=True, help="e.g., BTC-USDT")
+    p_query.add_argument("--start-ms", type=int, help="Only snapshots at or after this timestamp")
+    p_query.add_argument("--end-ms", type=int, help="Only snapshots at or before this timestamp")
+    p_query.add_argument("--levels", type=int, default=5, help="Levels per side (default: 5)")
+    p_query.add_argument("--side", choices=["bid", "ask"], help="Only one side (default: both)")
+    p_query.add_argument("--every-ms", type=int, help="Keep the last book per bucket, e.g., 1000 or 60000")
+    p_query.add_argument("--limit", type=int, help="Print at most this many rows")
+    p_query.set_defaults(func=cmd_query)
+
+    p_compact = sub.add_parser("compact", help="Compact small Parquet files in a partitioned capture dataset")
+    p_compact.add_argument("--root", default="./data/s3_mock", help="Dataset root (exchange=/pair=/date=/hour= below it)")
+    p_compact.add_argument("--min-files", type=int, default=2, help="Only compact partitions with at least this many files")
+    p_compact.add_argument("--older-than-hours", type=float, help="Only partitions older than this (default: all but the current hour)")
+    p_compact.add_argument("--row-group-size", type=int, default=1024 * 1024, help="Rows per row group in compacted files")
+    p_compact.set_defaults(func=cmd_compact)
+
     return p
 
 # cli.py (replace main() with this version)
@@ -1,13 +1,18 @@
 # src/exchanges/base.py
 from __future__ import annotations
+import asyncio
+import logging
 from abc import ABC, abstractmethod
-from typing import Iterable, List, Tuple, Dict, Type
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple, Dict, Type
 from xetrade.models import (
-    Pair, Quote, OrderBook, FundingSnapshot, FundingSeries,
+    Pair, Quote, OrderBook, ColumnarOrderBook, BookDelta, FundingSnapshot, FundingSeries, FundingPoint,
     OrderRequest, OrderResponse, OrderStatusResponse, CancelResponse,
     Position, PositionPnL
 )
-from xetrade.utils.symbol_mapper import UniversalSymbolMapper
+from xetrade.utils.decode import json_loads
+from xetrade.utils.symbol_mapper import get_symbol_mapper
+
+logger = logging.getLogger(__name__)
 
 # Common errors
 class ExchangeError(Exception): ...
@@ -31,6 +36,18 @@ class BaseExchange(ABC):
     supports_funding: bool = False
     supports_l2_orderbook: bool = True
     supports_trading: bool = False  # Order placement, cancellation, status
+    supports_streaming: bool = False  # WebSocket diff-depth book (see ws_* hooks)
+
+    # WebSocket protocol settings, used by services.streaming.OrderBookStream
+    ws_url: str = ""
+    ws_snapshot_via_rest: bool = False  # True: snapshot comes from ws_book_snapshot, not the socket
+    ws_heartbeat: float | None = 20.0   # protocol-level ping interval (aiohttp)
+    ws_ping_interval: float = 20.0      # app-level ping interval, if ws_ping_message() is set
+
+    # Funding history pagination, used by _paginate_funding
+    funding_interval_hours: float = 8.0
+    funding_page_limit: int = 100       # max points the history endpoint returns per request
+    funding_fetch_concurrency: int = 8  # windows in flight; the HTTP rate limiter still applies
 
     def __init__(self, *, api_key: str | None = None, api_secret: str | None = None, timeout: float = 10.0):
         self.api_key = api_key
@@ -48,6 +65,60 @@ class BaseExchange(ABC):
         """Return L2 book with bids desc and asks asc."""
         raise NotImplementedError
 
+    async def get_l2_columnar(self, pair: Pair, depth: int = 100) -> ColumnarOrderBook:
+        """
+        Same book as get_l2_orderbook, as float64 arrays.
+        Default converts; adapters that parse levels into arrays override this
+        and skip the Level objects entirely.
+        """
+        return ColumnarOrderBook.from_orderbook(await self.get_l2_orderbook(pair, depth))
+
+    # --- Streaming (WebSocket) ---
+    async def stream_l2_orderbook(self, pair: Pair, depth: int = 100, **kwargs) -> AsyncIterator[ColumnarOrderBook]:
+        """
+        Locally maintained L2 book, yielded after every venue update.
+        kwargs are passed to OrderBookStream (ws_url, snapshot, record_path, ...).
+        """
+        if not self.supports_streaming:
+            raise ExchangeError(f"{self.name} does not support book streaming")
+        from xetrade.services.streaming import OrderBookStream
+        async for book in OrderBookStream(self, pair, depth, **kwargs):
+            yield book
+
+    async def ws_endpoint(self) -> str:
+        """WebSocket URL to connect to (override when it needs a token)."""
+        return self.ws_url
+
+    def ws_subscribe_messages(self, pair: Pair, depth: int) -> List[Any]:
+        """Frames to send after connecting (dicts are JSON-encoded)."""
+        raise NotImplementedError
+
+    def ws_ping_message(self) -> Any:
+        """Application-level keepalive frame, or None if the venue doesn't need one."""
+        return None
+
+    def ws_decode(self, raw: Any) -> Any:
+        """Decode a raw text/binary frame; non-JSON frames (e.g. 'pong') are returned as-is."""
+        try:
+            return json_loads(raw)
+        except ValueError:
+            return raw
+
+    def ws_parse_book(self, msg: Any) -> BookDelta | None:
+        """Normalize a decoded book message; None for acks, pongs and other channels."""
+        raise NotImplementedError
+
+    async def ws_book_snapshot(self, pair: Pair, depth: int) -> BookDelta:
+        """REST snapshot carrying the venue sequence id (only if ws_snapshot_via_rest)."""
+        raise NotImplementedError
+
+    def ws_checksum(self, book: Any) -> int | None:
+        """
+        Checksum of a streaming LocalOrderBook in the venue's format, compared
+        with BookDelta.checksum after each message; None if the venue has none.
+        """
+        return None
+
     # --- Funding (perps) ---
     async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
         """Current and predicted next funding for the perp."""
@@ -55,12 +126,99 @@ class BaseExchange(ABC):
             raise FundingNotSupported(f"{self.name} does not support funding")
         raise FundingNotSupported(f"{self.name} does not support funding")
 
+    async def get_funding_snapshots(self, pairs: Iterable[Pair]) -> Dict[Pair, FundingSnapshot]:
+        """
+        get_funding_live_predicted for many perps, keyed by the requested
+        Pair. Pairs the venue doesn't list (or that fail) are left out.
+        Uses the venue's all-markets endpoint (_fetch_funding_bulk) when it
+        has one, so a whole universe costs a request or two; otherwise, or
+        if that request fails, one request per pair, funding_fetch_concurrency
+        at a time.
+        """
+        pairs = list(dict.fromkeys(pairs))
+        try:
+            found = await self._fetch_funding_bulk(pairs)
+        except Exception as e:
+            logger.warning(f"{self.name}: bulk funding request failed ({e}), falling back to per-pair requests")
+            found = None
+        if found is not None:
+            return found
+        return await self._funding_snapshots_per_pair(pairs)
+
+    async def _fetch_funding_bulk(self, pairs: List[Pair]) -> Optional[Dict[Pair, FundingSnapshot]]:
+        """Snapshots for pairs from one all-markets request; None if the venue has no such endpoint."""
+        return None
+
+    async def _funding_snapshots_per_pair(self, pairs: Iterable[Pair]) -> Dict[Pair, FundingSnapshot]:
+        slots = asyncio.Semaphore(self.funding_fetch_concurrency)
+        out: Dict[Pair, FundingSnapshot] = {}
+
+        async def _one(pair: Pair) -> None:
+            async with slots:
+                try:
+                    out[pair] = await self.get_funding_live_predicted(pair)
+                except FundingNotSupported:
+                    raise
+                except Exception as e:
+                    logger.debug(f"{self.name} {pair.human()}: no funding snapshot ({e})")
+
+        await asyncio.gather(*(_one(p) for p in pairs))
+        return out
+
     async def get_funding_history(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         """Historical funding points in [start_ms, end_ms]."""
         if not self.supports_funding:
             raise FundingNotSupported(f"{self.name} does not support funding")
         raise FundingNotSupported(f"{self.name} does not support funding")
 
+    async def _fetch_funding_page(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
+        """One history request for [start_ms, end_ms]: up to funding_page_limit points, in any order."""
+        raise NotImplementedError
+
+    async def _paginate_funding(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
+        """
+        Funding history for a long range via _fetch_funding_page. The range
+        is cut into windows that should each fit in one page at the venue's
+        funding interval, and the windows are fetched concurrently (at most
+        funding_fetch_concurrency at once, under the pool's rate limit). A
+        window that comes back full may have been truncated at either end, so
+        the parts outside the returned span are fetched again. Points are
+        de-duplicated by ts_ms and returned in ascending order.
+        """
+        if end_ms < start_ms:
+            return []
+        interval_ms = max(1, int(self.funding_interval_hours * 3600_000))
+        # 10% headroom: funding times drift and some venues settle early on volatile days
+        span = max(1, int(self.funding_page_limit * 0.9)) * interval_ms
+        slots = asyncio.Semaphore(self.funding_fetch_concurrency)
+        points: Dict[int, float] = {}
+
+        async def _all(coros) -> None:
+            # if one window fails, stop the rest instead of letting them spend rate limit
+            tasks = [asyncio.create_task(c) for c in coros]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+        async def _window(a: int, b: int) -> None:
+            async with slots:
+                page = await self._fetch_funding_page(pair, a, b)
+            inside = [p for p in page if a <= p.ts_ms <= b]
+            for p in inside:
+                points[p.ts_ms] = p.rate
+            if len(page) >= self.funding_page_limit and inside:
+                lo = min(p.ts_ms for p in inside)
+                hi = max(p.ts_ms for p in inside)
+                rest = [(x, y) for x, y in ((a, lo - 1), (hi + 1, b)) if x <= y]
+                await _all(_window(x, y) for x, y in rest)
+
+        await _all(_window(a, min(a + span - 1, end_ms)) for a in range(start_ms, end_ms + 1, span))
+        return [FundingPoint(ts_ms=ts, rate=rate) for ts, rate in sorted(points.items())]
+
     # --- Trading (Order Management) ---
     async def place_order(self, request: OrderRequest) -> OrderResponse:
         """Place a new order (LIMIT or MARKET)."""
@@ -112,14 +270,14 @@ class BaseExchange(ABC):
         """
         Convert exchange-specific symbol to universal format.
         """
-        mapper = UniversalSymbolMapper()
+        mapper = get_symbol_mapper()
         return mapper.normalize_symbol(exchange_symbol, self.name)
     
     def get_exchange_symbol(self, universal_symbol: str) -> str:
         """
         Convert universal symbol to exchange-specific format.
         """
-        mapper = UniversalSymbolMapper()
+        mapper = get_symbol_mapper()
         return mapper.get_exchange_symbol(universal_symbol, self.name)
 
 # -------- Registry for easy wiring (used by CLI/services) --------
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import time
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional
 
 from xetrade.exchanges.base import (
     BaseExchange,
@@ -10,8 +10,9 @@ from xetrade.exchanges.base import (
     FundingNotSupported,
     normalize_pair,
 )
-from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries, Level
-from xetrade.models import to_levels, sort_l2
+from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries
+from xetrade.models import ColumnarOrderBook, BookDelta, to_levels, sort_l2
+from xetrade.utils.decode import parse_levels, float_pairs
 from xetrade.utils.http import get_json
 
 SPOT_BASE = "https://api.binance.com"
@@ -23,14 +24,25 @@ class Binance(BaseExchange):
     Binance adapter:
       - Best bid/ask: /api/v3/ticker/bookTicker
       - L2 order book: /api/v3/depth
-      - Funding (perps): /fapi/v1/premiumIndex (snapshot-ish), /fapi/v1/fundingRate (history)
+      - Funding (perps): /fapi/v1/premiumIndex (snapshot-ish), /fapi/v1/fundingRate (history),
+        /fapi/v1/fundingInfo (symbols with a non-default interval)
     Notes:
-      * Funding interval on Binance perps is typically 8 hours.
-      * Binance spot endpoints don’t return a timestamp with bookTicker; we stamp locally.
+      * Funding interval on Binance perps is typically 8 hours; many alts settle every 4h or 1h.
+      * Binance spot endpoints don’t return a timestamp with bookTicker or depth; we stamp locally.
     """
     name = "binance"
     funding_interval_hours = 8.0
+    funding_page_limit = 1000  # /fapi/v1/fundingRate max
     supports_funding = True
+    supports_streaming = True
+    ws_url = "wss://stream.binance.com:9443/ws"
+    ws_snapshot_via_rest = True
+    funding_info_ttl_s = 3600.0  # intervals change rarely; refresh /fapi/v1/fundingInfo hourly
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._intervals: Dict[str, float] = {}
+        self._intervals_at: Optional[float] = None
 
     # ---- symbol formatting ----
     def format_symbol(self, pair: Pair) -> str:
@@ -42,34 +54,71 @@ class Binance(BaseExchange):
     async def get_best_bid_ask(self, pair: Pair) -> Quote:
         sym = self.format_symbol(pair)
         url = f"{SPOT_BASE}/api/v3/ticker/bookTicker"
-        data = await get_json(url, params={"symbol": sym})
+        data = await get_json(url, params={"symbol": sym}, pool=self.name)
         # data: {'symbol': 'BTCUSDT','bidPrice':'...','bidQty':'...','askPrice':'...','askQty':'...'}
         ts_ms = int(time.time() * 1000)
         return Quote(bid=float(data["bidPrice"]), ask=float(data["askPrice"]), ts_ms=ts_ms)
 
     async def get_l2_orderbook(self, pair: Pair, depth: int = 100) -> OrderBook:
+        book = await self.get_l2_columnar(pair, depth)
+        return book.to_orderbook()
+
+    async def get_l2_columnar(self, pair: Pair, depth: int = 100) -> ColumnarOrderBook:
         sym = self.format_symbol(pair)
         # Binance spot supports depth limits: 5,10,20,50,100,500,1000,5000
         limit = max(5, min(depth, 1000))
         url = f"{SPOT_BASE}/api/v3/depth"
-        data = await get_json(url, params={"symbol": sym, "limit": limit})
+        data = await get_json(url, params={"symbol": sym, "limit": limit}, pool=self.name)
         # bids/asks are lists of ["price","qty"]
-        bids_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q in data.get("bids", [])]
-        asks_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q in data.get("asks", [])]
-        bids = [Level(price=p, qty=q) for p, q in bids_raw]
-        asks = [Level(price=p, qty=q) for p, q in asks_raw]
-        ob = OrderBook(bids=bids, asks=asks, ts_ms=data.get("lastUpdateId", int(time.time() * 1000)))
+        bid_px, bid_qty = parse_levels(data.get("bids", []))
+        ask_px, ask_qty = parse_levels(data.get("asks", []))
+        # /api/v3/depth has no timestamp (lastUpdateId is a sequence id, not a time); stamp locally
+        ts_ms = int(time.time() * 1000)
+        ob = ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts_ms)
         return sort_l2(ob)
 
+    # ---- streaming (diff depth) ----
+    # Sync per Binance docs: buffer <sym>@depth@100ms events, fetch a REST
+    # snapshot, drop events with u <= lastUpdateId, then require U == prev u + 1.
+    def ws_subscribe_messages(self, pair: Pair, depth: int) -> List[Any]:
+        stream = f"{self.format_symbol(pair).lower()}@depth@100ms"
+        return [{"method": "SUBSCRIBE", "params": [stream], "id": 1}]
+
+    def ws_parse_book(self, msg: Any) -> Optional[BookDelta]:
+        if not isinstance(msg, dict) or msg.get("e") != "depthUpdate":
+            return None
+        return BookDelta(
+            bids=float_pairs(msg.get("b", [])),
+            asks=float_pairs(msg.get("a", [])),
+            ts_ms=int(msg.get("E", time.time() * 1000)),
+            first_seq=int(msg["U"]),
+            last_seq=int(msg["u"]),
+        )
+
+    async def ws_book_snapshot(self, pair: Pair, depth: int) -> BookDelta:
+        url = f"{SPOT_BASE}/api/v3/depth"
+        # always the deepest cheap snapshot, so diffs outside `depth` still land on known levels
+        data = await get_json(url, params={"symbol": self.format_symbol(pair), "limit": 1000},
+                              pool=self.name, coalesce=False)
+        return BookDelta(
+            bids=float_pairs(data.get("bids", [])),
+            asks=float_pairs(data.get("asks", [])),
+            ts_ms=int(time.time() * 1000),
+            is_snapshot=True,
+            last_seq=int(data["lastUpdateId"]),
+        )
+
     # ---- funding (perps) ----
-    async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
-        """
-        Binance publishes the most recent funding rate and next funding time on /fapi/v1/premiumIndex.
-        Some SDKs expose a “predicted” value; if not present, we echo current as a conservative placeholder.
-        """
-        sym = self.format_symbol(pair)
-        url = f"{FUTURES_BASE}/fapi/v1/premiumIndex"
-        data = await get_json(url, params={"symbol": sym})
+    async def _funding_intervals(self) -> Dict[str, float]:
+        """Symbol -> fundingIntervalHours for the symbols that don't use the default 8h."""
+        if self._intervals_at is None or time.monotonic() - self._intervals_at > self.funding_info_ttl_s:
+            data = await get_json(f"{FUTURES_BASE}/fapi/v1/fundingInfo", pool=self.name)
+            self._intervals = {row["symbol"]: float(row["fundingIntervalHours"])
+                               for row in data if row.get("fundingIntervalHours")}
+            self._intervals_at = time.monotonic()
+        return self._intervals
+
+    def _parse_premium_index(self, data: Dict[str, Any], intervals: Dict[str, float]) -> FundingSnapshot:
         # Typical fields: lastFundingRate, nextFundingTime, time
         cur = float(data.get("lastFundingRate", 0.0))
         # If Binance exposes a predicted field in your environment, prefer it; otherwise reuse current.
@@ -78,46 +127,47 @@ class Binance(BaseExchange):
         return FundingSnapshot(
             current_rate=cur,
             predicted_next_rate=predicted,
-            interval_hours=self.funding_interval_hours,
+            interval_hours=intervals.get(data.get("symbol"), self.funding_interval_hours),
             ts_ms=ts_ms,
         )
 
+    async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
+        """
+        Binance publishes the most recent funding rate and next funding time on /fapi/v1/premiumIndex.
+        Some SDKs expose a “predicted” value; if not present, we echo current as a conservative placeholder.
+        """
+        sym = self.format_symbol(pair)
+        url = f"{FUTURES_BASE}/fapi/v1/premiumIndex"
+        data = await get_json(url, params={"symbol": sym}, pool=self.name)
+        return self._parse_premium_index(data, await self._funding_intervals())
+
+    async def _fetch_funding_bulk(self, pairs: List[Pair]) -> Dict[Pair, FundingSnapshot]:
+        """premiumIndex without a symbol returns every perp (weight 10)."""
+        wanted = {self.format_symbol(p): p for p in pairs}
+        data = await get_json(f"{FUTURES_BASE}/fapi/v1/premiumIndex", pool=self.name)
+        intervals = await self._funding_intervals()
+        return {wanted[row["symbol"]]: self._parse_premium_index(row, intervals)
+                for row in data if row.get("symbol") in wanted}
+
     async def get_funding_history(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         """
         Historical funding rates for the perpetual swap.
-        Includes pagination to handle large date ranges.
+        Long ranges are split into windows fetched concurrently (see BaseExchange._paginate_funding).
         """
+        return await self._paginate_funding(pair, start_ms, end_ms)
+
+    async def _fetch_funding_page(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         sym = self.format_symbol(pair)
         url = f"{FUTURES_BASE}/fapi/v1/fundingRate"
+        params = {
+            "symbol": sym,
+            "startTime": start_ms,
+            "endTime": end_ms,
+            "limit": self.funding_page_limit,
+        }
+        data = await get_json(url, params=params, pool=self.name)
         out: FundingSeries = []
-        
-        # Pagination loop
-        current_start = start_ms
-        while current_start < end_ms:
-            params = {
-                "symbol": sym, 
-                "startTime": current_start, 
-                "endTime": end_ms, 
-                "limit": 1000  # Binance max limit
-            }
-            data = await get_json(url, params=params)
-            
-            if not data:  # No more data
-                break
-                
-        for row in data:
+        for row in data or []:
             # row: {'symbol':'BTCUSDT','fundingRate':'0.0001','fundingTime': 1700000000000, ...}
-            rate = float(row.get("fundingRate", 0.0))
-            ts = int(row.get("fundingTime"))
-            out.append(FundingPoint(ts_ms=ts, rate=rate))
-            
-            # Update start time for next page
-            if data:
-                last_ts = int(data[-1].get("fundingTime", current_start))
-                if last_ts <= current_start:  # No progress, avoid infinite loop
-                    break
-                current_start = last_ts + 1
-            else:
-                break
-                
+            out.append(FundingPoint(ts_ms=int(row.get("fundingTime")), rate=float(row.get("fundingRate", 0.0))))
         return out
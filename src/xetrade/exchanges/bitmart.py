@@ -2,15 +2,17 @@
 from __future__ import annotations
 
 import time
-from typing import List, Tuple
+import zlib
+from typing import Any, List, Optional
 
 from xetrade.exchanges.base import (
     BaseExchange,
     register_exchange,
     normalize_pair,
 )
-from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries, Level
-from xetrade.models import to_levels, sort_l2
+from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries
+from xetrade.models import ColumnarOrderBook, BookDelta, to_levels, sort_l2
+from xetrade.utils.decode import parse_levels, float_pairs
 from xetrade.utils.http import get_json
 
 BASE_URL = "https://api-cloud.bitmart.com"
@@ -29,6 +31,8 @@ class Bitmart(BaseExchange):
     name = "bitmart"
     funding_interval_hours = 8.0
     supports_funding = False  # Spot only
+    supports_streaming = True
+    ws_url = "wss://ws-manager-compress.bitmart.com/api?protocol=1.1"
 
     # ---- symbol formatting ----
     def format_symbol(self, pair: Pair) -> str:
@@ -40,7 +44,7 @@ class Bitmart(BaseExchange):
     async def get_best_bid_ask(self, pair: Pair) -> Quote:
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/spot/v1/ticker"
-        data = await get_json(url, params={"symbol": sym})
+        data = await get_json(url, params={"symbol": sym}, pool=self.name)
         # data: {"message":"OK","code":1000,"trace":"...","data":{"symbol":"BTC_USDT","last_price":"50000","quote_volume_24h":"1000000","base_volume_24h":"20","high_24h":"51000","low_24h":"49000","open_24h":"49500","close_24h":"50000","best_ask":"50001","best_ask_size":"0.1","best_bid":"49999","best_bid_size":"0.1","fluctuation":"0.01","url":"..."}}
         if data.get("code") != 1000:
             raise RuntimeError(f"Bitmart API error: {data.get('message', 'Unknown error')}")
@@ -54,27 +58,60 @@ class Bitmart(BaseExchange):
         )
 
     async def get_l2_orderbook(self, pair: Pair, depth: int = 100) -> OrderBook:
+        book = await self.get_l2_columnar(pair, depth)
+        return book.to_orderbook()
+
+    async def get_l2_columnar(self, pair: Pair, depth: int = 100) -> ColumnarOrderBook:
         sym = self.format_symbol(pair)
         # Bitmart supports depth limits: 5,15,50,100,200,500
         limit = max(5, min(depth, 500))
         url = f"{BASE_URL}/spot/v1/symbols/book"
-        data = await get_json(url, params={"symbol": sym, "precision": 8, "size": limit})
+        data = await get_json(url, params={"symbol": sym, "precision": 8, "size": limit}, pool=self.name)
         
         if data.get("code") != 1000:
             raise RuntimeError(f"Bitmart API error: {data.get('message', 'Unknown error')}")
         
         book_data = data["data"]
         # bids/asks are lists of ["price","qty"]
-        bids_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q in book_data.get("bids", [])]
-        asks_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q in book_data.get("asks", [])]
-        
-        bids = [Level(price=p, qty=q) for p, q in bids_raw]
-        asks = [Level(price=p, qty=q) for p, q in asks_raw]
+        bid_px, bid_qty = parse_levels(book_data.get("bids", []))
+        ask_px, ask_qty = parse_levels(book_data.get("asks", []))
         
         ts_ms = int(time.time() * 1000)  # Bitmart doesn't provide timestamp
-        ob = OrderBook(bids=bids, asks=asks, ts_ms=ts_ms)
+        ob = ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts_ms)
         return sort_l2(ob)
 
+    # ---- streaming (incremental depth) ----
+    # spot/depth/increase100 sends a snapshot then updates; `version` must
+    # increase by exactly one, otherwise we resubscribe.
+    def ws_subscribe_messages(self, pair: Pair, depth: int) -> List[Any]:
+        return [{"op": "subscribe", "args": [f"spot/depth/increase100:{self.format_symbol(pair)}"]}]
+
+    def ws_ping_message(self) -> Any:
+        return "ping"
+
+    def ws_decode(self, raw: Any) -> Any:
+        # the compress endpoint sends raw-deflate binary frames
+        if isinstance(raw, bytes):
+            try:
+                raw = zlib.decompress(raw, -zlib.MAX_WBITS)
+            except zlib.error:
+                pass
+        return super().ws_decode(raw)
+
+    def ws_parse_book(self, msg: Any) -> Optional[BookDelta]:
+        if not isinstance(msg, dict) or not str(msg.get("table", "")).startswith("spot/depth/increase"):
+            return None
+        d = msg["data"][0]
+        version = int(d["version"])
+        return BookDelta(
+            bids=float_pairs(d.get("bids", [])),
+            asks=float_pairs(d.get("asks", [])),
+            ts_ms=int(d.get("ms_t", time.time() * 1000)),
+            is_snapshot=d.get("type") == "snapshot",
+            first_seq=version,
+            last_seq=version,
+        )
+
     # ---- funding (perps) ----
     async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
         """
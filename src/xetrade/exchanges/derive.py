@@ -2,15 +2,16 @@
 from __future__ import annotations
 
 import time
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional
 
 from xetrade.exchanges.base import (
     BaseExchange,
     register_exchange,
     normalize_pair,
 )
-from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries, Level
-from xetrade.models import to_levels, sort_l2
+from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries
+from xetrade.models import ColumnarOrderBook, BookDelta, to_levels, sort_l2
+from xetrade.utils.decode import parse_level_dicts, float_pairs
 from xetrade.utils.http import get_json
 
 BASE_URL = "https://api.dydx.exchange"
@@ -21,7 +22,7 @@ class Derive(BaseExchange):
     Derive (dYdX) adapter:
       - Best bid/ask: /v3/orderbooks/{market}
       - L2 order book: /v3/orderbooks/{market}
-      - Funding (perps): /v3/funding-rates/{market}
+      - Funding (perps): /v3/funding-rates/{market}, /v3/markets (all markets)
     Notes:
       * dYdX is a decentralized exchange with perpetual futures.
       * dYdX uses 'BTC-USD' format for symbols.
@@ -30,6 +31,8 @@ class Derive(BaseExchange):
     name = "derive"
     funding_interval_hours = 1.0
     supports_funding = True
+    supports_streaming = True
+    ws_url = "wss://api.dydx.exchange/v3/ws"
 
     # ---- symbol formatting ----
     def format_symbol(self, pair: Pair) -> str:
@@ -45,7 +48,7 @@ class Derive(BaseExchange):
     async def get_best_bid_ask(self, pair: Pair) -> Quote:
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/v3/orderbooks/{sym}"
-        data = await get_json(url)
+        data = await get_json(url, pool=self.name)
         # data: {"orderbooks":{"BTC-USD":{"bids":[{"price":"50000","size":"0.1"}],"asks":[{"price":"50001","size":"0.1"}]}}}
         if "orderbooks" not in data or sym not in data["orderbooks"]:
             raise RuntimeError(f"No orderbook data returned for {sym}")
@@ -64,29 +67,55 @@ class Derive(BaseExchange):
         return Quote(bid=best_bid, ask=best_ask, ts_ms=ts_ms)
 
     async def get_l2_orderbook(self, pair: Pair, depth: int = 100) -> OrderBook:
+        book = await self.get_l2_columnar(pair, depth)
+        return book.to_orderbook()
+
+    async def get_l2_columnar(self, pair: Pair, depth: int = 100) -> ColumnarOrderBook:
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/v3/orderbooks/{sym}"
-        data = await get_json(url)
+        data = await get_json(url, pool=self.name)
         
         if "orderbooks" not in data or sym not in data["orderbooks"]:
             raise RuntimeError(f"No orderbook data returned for {sym}")
         
         book_data = data["orderbooks"][sym]
         # bids/asks are lists of {"price":"...","size":"..."}
-        bids_raw: List[Tuple[float, float]] = [(float(b["price"]), float(b["size"])) for b in book_data.get("bids", [])]
-        asks_raw: List[Tuple[float, float]] = [(float(a["price"]), float(a["size"])) for a in book_data.get("asks", [])]
-        
-        # Limit to requested depth
-        bids_raw = bids_raw[:depth]
-        asks_raw = asks_raw[:depth]
-        
-        bids = [Level(price=p, qty=q) for p, q in bids_raw]
-        asks = [Level(price=p, qty=q) for p, q in asks_raw]
+        # Limit to requested depth before converting
+        bid_px, bid_qty = parse_level_dicts(book_data.get("bids", [])[:depth])
+        ask_px, ask_qty = parse_level_dicts(book_data.get("asks", [])[:depth])
         
         ts_ms = int(time.time() * 1000)  # dYdX doesn't provide timestamp in this endpoint
-        ob = OrderBook(bids=bids, asks=asks, ts_ms=ts_ms)
+        ob = ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts_ms)
         return sort_l2(ob)
 
+    # ---- streaming (v3_orderbook) ----
+    # The subscribe ack carries the full book; updates carry a per-message
+    # offset that only increases. Offsets aren't contiguous, so there is no
+    # gap check here, only stale-message dropping.
+    def ws_subscribe_messages(self, pair: Pair, depth: int) -> List[Any]:
+        return [{"type": "subscribe", "channel": "v3_orderbook", "id": self.format_symbol(pair), "includeOffsets": True}]
+
+    def ws_parse_book(self, msg: Any) -> Optional[BookDelta]:
+        if not isinstance(msg, dict) or msg.get("channel") != "v3_orderbook":
+            return None
+        contents = msg.get("contents", {})
+        ts_ms = int(time.time() * 1000)
+        if msg.get("type") == "subscribed":
+            bids = [(float(b["price"]), float(b["size"])) for b in contents.get("bids", [])]
+            asks = [(float(a["price"]), float(a["size"])) for a in contents.get("asks", [])]
+            offsets = [int(lvl.get("offset", 0)) for lvl in contents.get("bids", []) + contents.get("asks", [])]
+            return BookDelta(bids=bids, asks=asks, ts_ms=ts_ms, is_snapshot=True,
+                             last_seq=max(offsets) if offsets else None)
+        if msg.get("type") == "channel_data":
+            offset = int(contents["offset"]) if "offset" in contents else None
+            return BookDelta(
+                bids=float_pairs(contents.get("bids", [])),
+                asks=float_pairs(contents.get("asks", [])),
+                ts_ms=ts_ms,
+                last_seq=offset,
+            )
+        return None
+
     # ---- funding (perps) ----
     async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
         """
@@ -94,7 +123,7 @@ class Derive(BaseExchange):
         """
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/v3/funding-rates/{sym}"
-        data = await get_json(url)
+        data = await get_json(url, pool=self.name)
         
         if "fundingRates" not in data or sym not in data["fundingRates"]:
             raise RuntimeError(f"No funding data returned for {sym}")
@@ -112,6 +141,23 @@ class Derive(BaseExchange):
             ts_ms=ts_ms,
         )
 
+    async def _fetch_funding_bulk(self, pairs: List[Pair]) -> Dict[Pair, FundingSnapshot]:
+        """/v3/markets carries each market's nextFundingRate (the rate accruing this hour)."""
+        wanted = {self.format_symbol(p): p for p in pairs}
+        data = await get_json(f"{BASE_URL}/v3/markets", pool=self.name)
+        ts_ms = int(time.time() * 1000)
+        out: Dict[Pair, FundingSnapshot] = {}
+        for sym, market in data.get("markets", {}).items():
+            if sym in wanted and market.get("nextFundingRate") is not None:
+                rate = float(market["nextFundingRate"])
+                out[wanted[sym]] = FundingSnapshot(
+                    current_rate=rate,
+                    predicted_next_rate=rate,
+                    interval_hours=self.funding_interval_hours,
+                    ts_ms=ts_ms,
+                )
+        return out
+
     async def get_funding_history(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         """
         Historical funding rates for the perpetual swap.
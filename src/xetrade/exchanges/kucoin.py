@@ -2,18 +2,20 @@
 from __future__ import annotations
 
 import time
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from xetrade.exchanges.base import (
     BaseExchange,
     register_exchange,
     normalize_pair,
 )
-from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries, Level
-from xetrade.models import to_levels, sort_l2
-from xetrade.utils.http import get_json
+from xetrade.models import Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries
+from xetrade.models import ColumnarOrderBook, BookDelta, to_levels, sort_l2
+from xetrade.utils.decode import parse_levels, float_pairs
+from xetrade.utils.http import get_json, post_json
 
 BASE_URL = "https://api.kucoin.com"
+FUTURES_URL = "https://api-futures.kucoin.com"
 
 @register_exchange
 class KuCoin(BaseExchange):
@@ -21,7 +23,7 @@ class KuCoin(BaseExchange):
     KuCoin adapter:
       - Best bid/ask: /api/v1/market/orderbook/level1
       - L2 order book: /api/v1/market/orderbook/level2
-      - Funding (perps): /api/v1/contracts/funding-rates
+      - Funding (perps): /api/v1/contracts/funding-rates, /api/v1/contracts/active (all perps, futures API)
     Notes:
       * Funding interval on KuCoin perps is typically 8 hours.
       * KuCoin uses 'BTC-USDT' format for symbols.
@@ -29,6 +31,8 @@ class KuCoin(BaseExchange):
     name = "kucoin"
     funding_interval_hours = 8.0
     supports_funding = True
+    supports_streaming = True
+    ws_snapshot_via_rest = True
 
     # ---- symbol formatting ----
     def format_symbol(self, pair: Pair) -> str:
@@ -40,7 +44,7 @@ class KuCoin(BaseExchange):
     async def get_best_bid_ask(self, pair: Pair) -> Quote:
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/api/v1/market/orderbook/level1"
-        data = await get_json(url, params={"symbol": sym})
+        data = await get_json(url, params={"symbol": sym}, pool=self.name)
         # data: {"code":"200000","data":{"time":1700000000000,"sequence":"123","price":"50000","size":"0.1","bestBid":"49999","bestBidSize":"0.1","bestAsk":"50001","bestAskSize":"0.1"}}
         if data.get("code") != "200000":
             raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
@@ -54,27 +58,82 @@ class KuCoin(BaseExchange):
         )
 
     async def get_l2_orderbook(self, pair: Pair, depth: int = 100) -> OrderBook:
+        book = await self.get_l2_columnar(pair, depth)
+        return book.to_orderbook()
+
+    async def get_l2_columnar(self, pair: Pair, depth: int = 100) -> ColumnarOrderBook:
         sym = self.format_symbol(pair)
         # KuCoin supports depth limits: 20,100
         limit = max(20, min(depth, 100))
         url = f"{BASE_URL}/api/v1/market/orderbook/level2"
-        data = await get_json(url, params={"symbol": sym})
+        data = await get_json(url, params={"symbol": sym}, pool=self.name)
         
         if data.get("code") != "200000":
             raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
         
         book_data = data["data"]
         # bids/asks are lists of ["price","qty"]
-        bids_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q in book_data.get("bids", [])]
-        asks_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q in book_data.get("asks", [])]
-        
-        bids = [Level(price=p, qty=q) for p, q in bids_raw]
-        asks = [Level(price=p, qty=q) for p, q in asks_raw]
+        bid_px, bid_qty = parse_levels(book_data.get("bids", []))
+        ask_px, ask_qty = parse_levels(book_data.get("asks", []))
         
         ts_ms = int(book_data.get("time", time.time() * 1000))
-        ob = OrderBook(bids=bids, asks=asks, ts_ms=ts_ms)
+        ob = ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts_ms)
         return sort_l2(ob)
 
+    # ---- streaming (level2 diffs) ----
+    async def ws_endpoint(self) -> str:
+        # public WebSocket needs a short-lived token from the bullet endpoint
+        data = await post_json(f"{BASE_URL}/api/v1/bullet-public", pool=self.name)
+        if data.get("code") != "200000":
+            raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
+        token = data["data"]["token"]
+        server = data["data"]["instanceServers"][0]
+        self.ws_ping_interval = float(server.get("pingInterval", 18000)) / 1000.0
+        return f"{server['endpoint']}?token={token}&connectId={int(time.time() * 1000)}"
+
+    def ws_subscribe_messages(self, pair: Pair, depth: int) -> List[Any]:
+        return [{
+            "id": str(int(time.time() * 1000)),
+            "type": "subscribe",
+            "topic": f"/market/level2:{self.format_symbol(pair)}",
+            "privateChannel": False,
+            "response": True,
+        }]
+
+    def ws_ping_message(self) -> Any:
+        return {"id": str(int(time.time() * 1000)), "type": "ping"}
+
+    def ws_parse_book(self, msg: Any) -> Optional[BookDelta]:
+        if not isinstance(msg, dict) or msg.get("subject") != "trade.l2update":
+            return None
+        data = msg["data"]
+        changes = data.get("changes", {})
+        bids, asks = changes.get("bids", []), changes.get("asks", [])
+        # change rows are ["price","size","sequence"]; size "0" removes the level
+        return BookDelta(
+            bids=float_pairs(bids),
+            asks=float_pairs(asks),
+            ts_ms=int(data.get("time", time.time() * 1000)),
+            first_seq=int(data["sequenceStart"]),
+            last_seq=int(data["sequenceEnd"]),
+            bid_seqs=[int(row[2]) for row in bids],
+            ask_seqs=[int(row[2]) for row in asks],
+        )
+
+    async def ws_book_snapshot(self, pair: Pair, depth: int) -> BookDelta:
+        url = f"{BASE_URL}/api/v1/market/orderbook/level2_100"
+        data = await get_json(url, params={"symbol": self.format_symbol(pair)}, pool=self.name, coalesce=False)
+        if data.get("code") != "200000":
+            raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
+        book_data = data["data"]
+        return BookDelta(
+            bids=float_pairs(book_data.get("bids", [])),
+            asks=float_pairs(book_data.get("asks", [])),
+            ts_ms=int(book_data.get("time", time.time() * 1000)),
+            is_snapshot=True,
+            last_seq=int(book_data["sequence"]),
+        )
+
     # ---- funding (perps) ----
     async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
         """
@@ -82,7 +141,7 @@ class KuCoin(BaseExchange):
         """
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/api/v1/contracts/funding-rates"
-        data = await get_json(url, params={"symbol": sym})
+        data = await get_json(url, params={"symbol": sym}, pool=self.name)
         
         if data.get("code") != "200000":
             raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
@@ -103,45 +162,57 @@ class KuCoin(BaseExchange):
             ts_ms=ts_ms,
         )
 
+    async def _fetch_funding_bulk(self, pairs: List[Pair]) -> Dict[Pair, FundingSnapshot]:
+        """
+        The futures API lists every active contract with its current and
+        predicted funding rate and its funding granularity (ms).
+        Contracts name BTC 'XBT'.
+        """
+        wanted: Dict[Tuple[str, str], Pair] = {}
+        for pair in pairs:
+            p = normalize_pair(pair)
+            wanted[("XBT" if p.base == "BTC" else p.base, p.quote)] = pair
+        data = await get_json(f"{FUTURES_URL}/api/v1/contracts/active", pool=self.name)
+        if data.get("code") != "200000":
+            raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
+        ts_ms = int(time.time() * 1000)
+        out: Dict[Pair, FundingSnapshot] = {}
+        for row in data.get("data", []):
+            pair = wanted.get((row.get("baseCurrency"), row.get("quoteCurrency")))
+            if pair is None or row.get("isInverse") or row.get("fundingFeeRate") is None:
+                continue
+            cur = float(row["fundingFeeRate"])
+            predicted = row.get("predictedFundingFeeRate")
+            granularity = row.get("fundingRateGranularity")
+            out[pair] = FundingSnapshot(
+                current_rate=cur,
+                predicted_next_rate=float(predicted) if predicted is not None else cur,
+                interval_hours=granularity / 3600_000 if granularity else self.funding_interval_hours,
+                ts_ms=ts_ms,
+            )
+        return out
+
     async def get_funding_history(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         """
         Historical funding rates for the perpetual swap.
-        Includes pagination to handle large date ranges.
+        Long ranges are split into windows fetched concurrently (see BaseExchange._paginate_funding).
         """
+        return await self._paginate_funding(pair, start_ms, end_ms)
+
+    async def _fetch_funding_page(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/api/v1/contracts/funding-rates"
+        params = {
+            "symbol": sym,
+            "startAt": start_ms,
+            "endAt": end_ms,
+            "limit": self.funding_page_limit,
+        }
+        data = await get_json(url, params=params, pool=self.name)
+        if data.get("code") != "200000":
+            raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
         out: FundingSeries = []
-        
-        # Pagination loop
-        current_start = start_ms
-        while current_start < end_ms:
-            params = {
-                "symbol": sym, 
-                "startAt": current_start, 
-                "endAt": end_ms, 
-                "limit": 100  # KuCoin max limit
-            }
-            data = await get_json(url, params=params)
-            
-            if data.get("code") != "200000":
-                raise RuntimeError(f"KuCoin API error: {data.get('msg', 'Unknown error')}")
-            
-            if not data.get("data"):  # No more data
-                break
-                
-            for row in data.get("data", []):
-                # row: {'symbol':'BTC-USDT','fundingRate':'0.0001','time':1700000000000}
-                rate = float(row.get("fundingRate", 0.0))
-                ts = int(row.get("time"))
-                out.append(FundingPoint(ts_ms=ts, rate=rate))
-            
-            # Update start time for next page
-            if data.get("data"):
-                last_ts = int(data["data"][-1].get("time", current_start))
-                if last_ts <= current_start:  # No progress, avoid infinite loop
-                    break
-                current_start = last_ts + 1
-            else:
-                break
-                
+        for row in data.get("data") or []:
+            # row: {'symbol':'BTC-USDT','fundingRate':'0.0001','time':1700000000000}
+            out.append(FundingPoint(ts_ms=int(row.get("time")), rate=float(row.get("fundingRate", 0.0))))
         return out 
\ No newline at end of file
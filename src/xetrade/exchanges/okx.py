@@ -2,7 +2,8 @@
 from __future__ import annotations
 
 import time
-from typing import List, Tuple, Optional
+import zlib
+from typing import Any, Dict, List, Tuple, Optional
 
 from xetrade.exchanges.base import (
     BaseExchange,
@@ -10,14 +11,31 @@ from xetrade.exchanges.base import (
     normalize_pair,
 )
 from xetrade.models import (
-    Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries, Level,
+    Pair, Quote, OrderBook, FundingSnapshot, FundingPoint, FundingSeries,
     OrderRequest, OrderResponse, OrderStatusResponse, CancelResponse, OrderStatus,
     Position, PositionPnL
 )
-from xetrade.models import to_levels, sort_l2
+from xetrade.models import ColumnarOrderBook, BookDelta, to_levels, sort_l2
+from xetrade.utils.decode import parse_levels, float_pairs
 from xetrade.utils.http import get_json
 
 BASE_URL = "https://www.okx.com"
+CHECKSUM_DEPTH = 25
+
+def okx_checksum(bids: List[Tuple[str, str]], asks: List[Tuple[str, str]]) -> int:
+    """
+    OKX book checksum: best 25 bids and asks interleaved as
+    "bidPx:bidSz:askPx:askSz:..." using the venue's original strings,
+    CRC32 as a signed 32-bit int.
+    """
+    parts: List[str] = []
+    for i in range(max(len(bids), len(asks))):
+        if i < len(bids):
+            parts.extend(bids[i])
+        if i < len(asks):
+            parts.extend(asks[i])
+    crc = zlib.crc32(":".join(parts).encode())
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
 
 @register_exchange
 class OKX(BaseExchange):
@@ -25,15 +43,18 @@ class OKX(BaseExchange):
     OKX adapter:
       - Best bid/ask: /api/v5/market/ticker
       - L2 order book: /api/v5/market/books
-      - Funding (perps): /api/v5/public/funding-rate
+      - Funding (perps): /api/v5/public/funding-rate (instId=ANY returns every swap)
     Notes:
-      * Funding interval on OKX perps is typically 8 hours.
+      * Funding interval on OKX perps is typically 8 hours; the actual one is
+        nextFundingTime - fundingTime.
       * OKX uses 'BTC-USDT' format for symbols.
     """
     name = "okx"
     funding_interval_hours = 8.0
     supports_funding = True
     supports_trading = True
+    supports_streaming = True
+    ws_url = "wss://ws.okx.com:8443/ws/v5/public"
 
     # ---- symbol formatting ----
     def format_symbol(self, pair: Pair) -> str:
@@ -45,7 +66,7 @@ class OKX(BaseExchange):
     async def get_best_bid_ask(self, pair: Pair) -> Quote:
         sym = self.format_symbol(pair)
         url = f"{BASE_URL}/api/v5/market/ticker"
-        data = await get_json(url, params={"instId": sym})
+        data = await get_json(url, params={"instId": sym}, pool=self.name)
         # data: {"code":"0","msg":"","data":[{"instId":"BTC-USDT","last":"...","lastSz":"...","askPx":"...","askSz":"...","bidPx":"...","bidSz":"...","open24h":"...","high24h":"...","low24h":"...","volCcy24h":"...","vol24h":"...","ts":"..."}]}
         if not data.get("data"):
             raise RuntimeError(f"No data returned for {sym}")
@@ -59,28 +80,80 @@ class OKX(BaseExchange):
         )
 
     async def get_l2_orderbook(self, pair: Pair, depth: int = 100) -> OrderBook:
+        book = await self.get_l2_columnar(pair, depth)
+        return book.to_orderbook()
+
+    async def get_l2_columnar(self, pair: Pair, depth: int = 100) -> ColumnarOrderBook:
         sym = self.format_symbol(pair)
         # OKX supports depth limits: 1,5,20,100,400
         limit = max(1, min(depth, 400))
         url = f"{BASE_URL}/api/v5/market/books"
-        data = await get_json(url, params={"instId": sym, "sz": limit})
+        data = await get_json(url, params={"instId": sym, "sz": limit}, pool=self.name)
         
         if not data.get("data"):
             raise RuntimeError(f"No orderbook data returned for {sym}")
         
         book_data = data["data"][0]
         # bids/asks are lists of ["price","qty","num_orders","level"]
-        bids_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q, _, _ in book_data.get("bids", [])]
-        asks_raw: List[Tuple[float, float]] = [(float(p), float(q)) for p, q, _, _ in book_data.get("asks", [])]
-        
-        bids = [Level(price=p, qty=q) for p, q in bids_raw]
-        asks = [Level(price=p, qty=q) for p, q in asks_raw]
+        bid_px, bid_qty = parse_levels(book_data.get("bids", []))
+        ask_px, ask_qty = parse_levels(book_data.get("asks", []))
         
         ts_ms = int(book_data.get("ts", time.time() * 1000))
-        ob = OrderBook(bids=bids, asks=asks, ts_ms=ts_ms)
+        ob = ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts_ms)
         return sort_l2(ob)
 
+    # ---- streaming (books channel) ----
+    # The first push is a full snapshot; each update carries prevSeqId, which
+    # must equal the seqId of the message before it, and a checksum of the
+    # top 25 levels after it is applied (see ws_checksum).
+    def ws_subscribe_messages(self, pair: Pair, depth: int) -> List[Any]:
+        return [{"op": "subscribe", "args": [{"channel": "books", "instId": self.format_symbol(pair)}]}]
+
+    def ws_ping_message(self) -> Any:
+        return "ping"
+
+    def ws_parse_book(self, msg: Any) -> Optional[BookDelta]:
+        if not isinstance(msg, dict) or "data" not in msg or msg.get("arg", {}).get("channel") != "books":
+            return None
+        d = msg["data"][0]
+        is_snapshot = msg.get("action") == "snapshot"
+        bids = d.get("bids", [])
+        asks = d.get("asks", [])
+        checksum = d.get("checksum")
+        return BookDelta(
+            bids=float_pairs(bids),
+            asks=float_pairs(asks),
+            ts_ms=int(d.get("ts", time.time() * 1000)),
+            is_snapshot=is_snapshot,
+            last_seq=int(d["seqId"]),
+            prev_seq=None if is_snapshot else int(d["prevSeqId"]),
+            checksum=int(checksum) if checksum is not None else None,
+            # checksum is over the original strings ("0.10" != "0.1")
+            raw_bids=[(row[0], row[1]) for row in bids],
+            raw_asks=[(row[0], row[1]) for row in asks],
+        )
+
+    def ws_checksum(self, book) -> int:
+        return okx_checksum(book.top_raw_bids(CHECKSUM_DEPTH), book.top_raw_asks(CHECKSUM_DEPTH))
+
     # ---- funding (perps) ----
+    def _parse_funding_rate(self, funding_data: Dict[str, Any]) -> FundingSnapshot:
+        cur = float(funding_data.get("fundingRate") or 0.0)
+        # nextFundingRate is empty unless the instrument uses predicted funding
+        predicted = float(funding_data.get("nextFundingRate") or cur)
+        ts_ms = int(funding_data.get("ts", time.time() * 1000))
+        interval = self.funding_interval_hours
+        if funding_data.get("fundingTime") and funding_data.get("nextFundingTime"):
+            span_ms = int(funding_data["nextFundingTime"]) - int(funding_data["fundingTime"])
+            if span_ms > 0:
+                interval = span_ms / 3600_000
+        return FundingSnapshot(
+            current_rate=cur,
+            predicted_next_rate=predicted,
+            interval_hours=interval,
+            ts_ms=ts_ms,
+        )
+
     async def get_funding_live_predicted(self, pair: Pair) -> FundingSnapshot:
         """
         OKX publishes current funding rate on /api/v5/public/funding-rate.
@@ -89,64 +162,46 @@ class OKX(BaseExchange):
         # For funding rates, OKX expects perpetual futures symbols like 'BTC-USDT-SWAP'
         sym = f"{p.base}-{p.quote}-SWAP"
         url = f"{BASE_URL}/api/v5/public/funding-rate"
-        data = await get_json(url, params={"instId": sym})
+        data = await get_json(url, params={"instId": sym}, pool=self.name)
         
         if not data.get("data"):
             raise RuntimeError(f"No funding data returned for {sym}")
-        
-        funding_data = data["data"][0]
-        cur = float(funding_data.get("fundingRate", 0.0))
-        # OKX doesn't provide predicted rate, so we use current as placeholder
-        predicted = cur
-        ts_ms = int(funding_data.get("ts", time.time() * 1000))
-        
-        return FundingSnapshot(
-            current_rate=cur,
-            predicted_next_rate=predicted,
-            interval_hours=self.funding_interval_hours,
-            ts_ms=ts_ms,
-        )
+        return self._parse_funding_rate(data["data"][0])
+
+    async def _fetch_funding_bulk(self, pairs: List[Pair]) -> Dict[Pair, FundingSnapshot]:
+        """instId=ANY returns the funding rate of every perpetual swap in one request."""
+        wanted = {f"{p.base}-{p.quote}-SWAP": pair for pair in pairs for p in (normalize_pair(pair),)}
+        data = await get_json(f"{BASE_URL}/api/v5/public/funding-rate", params={"instId": "ANY"}, pool=self.name)
+        if data.get("code") not in (None, "0"):
+            raise RuntimeError(f"OKX API error: {data.get('msg', 'Unknown error')}")
+        return {wanted[row["instId"]]: self._parse_funding_rate(row)
+                for row in data.get("data", []) if row.get("instId") in wanted}
 
     async def get_funding_history(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         """
         Historical funding rates for the perpetual swap.
-        Includes pagination to handle large date ranges.
+        Long ranges are split into windows fetched concurrently (see BaseExchange._paginate_funding).
         """
+        return await self._paginate_funding(pair, start_ms, end_ms)
+
+    async def _fetch_funding_page(self, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
         p = normalize_pair(pair)
         # For funding rates, OKX expects perpetual futures symbols like 'BTC-USDT-SWAP'
         sym = f"{p.base}-{p.quote}-SWAP"
         url = f"{BASE_URL}/api/v5/public/funding-rate-history"
+        # OKX cursors are exclusive: 'after' = older than, 'before' = newer than; newest first
+        params = {
+            "instId": sym,
+            "after": end_ms + 1,
+            "before": start_ms - 1,
+            "limit": self.funding_page_limit,
+        }
+        data = await get_json(url, params=params, pool=self.name)
         out: FundingSeries = []
-        
-        # Pagination loop
-        current_after = start_ms
-        while current_after < end_ms:
-            params = {
-                "instId": sym, 
-                "after": current_after, 
-                "before": end_ms, 
-                "limit": 100  # OKX max limit
-            }
-            data = await get_json(url, params=params)
-            
-            if not data.get("data"):  # No more data
-                break
-                
-            for row in data.get("data", []):
-                # row: {'instId':'BTC-USDT-SWAP','fundingRate':'0.0001','realizedRate':'0.0001','interestRate':'0.0001','ts':'1700000000000'}
-                rate = float(row.get("fundingRate", 0.0))
-                ts = int(row.get("ts"))
-                out.append(FundingPoint(ts_ms=ts, rate=rate))
-            
-            # Update after timestamp for next page
-            if data.get("data"):
-                last_ts = int(data["data"][-1].get("ts", current_after))
-                if last_ts <= current_after:  # No progress, avoid infinite loop
-                    break
-                current_after = last_ts + 1
-            else:
-                break
-                
+        for row in data.get("data") or []:
+            # row: {'instId':'BTC-USDT-SWAP','fundingRate':'0.0001','realizedRate':'0.0001','fundingTime':'1700000000000'}
+            ts = int(row.get("fundingTime") or row.get("ts"))
+            out.append(FundingPoint(ts_ms=ts, rate=float(row.get("fundingRate", 0.0))))
         return out 
 
     # ---- trading (order management) ----
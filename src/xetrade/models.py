@@ -1,9 +1,11 @@
 # src/xetrade/models.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Literal, Tuple, Optional
+from typing import List, Literal, Tuple, Optional, Union
 from enum import Enum
 
+import numpy as np
+
 Side = Literal["buy", "sell"]
 OrderType = Literal["LIMIT", "MARKET"]
 PositionSide = Literal["long", "short"]
@@ -81,6 +83,105 @@ class OrderBook:
         return (bb + ba) / 2.0
 
 
+def _column(values) -> np.ndarray:
+    arr = np.ascontiguousarray(values, dtype=np.float64)
+    arr.setflags(write=False)
+    return arr
+
+
+@dataclass(frozen=True, eq=False)
+class ColumnarOrderBook:
+    """
+    L2 book stored as four contiguous float64 arrays instead of Level objects.
+    Same accessors as OrderBook (best_bid/best_ask/mid, bids/asks), so it can
+    be passed anywhere an OrderBook is read; arrays are read-only.
+    """
+    bid_px: np.ndarray   # sorted DESC by price
+    bid_qty: np.ndarray
+    ask_px: np.ndarray   # sorted ASC by price
+    ask_qty: np.ndarray
+    ts_ms: int
+
+    def __post_init__(self):
+        for name in ("bid_px", "bid_qty", "ask_px", "ask_qty"):
+            object.__setattr__(self, name, _column(getattr(self, name)))
+        if self.bid_px.shape != self.bid_qty.shape or self.ask_px.shape != self.ask_qty.shape:
+            raise ValueError("price and qty arrays must have the same length")
+
+    @classmethod
+    def from_orderbook(cls, book: "OrderBook") -> "ColumnarOrderBook":
+        if isinstance(book, ColumnarOrderBook):
+            return book
+        return cls(
+            bid_px=[lvl.price for lvl in book.bids],
+            bid_qty=[lvl.qty for lvl in book.bids],
+            ask_px=[lvl.price for lvl in book.asks],
+            ask_qty=[lvl.qty for lvl in book.asks],
+            ts_ms=book.ts_ms,
+        )
+
+    def to_orderbook(self) -> OrderBook:
+        return OrderBook(bids=self.bids, asks=self.asks, ts_ms=self.ts_ms)
+
+    @property
+    def bids(self) -> List[Level]:
+        return levels_from_arrays(self.bid_px, self.bid_qty)
+
+    @property
+    def asks(self) -> List[Level]:
+        return levels_from_arrays(self.ask_px, self.ask_qty)
+
+    def side(self, side: Literal["bid", "ask"]) -> Tuple[np.ndarray, np.ndarray]:
+        """(prices, qtys) for one side."""
+        return (self.bid_px, self.bid_qty) if side == "bid" else (self.ask_px, self.ask_qty)
+
+    @property
+    def depth(self) -> Tuple[int, int]:
+        return len(self.bid_px), len(self.ask_px)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bid_px.nbytes + self.bid_qty.nbytes + self.ask_px.nbytes + self.ask_qty.nbytes
+
+    def best_bid(self) -> float:
+        return float(self.bid_px[0]) if len(self.bid_px) else float("nan")
+
+    def best_ask(self) -> float:
+        return float(self.ask_px[0]) if len(self.ask_px) else float("nan")
+
+    def mid(self) -> float:
+        bb, ba = self.best_bid(), self.best_ask()
+        return (bb + ba) / 2.0
+
+
+AnyOrderBook = Union[OrderBook, ColumnarOrderBook]
+
+
+@dataclass(frozen=True)
+class BookDelta:
+    """
+    One streamed book message, normalized by the venue adapter.
+    qty == 0 removes a level. Sequence fields are venue ids; whichever the
+    venue provides is used for gap detection (prev_seq wins if set).
+    """
+    bids: List[Tuple[float, float]]
+    asks: List[Tuple[float, float]]
+    ts_ms: int
+    is_snapshot: bool = False
+    first_seq: Optional[int] = None   # first update id covered by this message
+    last_seq: Optional[int] = None    # last update id covered by this message
+    prev_seq: Optional[int] = None    # id of the message this one follows (OKX style)
+    checksum: Optional[int] = None    # venue-published checksum, if any
+    # venue price/qty strings aligned with bids/asks; only set when the
+    # checksum is computed over the original text (OKX)
+    raw_bids: Optional[List[Tuple[str, str]]] = None
+    raw_asks: Optional[List[Tuple[str, str]]] = None
+    # per-row sequence ids aligned with bids/asks, for venues whose change
+    # rows carry their own (KuCoin); rows at or below the book's seq are skipped
+    bid_seqs: Optional[List[int]] = None
+    ask_seqs: Optional[List[int]] = None
+
+
 # ----- Order Management Types -----
 
 @dataclass(frozen=True)
@@ -196,8 +297,17 @@ FundingSeries = List[FundingPoint]
 
 # ----- Small helpers used everywhere -----
 
-def sort_l2(book: OrderBook) -> OrderBook:
+def sort_l2(book: AnyOrderBook) -> AnyOrderBook:
     """Ensure canonical sorting (defensive; some APIs don't guarantee)."""
+    if isinstance(book, ColumnarOrderBook):
+        # stable sorts, so ties keep venue order exactly like sorted() does
+        bi = np.argsort(-book.bid_px, kind="stable")
+        ai = np.argsort(book.ask_px, kind="stable")
+        return ColumnarOrderBook(
+            bid_px=book.bid_px[bi], bid_qty=book.bid_qty[bi],
+            ask_px=book.ask_px[ai], ask_qty=book.ask_qty[ai],
+            ts_ms=book.ts_ms,
+        )
     bids = sorted(book.bids, key=lambda x: x.price, reverse=True)
     asks = sorted(book.asks, key=lambda x: x.price)
     return OrderBook(bids=bids, asks=asks, ts_ms=book.ts_ms)
@@ -213,3 +323,13 @@ def to_levels(side: Literal["bid", "ask"], raw: List[Tuple[float, float]]) -> Li
         if p > 0 and q > 0:
             out.append(Level(price=float(p), qty=float(q)))
     return out
+
+
+def levels_from_arrays(prices, qtys) -> List[Level]:
+    """
+    Build Level[] from parallel price/qty sequences (lists or numpy arrays,
+    e.g. the output of xetrade.utils.decode.parse_levels).
+    """
+    if hasattr(prices, "tolist"):
+        prices, qtys = prices.tolist(), qtys.tolist()
+    return [Level(price=p, qty=q) for p, q in zip(prices, qtys)]
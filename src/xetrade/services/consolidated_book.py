@@ -0,0 +1,202 @@
+# src/xetrade/services/consolidated_book.py
+from __future__ import annotations
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, Iterable, List, Literal, Mapping, Optional, Tuple
+
+import numpy as np
+
+from xetrade.models import Pair, ColumnarOrderBook, AnyOrderBook, Side
+from xetrade.exchanges.base import BaseExchange
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True, eq=False)
+class ConsolidatedSide:
+    """One side of a merged book, best first. Level i came from venues[venue_idx[i]]."""
+    price: np.ndarray      # venue price
+    qty: np.ndarray        # base qty
+    eff_price: np.ndarray  # price after taker fee (bids: px*(1-fee), asks: px*(1+fee)); merge key
+    venue_idx: np.ndarray  # int index into ConsolidatedBook.venues
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+@dataclass(frozen=True, eq=False)
+class ConsolidatedBook:
+    venues: Tuple[str, ...]
+    taker_fees: Tuple[float, ...]  # aligned with venues
+    bids: ConsolidatedSide         # DESC by eff_price
+    asks: ConsolidatedSide         # ASC by eff_price
+    ts_ms: int                     # newest source book timestamp
+
+    # raw (pre-fee) touch; with uneven fees this need not be the first merged level
+    def best_bid(self) -> float:
+        return float(self.bids.price.max()) if len(self.bids) else float("nan")
+
+    def best_ask(self) -> float:
+        return float(self.asks.price.min()) if len(self.asks) else float("nan")
+
+    def mid(self) -> float:
+        bb, ba = self.best_bid(), self.best_ask()
+        return (bb + ba) / 2.0
+
+    def top(self, side: Literal["bid", "ask"], n: int = 10) -> List[Tuple[str, float, float]]:
+        """First n levels of a side as (venue, price, qty)."""
+        s = self.bids if side == "bid" else self.asks
+        return [
+            (self.venues[v], p, q)
+            for v, p, q in zip(s.venue_idx[:n].tolist(), s.price[:n].tolist(), s.qty[:n].tolist())
+        ]
+
+def _merge_side(sides: List[Tuple[np.ndarray, np.ndarray]], fees: List[float], is_bid: bool) -> ConsolidatedSide:
+    """
+    k-way merge of already-sorted per-venue sides on fee-adjusted price.
+    Fees scale a venue's prices by a positive constant, so each input stays
+    sorted and heapq.merge only ever compares the k current heads.
+    """
+    streams = []
+    for v, ((px, _), fee) in enumerate(zip(sides, fees)):
+        eff = px * (1.0 - fee) if is_bid else px * (1.0 + fee)
+        # equal prices fall back to comparing (venue, level) indices
+        streams.append(zip(eff.tolist(), repeat(v), range(len(px))))
+
+    merged = list(heapq.merge(*streams, reverse=is_bid))
+    n = len(merged)
+    venue_idx = np.fromiter((m[1] for m in merged), dtype=np.int16, count=n)
+    level_idx = np.fromiter((m[2] for m in merged), dtype=np.int64, count=n)
+    eff_price = np.fromiter((m[0] for m in merged), dtype=np.float64, count=n)
+
+    price = np.empty(n, dtype=np.float64)
+    qty = np.empty(n, dtype=np.float64)
+    for v, (px, q) in enumerate(sides):
+        mask = venue_idx == v
+        price[mask] = px[level_idx[mask]]
+        qty[mask] = q[level_idx[mask]]
+    return ConsolidatedSide(price=price, qty=qty, eff_price=eff_price, venue_idx=venue_idx)
+
+def build_consolidated_book(books: Mapping[str, AnyOrderBook],
+                            taker_fees: Optional[Mapping[str, float]] = None) -> ConsolidatedBook:
+    """
+    Merge per-venue L2 books ({venue: book}) into one book ordered by
+    fee-adjusted price. taker_fees are fractions, e.g. {"binance": 0.001};
+    venues without an entry are treated as fee-free.
+    """
+    taker_fees = taker_fees or {}
+    venues = tuple(books.keys())
+    fees = [float(taker_fees.get(v, 0.0)) for v in venues]
+    cbooks = [ColumnarOrderBook.from_orderbook(books[v]) for v in venues]
+
+    bids = _merge_side([(b.bid_px, b.bid_qty) for b in cbooks], fees, is_bid=True)
+    asks = _merge_side([(b.ask_px, b.ask_qty) for b in cbooks], fees, is_bid=False)
+    ts_ms = max((b.ts_ms for b in cbooks), default=0)
+    return ConsolidatedBook(venues=venues, taker_fees=tuple(fees), bids=bids, asks=asks, ts_ms=ts_ms)
+
+async def fetch_consolidated_book(exchanges: Iterable[BaseExchange], pair: Pair, depth: int = 100,
+                                  taker_fees: Optional[Mapping[str, float]] = None) -> ConsolidatedBook:
+    """Fetch every venue's book concurrently and merge them; venues that fail are left out."""
+    exchanges_list = list(exchanges)
+    results = await asyncio.gather(
+        *(ex.get_l2_columnar(pair, depth) for ex in exchanges_list), return_exceptions=True
+    )
+    books: Dict[str, ColumnarOrderBook] = {}
+    for ex, res in zip(exchanges_list, results):
+        if isinstance(res, Exception):
+            logger.warning(f"Skipping {ex.name} in consolidated book: {res}")
+            continue
+        books[ex.name] = res
+    return build_consolidated_book(books, taker_fees)
+
+# --- Routed walk ---
+
+@dataclass(frozen=True)
+class VenueFill:
+    venue: str
+    filled_base: float
+    notional_quote: float   # at venue prices, before fees
+    fees_quote: float
+    avg_price: float
+
+@dataclass(frozen=True)
+class RoutedFill:
+    side: Side
+    requested_quote: float
+    filled_base: float
+    notional_quote: float
+    fees_quote: float
+    avg_price: float        # blended, before fees
+    avg_price_net: float    # blended, fees included (buys pay more, sells receive less)
+    mid: float
+    price_impact_pct: float # avg_price_net vs consolidated mid
+    by_venue: List[VenueFill]
+
+def route_order(book: ConsolidatedBook, side: Side, trade_volume_quote: float) -> RoutedFill:
+    """
+    Simulate a market order of 'trade_volume_quote' (venue-price notional)
+    swept across the consolidated book in fee-adjusted price order, the way a
+    smart router would split it. Levels are filled by the same rules as walk_book.
+    """
+    if trade_volume_quote <= 0:
+        raise ValueError("trade_volume_quote must be > 0")
+
+    s = book.asks if side == "buy" else book.bids
+    caps = s.price * s.qty
+    caps = np.where(caps > 0, caps, 0.0)
+    cum_incl = np.cumsum(caps)
+    target = float(trade_volume_quote)
+
+    # levels [0, k) are taken whole; level k (if any) partially
+    k = int(np.searchsorted(cum_incl, target, side="left"))
+    takes = caps.copy()
+    if k < len(caps):
+        spent_before = float(cum_incl[k - 1]) if k > 0 else 0.0
+        takes[k] = target - spent_before
+        takes[k + 1:] = 0.0
+
+    base = np.divide(takes, s.price, out=np.zeros_like(takes), where=takes > 0)
+    fee_rate = np.asarray(book.taker_fees, dtype=np.float64)[s.venue_idx] if len(s) else np.zeros(0)
+    fees = takes * fee_rate
+
+    nv = len(book.venues)
+    q_by_v = np.bincount(s.venue_idx, weights=takes, minlength=nv)
+    b_by_v = np.bincount(s.venue_idx, weights=base, minlength=nv)
+    f_by_v = np.bincount(s.venue_idx, weights=fees, minlength=nv)
+
+    by_venue = [
+        VenueFill(
+            venue=book.venues[v],
+            filled_base=float(b_by_v[v]),
+            notional_quote=float(q_by_v[v]),
+            fees_quote=float(f_by_v[v]),
+            avg_price=float(q_by_v[v] / b_by_v[v]),
+        )
+        for v in range(nv) if b_by_v[v] > 0
+    ]
+    by_venue.sort(key=lambda f: f.notional_quote, reverse=True)
+
+    filled = float(base.sum())
+    notional = float(takes.sum())
+    fee_total = float(fees.sum())
+    mid = book.mid()
+    if filled > 0:
+        avg = notional / filled
+        net = (notional + fee_total) / filled if side == "buy" else (notional - fee_total) / filled
+        impact = (net - mid) / mid * 100.0 if mid > 0 else float("nan")
+    else:
+        avg = net = impact = float("nan")
+
+    return RoutedFill(
+        side=side,
+        requested_quote=target,
+        filled_base=filled,
+        notional_quote=notional,
+        fees_quote=fee_total,
+        avg_price=avg,
+        avg_price_net=net,
+        mid=mid,
+        price_impact_pct=impact,
+        by_venue=by_venue,
+    )
@@ -1,7 +1,10 @@
 # src/services/funding.py
 from __future__ import annotations
+import math
 from dataclasses import dataclass
-from typing import Iterable, List, Tuple
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
 
 from xetrade.models import FundingPoint, FundingSeries, FundingSnapshot
 
@@ -81,6 +84,18 @@ class FundingHistorySummary:
     mean_apr: float
     mean_apy: float
 
+def infer_interval_hours(series: FundingSeries, default: float = 8.0) -> float:
+    """
+    Funding interval from the median spacing of consecutive points, rounded
+    to the nearest hour; default when there are fewer than two points.
+    """
+    ts = sorted(p.ts_ms for p in series)
+    gaps = sorted(b - a for a, b in zip(ts, ts[1:]) if b > a)
+    if not gaps:
+        return default
+    hours = round(gaps[len(gaps) // 2] / 3600_000)
+    return float(hours) if hours >= 1 else default
+
 def summarize_history(series: FundingSeries, interval_hours: float) -> FundingHistorySummary:
     if not series:
         return FundingHistorySummary(interval_hours, 0, 0.0, float("nan"), float("nan"), float("nan"))
@@ -113,3 +128,142 @@ def to_apy_series(series: FundingSeries, interval_hours: float) -> List[Tuple[in
     for p in series:
         out.append((p.ts_ms, apy_from_periodic(p.rate, interval_hours)))
     return out
+
+# --- Columnar (NumPy) versions ---
+# Same math as above over (ts_ms, rate) arrays, for studies spanning years
+# of history across many venues and pairs. ts_ms must be ascending.
+
+ArrayLike = Union[Sequence[float], np.ndarray]
+
+def series_to_arrays(series: FundingSeries) -> Tuple[np.ndarray, np.ndarray]:
+    """FundingSeries -> (ts_ms int64[], rate float64[]), sorted by ts_ms."""
+    ts = np.fromiter((p.ts_ms for p in series), dtype=np.int64, count=len(series))
+    rates = np.fromiter((p.rate for p in series), dtype=np.float64, count=len(series))
+    order = np.argsort(ts, kind="stable")
+    return ts[order], rates[order]
+
+def _periods_per_year(interval_hours: Union[float, ArrayLike]) -> Union[float, np.ndarray]:
+    hours = np.asarray(interval_hours, dtype=np.float64)
+    if np.any(hours <= 0):
+        raise ValueError("interval_hours must be > 0")
+    return 24.0 / hours * 365.0
+
+def apr_from_periodic_batch(rates: ArrayLike, interval_hours: Union[float, ArrayLike]) -> np.ndarray:
+    """
+    apr_from_periodic for every rate. interval_hours may be a scalar or an
+    array aligned with rates (e.g. a mix of 1h and 8h venues).
+    """
+    return np.asarray(rates, dtype=np.float64) * _periods_per_year(interval_hours)
+
+def apy_from_periodic_batch(rates: ArrayLike, interval_hours: Union[float, ArrayLike]) -> np.ndarray:
+    """apy_from_periodic for every rate, via expm1/log1p to keep precision for tiny rates."""
+    r = np.asarray(rates, dtype=np.float64)
+    return np.expm1(_periods_per_year(interval_hours) * np.log1p(r))
+
+def summarize_arrays(rates: ArrayLike, interval_hours: float) -> FundingHistorySummary:
+    """summarize_history over a rate array."""
+    r = np.asarray(rates, dtype=np.float64)
+    if not r.size:
+        return FundingHistorySummary(interval_hours, 0, 0.0, float("nan"), float("nan"), float("nan"))
+    total = float(r.sum())
+    mean_periodic = total / r.size
+    return FundingHistorySummary(
+        interval_hours=interval_hours,
+        count=int(r.size),
+        sum_rates=total,
+        mean_rate_per_period=mean_periodic,
+        mean_apr=apr_from_periodic(mean_periodic, interval_hours),
+        mean_apy=apy_from_periodic(mean_periodic, interval_hours),
+    )
+
+def cumulative_funding(rates: ArrayLike) -> np.ndarray:
+    """
+    Realized funding per unit notional from the first point up to each
+    point, for a long position (a short receives the negative).
+    """
+    return np.cumsum(np.asarray(rates, dtype=np.float64))
+
+def _check_sorted(ts: np.ndarray) -> None:
+    if ts.size > 1 and np.any(np.diff(ts) < 0):
+        raise ValueError("ts_ms must be ascending")
+
+@dataclass(frozen=True, eq=False)
+class RollingFunding:
+    """
+    Statistics over the trailing window (ts_ms - window_ms, ts_ms] at every
+    point. total is the realized funding over the window; std is the sample
+    standard deviation (nan with fewer than two points).
+    """
+    ts_ms: np.ndarray
+    count: np.ndarray
+    total: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    window_ms: int
+
+def rolling_funding(ts_ms: ArrayLike, rates: ArrayLike, window_ms: int) -> RollingFunding:
+    """
+    Time-based rolling count/sum/mean/std. Windows are found with one
+    binary search per point and evaluated from prefix sums, so cost is
+    O(n log n) whatever the window length, and gaps in the data shrink the
+    window instead of stretching it over more periods.
+    """
+    if window_ms <= 0:
+        raise ValueError("window_ms must be > 0")
+    ts = np.asarray(ts_ms, dtype=np.int64)
+    r = np.asarray(rates, dtype=np.float64)
+    if ts.shape != r.shape:
+        raise ValueError("ts_ms and rates must have the same length")
+    _check_sorted(ts)
+    start = np.searchsorted(ts, ts - window_ms, side="right")
+    idx = np.arange(1, ts.size + 1)
+    count = idx - start
+    # centre before squaring so the variance doesn't cancel out for rates around 1e-4
+    centred = r - (r.mean() if r.size else 0.0)
+    s1 = np.concatenate(([0.0], np.cumsum(centred)))
+    s2 = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    win1 = s1[idx] - s1[start]
+    win2 = s2[idx] - s2[start]
+    mean_c = win1 / count
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.where(count > 1, (win2 - count * mean_c * mean_c) / (count - 1), np.nan)
+    raw = np.concatenate(([0.0], np.cumsum(r)))
+    total = raw[idx] - raw[start]
+    return RollingFunding(
+        ts_ms=ts, count=count, total=total, mean=total / count,
+        std=np.sqrt(np.maximum(var, 0.0)), window_ms=int(window_ms),
+    )
+
+def ewma_funding(ts_ms: ArrayLike, rates: ArrayLike, halflife_ms: float) -> np.ndarray:
+    """
+    Time-decayed mean: each earlier point is weighted 0.5 ** (age / halflife_ms),
+    so uneven spacing and mixed intervals are handled exactly. Computed as a
+    ratio of cumulative sums; the history is processed in chunks short
+    enough that the growth factors stay finite in float64.
+    """
+    if halflife_ms <= 0:
+        raise ValueError("halflife_ms must be > 0")
+    t = np.asarray(ts_ms, dtype=np.float64)
+    r = np.asarray(rates, dtype=np.float64)
+    if t.shape != r.shape:
+        raise ValueError("ts_ms and rates must have the same length")
+    _check_sorted(t)
+    out = np.empty_like(r)
+    k = math.log(2.0) / halflife_ms
+    max_span = 600.0 / k   # exp(600) is well inside float64 range
+    num = den = 0.0
+    t_prev = t[0] if t.size else 0.0
+    i = 0
+    while i < t.size:
+        j = max(int(np.searchsorted(t, t[i] + max_span, side="right")), i + 1)
+        rel = (t[i:j] - t[i]) * k
+        grow = np.exp(rel)
+        carry = math.exp(-(t[i] - t_prev) * k)
+        cnum = np.cumsum(r[i:j] * grow) + num * carry
+        cden = np.cumsum(grow) + den * carry
+        out[i:j] = cnum / cden   # the common decay factor cancels in the ratio
+        num, den = cnum[-1] * math.exp(-rel[-1]), cden[-1] * math.exp(-rel[-1])
+        t_prev = t[j - 1]
+        i = j
+    return out
+
@@ -0,0 +1,161 @@
+# src/xetrade/services/funding_cache.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from xetrade.models import Pair, FundingPoint, FundingSeries
+from xetrade.exchanges.base import BaseExchange
+from xetrade.utils.decode import json_loads
+
+logger = logging.getLogger(__name__)
+
+Range = Tuple[int, int]  # inclusive [start_ms, end_ms]
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    """Sort and merge overlapping or touching inclusive ranges."""
+    out: List[Range] = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1] + 1:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((a, b))
+    return out
+
+def missing_ranges(covered: List[Range], start_ms: int, end_ms: int) -> List[Range]:
+    """Parts of [start_ms, end_ms] not inside any (merged) covered range."""
+    gaps: List[Range] = []
+    cursor = start_ms
+    for a, b in covered:
+        if b < cursor:
+            continue
+        if a > end_ms:
+            break
+        if a > cursor:
+            gaps.append((cursor, a - 1))
+        cursor = max(cursor, b + 1)
+        if cursor > end_ms:
+            break
+    if cursor <= end_ms:
+        gaps.append((cursor, end_ms))
+    return gaps
+
+@dataclass
+class FundingCacheStats:
+    requests: int = 0
+    full_hits: int = 0          # served without any venue call
+    fetches: int = 0            # get_funding_history calls made
+    points_fetched: int = 0
+
+@dataclass
+class _Entry:
+    points: Dict[int, float]    # ts_ms -> rate
+    covered: List[Range]        # ranges known complete (settled history only)
+
+class FundingHistoryCache:
+    """
+    Persistent funding-rate history per (venue, pair), one JSON file each
+    under cache_dir. Each file keeps the points (de-duplicated by ts_ms)
+    and the time ranges already fetched, so a request only calls
+    get_funding_history for the parts of [start_ms, end_ms] not covered yet.
+
+    Only history older than now - settle_ms is recorded as covered: the
+    latest funding period may still be missing or revised, so that tail is
+    fetched again on every request (one small page).
+
+        cache = FundingHistoryCache()
+        series = await cache.get_history(ex, Pair.parse("BTC-USDT"), start_ms, end_ms)
+        summarize_history(series, interval_hours=8)
+    """
+
+    def __init__(self, cache_dir: str = "./data/funding_cache", settle_ms: int = 8 * 3600_000):
+        self.cache_dir = cache_dir
+        self.settle_ms = settle_ms
+        self.stats = FundingCacheStats()
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    # --- persistence ---
+    def _path(self, venue: str, pair: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{venue}_{pair}")
+        return os.path.join(self.cache_dir, f"{safe}.json")
+
+    def _load(self, venue: str, pair: str) -> _Entry:
+        key = (venue, pair)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        entry = _Entry(points={}, covered=[])
+        path = self._path(venue, pair)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    raw = json_loads(f.read())
+                entry.points = {int(ts): float(rate) for ts, rate in raw.get("points", [])}
+                entry.covered = merge_ranges([(int(a), int(b)) for a, b in raw.get("covered", [])])
+            except Exception as e:
+                # a corrupt cache only costs a refetch
+                logger.warning(f"Ignoring unreadable funding cache {path}: {e}")
+        self._entries[key] = entry
+        return entry
+
+    def _save(self, venue: str, pair: str, entry: _Entry) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(venue, pair)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "venue": venue,
+                "pair": pair,
+                "covered": entry.covered,
+                "points": sorted(entry.points.items()),
+            }, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    # --- queries ---
+    def cached(self, venue: str, pair: Pair, start_ms: int, end_ms: int) -> FundingSeries:
+        """Points already in the cache for [start_ms, end_ms]; never calls the venue."""
+        entry = self._load(venue, pair.human())
+        return [FundingPoint(ts_ms=ts, rate=rate) for ts, rate in sorted(entry.points.items())
+                if start_ms <= ts <= end_ms]
+
+    def coverage(self, venue: str, pair: Pair) -> List[Range]:
+        return list(self._load(venue, pair.human()).covered)
+
+    async def get_history(self, ex: BaseExchange, pair: Pair, start_ms: int, end_ms: int,
+                          now_ms: Optional[int] = None) -> FundingSeries:
+        """Funding points in [start_ms, end_ms], fetching only what the cache lacks."""
+        if end_ms < start_ms:
+            return []
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        venue, sym = ex.name, pair.human()
+        self.stats.requests += 1
+        lock = self._locks.setdefault((venue, sym), asyncio.Lock())
+        async with lock:
+            entry = self._load(venue, sym)
+            gaps = missing_ranges(entry.covered, start_ms, end_ms)
+            if not gaps:
+                self.stats.full_hits += 1
+            settled_until = now_ms - self.settle_ms
+            changed = False
+            for a, b in gaps:
+                points = await ex.get_funding_history(pair, a, b)
+                self.stats.fetches += 1
+                self.stats.points_fetched += len(points)
+                for p in points:
+                    if a <= p.ts_ms <= b:
+                        entry.points[p.ts_ms] = p.rate
+                if a <= settled_until:
+                    entry.covered = merge_ranges(entry.covered + [(a, min(b, settled_until))])
+                changed = True
+            if changed:
+                await asyncio.to_thread(self._save, venue, sym, entry)
+        return self.cached(venue, pair, start_ms, end_ms)
+
+    def metrics(self) -> Dict[str, Any]:
+        return asdict(self.stats)
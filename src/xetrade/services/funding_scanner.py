@@ -0,0 +1,142 @@
+# src/xetrade/services/funding_scanner.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict, field
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from xetrade.models import Pair
+from xetrade.exchanges.base import BaseExchange
+from xetrade.services.funding import apr_from_periodic
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class VenueFunding:
+    """One venue's funding on one perp, normalized to APR."""
+    venue: str
+    pair: str
+    rate: float             # per funding period
+    interval_hours: float
+    apr: float
+    ts_ms: int
+
+@dataclass(frozen=True)
+class FundingArb:
+    """
+    Long the perp on long_venue, short it on short_venue: the position
+    collects short_apr - long_apr (longs pay positive funding, shorts
+    receive it). fees_apr is the open+close taker fees on both legs spread
+    over the holding period.
+    """
+    pair: str
+    long_venue: str
+    short_venue: str
+    long_apr: float
+    short_apr: float
+    spread_apr: float
+    fees_apr: float
+    net_apr: float
+
+@dataclass
+class ScanResult:
+    ts_ms: int
+    elapsed_ms: float
+    rates: List[VenueFunding]
+    opportunities: List[FundingArb]
+    errors: Dict[str, str] = field(default_factory=dict)  # venue -> error
+
+    def to_dict(self, top: Optional[int] = None) -> Dict[str, Any]:
+        venues = sorted({r.venue for r in self.rates})
+        return {
+            "ts_ms": self.ts_ms,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "rates": {v: sum(r.venue == v for r in self.rates) for v in venues},
+            "pairs": len({r.pair for r in self.rates}),
+            "opportunities": [asdict(o) for o in self.opportunities[:top]],
+            "errors": self.errors,
+        }
+
+def fees_apr(long_fee: float, short_fee: float, holding_days: float) -> float:
+    """Taker fees to open and close both legs, as an APR over holding_days."""
+    if holding_days <= 0:
+        raise ValueError("holding_days must be > 0")
+    return 2.0 * (long_fee + short_fee) * 365.0 / holding_days
+
+def rank_spreads(rates: Iterable[VenueFunding], taker_fees: Optional[Mapping[str, float]] = None,
+                 holding_days: float = 7.0, min_net_apr: Optional[float] = None) -> List[FundingArb]:
+    """Every venue pair quoting the same perp, best net APR first."""
+    taker_fees = taker_fees or {}
+    by_pair: Dict[str, List[VenueFunding]] = {}
+    for r in rates:
+        by_pair.setdefault(r.pair, []).append(r)
+    out: List[FundingArb] = []
+    for pair, quotes in by_pair.items():
+        for a, b in combinations(quotes, 2):
+            lo, hi = (a, b) if a.apr <= b.apr else (b, a)
+            spread = hi.apr - lo.apr
+            fees = fees_apr(taker_fees.get(lo.venue, 0.0), taker_fees.get(hi.venue, 0.0), holding_days)
+            net = spread - fees
+            if min_net_apr is not None and net < min_net_apr:
+                continue
+            out.append(FundingArb(
+                pair=pair, long_venue=lo.venue, short_venue=hi.venue,
+                long_apr=lo.apr, short_apr=hi.apr,
+                spread_apr=spread, fees_apr=fees, net_apr=net,
+            ))
+    out.sort(key=lambda o: o.net_apr, reverse=True)
+    return out
+
+class FundingScanner:
+    """
+    Cross-venue funding scan over a pair universe. Each venue is asked for
+    the whole universe at once (BaseExchange.get_funding_snapshots, which
+    uses one all-markets request where the venue has one), all venues in
+    parallel. Rates are converted to APR at each venue's own interval, so
+    1h and 8h venues compare directly, then ranked by rank_spreads.
+
+        scanner = FundingScanner(make_exchanges(["binance", "okx"]), pairs, taker_fees={"binance": 0.0005})
+        result = await scanner.scan()
+    """
+
+    def __init__(self, exchanges: Iterable[BaseExchange], pairs: Iterable[Pair], *,
+                 taker_fees: Optional[Mapping[str, float]] = None, holding_days: float = 7.0,
+                 use_predicted: bool = False, min_net_apr: Optional[float] = None):
+        self.exchanges = [ex for ex in exchanges if ex.supports_funding]
+        self.pairs = list(dict.fromkeys(pairs))
+        self.taker_fees = dict(taker_fees or {})
+        self.holding_days = holding_days
+        self.use_predicted = use_predicted
+        self.min_net_apr = min_net_apr
+
+    async def _venue(self, ex: BaseExchange) -> List[VenueFunding]:
+        snaps = await ex.get_funding_snapshots(self.pairs)
+        out = []
+        for pair, s in snaps.items():
+            rate = s.predicted_next_rate if self.use_predicted else s.current_rate
+            out.append(VenueFunding(
+                venue=ex.name, pair=pair.human(), rate=rate, interval_hours=s.interval_hours,
+                apr=apr_from_periodic(rate, s.interval_hours), ts_ms=s.ts_ms,
+            ))
+        return out
+
+    async def scan(self) -> ScanResult:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._venue(ex) for ex in self.exchanges), return_exceptions=True)
+        rates: List[VenueFunding] = []
+        errors: Dict[str, str] = {}
+        for ex, res in zip(self.exchanges, results):
+            if isinstance(res, BaseException):
+                logger.warning(f"Funding scan: {ex.name} failed: {res}")
+                errors[ex.name] = str(res)
+            else:
+                rates.extend(res)
+        return ScanResult(
+            ts_ms=int(time.time() * 1000),
+            elapsed_ms=(time.perf_counter() - start) * 1000,
+            rates=rates,
+            opportunities=rank_spreads(rates, self.taker_fees, self.holding_days, self.min_net_apr),
+            errors=errors,
+        )
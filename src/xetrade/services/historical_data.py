@@ -1,17 +1,23 @@
 # src/xetrade/services/historical_data.py
 from __future__ import annotations
 import asyncio
+import io
 import json
 import time
 from datetime import datetime, timezone
-from typing import List, Dict, Optional, Any
+from typing import Any, Callable, Dict, List, Optional
 from dataclasses import dataclass, asdict
 import logging
 import os
+import queue
 import tempfile
+import threading
+import uuid
 
 from xetrade.models import Pair, OrderBook
 from xetrade.exchanges.base import BaseExchange
+from xetrade.utils.book_delta import DeltaEncoder
+from xetrade.utils.s3_upload import MultipartUploader
 
 logger = logging.getLogger(__name__)
 
@@ -55,83 +61,361 @@ class DataStorage:
         """Store multiple snapshots in a batch. Returns success status."""
         raise NotImplementedError
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """Backend metrics (e.g. writer queue depth); empty if the backend has none."""
+        return {}
+    
     async def close(self):
         """Clean up resources."""
         pass
 
+@dataclass
+class WriterStats:
+    enqueued: int = 0
+    written: int = 0
+    dropped: int = 0            # snapshots discarded because the queue was full (drop policies)
+    blocked: int = 0            # submits that had to wait for queue space (block policy)
+    flushes: int = 0
+    flush_errors: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    last_flush_ms: float = 0.0
+    max_flush_ms: float = 0.0
+    total_flush_ms: float = 0.0
+
+_STOP = object()
+
+class BackgroundWriter:
+    """
+    Moves serialization and file I/O off the event loop.
+    
+    Snapshots go through a bounded queue to a dedicated thread, which groups
+    them into batches of up to batch_size (or whatever arrived within
+    flush_interval seconds) and hands each batch to sink(). File writes and
+    pyarrow encoding release the GIL; pure-Python encoding (json) still
+    shares it, but in interpreter-sized slices instead of one long stall of
+    the event loop.
+    
+    When the queue is full, policy decides what happens: "block" makes
+    submit() wait for space (backpressure on the producer), "drop_new"
+    discards the incoming snapshots and "drop_oldest" discards queued ones.
+    """
+    
+    POLICIES = ("block", "drop_new", "drop_oldest")
+    
+    def __init__(self, sink: Callable[[List[OrderBookSnapshot]], None], *,
+                 max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: Optional[float] = 1.0, policy: str = "block",
+                 name: str = "storage-writer"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {self.POLICIES}")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.stats = WriterStats()
+        self.name = name
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._start()
+    
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._closed = False
+    
+    async def submit(self, snapshots: List[OrderBookSnapshot]) -> bool:
+        """Queue snapshots for writing. Returns False if any were dropped."""
+        if self._closed:
+            # storage reused after close() (e.g. a new capture session)
+            self._start()
+        ok = True
+        for snapshot in snapshots:
+            try:
+                self._queue.put_nowait(snapshot)
+            except queue.Full:
+                if self.policy == "block":
+                    with self._lock:
+                        self.stats.blocked += 1
+                    # wait in a worker thread so the loop keeps running
+                    await asyncio.to_thread(self._queue.put, snapshot)
+                elif self.policy == "drop_oldest":
+                    try:
+                        self._queue.get_nowait()
+                        with self._lock:
+                            self.stats.dropped += 1
+                    except queue.Empty:
+                        pass
+                    try:
+                        self._queue.put_nowait(snapshot)
+                    except queue.Full:
+                        with self._lock:
+                            self.stats.dropped += 1
+                        ok = False
+                        continue
+                else:
+                    with self._lock:
+                        self.stats.dropped += 1
+                    ok = False
+                    continue
+            with self._lock:
+                self.stats.enqueued += 1
+                depth = self._queue.qsize()
+                self.stats.max_queue_depth = max(self.stats.max_queue_depth, depth)
+        return ok
+    
+    def _flush(self, batch: List[OrderBookSnapshot]) -> None:
+        start = time.perf_counter()
+        try:
+            self.sink(batch)
+        except Exception as e:
+            logger.error(f"Background write of {len(batch)} snapshots failed: {e}")
+            with self._lock:
+                self.stats.flush_errors += 1
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats.flushes += 1
+            self.stats.written += len(batch)
+            self.stats.last_flush_ms = elapsed_ms
+            self.stats.max_flush_ms = max(self.stats.max_flush_ms, elapsed_ms)
+            self.stats.total_flush_ms += elapsed_ms
+    
+    def _run(self) -> None:
+        batch: List[OrderBookSnapshot] = []
+        batch_started = time.monotonic()
+        while True:
+            timeout = None
+            if batch and self.flush_interval is not None:
+                timeout = max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                if batch:
+                    self._flush(batch)
+                return
+            if item is not None:
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(item)
+            due = self.flush_interval is not None and batch and \
+                time.monotonic() - batch_started >= self.flush_interval
+            if len(batch) >= self.batch_size or (item is None and batch) or due:
+                self._flush(batch)
+                batch = []
+    
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            row = asdict(self.stats)
+        row["queue_depth"] = self._queue.qsize()
+        row["queue_capacity"] = self._queue.maxsize
+        row["avg_flush_ms"] = row["total_flush_ms"] / row["flushes"] if row["flushes"] else 0.0
+        row["policy"] = self.policy
+        return row
+    
+    async def close(self) -> None:
+        """Write whatever is queued, then stop the thread. A later submit() starts a new one."""
+        if self._closed:
+            return
+        self._closed = True
+        await asyncio.to_thread(self._queue.put, _STOP)
+        await asyncio.to_thread(self._thread.join)
+
 class LocalFileStorage(DataStorage):
-    """Simple local file storage for development/testing."""
+    """
+    Simple local file storage for development/testing. Writes happen on a BackgroundWriter thread.
+    
+    With keyframe_interval set, lines are delta-encoded (utils.book_delta):
+    a full book every keyframe_interval snapshots per (exchange, pair) and
+    only added/changed/removed levels in between. Every file starts with
+    keyframes; services.replay rebuilds the full books.
+    """
     
-    def __init__(self, base_path: str = "./data"):
+    def __init__(self, base_path: str = "./data", max_queue: int = 10000, policy: str = "block",
+                 keyframe_interval: Optional[int] = None):
         self.base_path = base_path
         self.current_file = None
         self.file_handle = None
         self.snapshots_in_file = 0
         self.max_snapshots_per_file = 1000  # Rotate files every 1000 snapshots
+        self.encoder = DeltaEncoder(keyframe_interval) if keyframe_interval else None
+        self.writer = BackgroundWriter(self._write_batch, max_queue=max_queue, batch_size=500,
+                                       flush_interval=1.0, policy=policy, name="local-file-writer")
         
     async def store_snapshot(self, snapshot: OrderBookSnapshot) -> bool:
-        """Store snapshot to local JSON file."""
-        try:
-            # Create directory if it doesn't exist
-            import os
-            os.makedirs(self.base_path, exist_ok=True)
-            
-            # Rotate file if needed
-            if self.current_file is None or self.snapshots_in_file >= self.max_snapshots_per_file:
-                await self._rotate_file()
-            
-            # Write snapshot as JSON line
-            line = json.dumps(snapshot.to_dict()) + "\n"
-            self.file_handle.write(line)
-            self.file_handle.flush()
-            self.snapshots_in_file += 1
-            
-            return True
-        except Exception as e:
-            logger.error(f"Failed to store snapshot: {e}")
-            return False
+        """Queue a snapshot for the writer thread."""
+        return await self.store_batch([snapshot])
     
     async def store_batch(self, snapshots: List[OrderBookSnapshot]) -> bool:
-        """Store multiple snapshots."""
+        """Queue snapshots for the writer thread."""
         try:
-            for snapshot in snapshots:
-                success = await self.store_snapshot(snapshot)
-                if not success:
-                    return False
-            return True
+            return await self.writer.submit(snapshots)
         except Exception as e:
             logger.error(f"Failed to store batch: {e}")
             return False
     
-    async def _rotate_file(self):
+    def _write_batch(self, snapshots: List[OrderBookSnapshot]) -> None:
+        """Runs on the writer thread: JSON lines, one flush per batch."""
+        os.makedirs(self.base_path, exist_ok=True)
+        lines: List[str] = []
+        for snapshot in snapshots:
+            # Rotate file if needed
+            if self.current_file is None or self.snapshots_in_file >= self.max_snapshots_per_file:
+                self._write_lines(lines)
+                lines = []
+                self._rotate_file()
+            record = self.encoder.encode(snapshot) if self.encoder else snapshot
+            lines.append(json.dumps(record.to_dict()) + "\n")
+            self.snapshots_in_file += 1
+        self._write_lines(lines)
+    
+    def _write_lines(self, lines: List[str]) -> None:
+        if lines and self.file_handle:
+            self.file_handle.writelines(lines)
+            self.file_handle.flush()
+    
+    def _rotate_file(self):
         """Rotate to a new file."""
         if self.file_handle:
             self.file_handle.close()
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         self.current_file = f"{self.base_path}/orderbook_snapshots_{timestamp}.jsonl"
         self.file_handle = open(self.current_file, "w")
         self.snapshots_in_file = 0
+        if self.encoder:
+            self.encoder.reset()  # each file starts with keyframes
         logger.info(f"Rotated to new file: {self.current_file}")
     
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {"writer": self.writer.metrics(), "current_file": self.current_file}
+        if self.encoder:
+            metrics["delta"] = self.encoder.stats.to_dict()
+        return metrics
+    
     async def close(self):
-        """Close the current file."""
+        """Drain the writer, then close the current file."""
+        await self.writer.close()
         if self.file_handle:
             self.file_handle.close()
+            self.file_handle = None
+
+class ArrowIPCStorage(DataStorage):
+    """
+    Rolling hot store of recent books in Arrow IPC (Feather v2) files under
+    base_path, for research that rereads the last few hours repeatedly.
+    The writer thread appends each batch as an uncompressed record batch
+    (nested layout: one row per snapshot); utils.arrow_ipc.HotStoreReader
+    memory-maps the finished segments, so readers in other processes get
+    the columns without parsing JSON or decompressing Parquet. Segments
+    older than retention_hours (by book timestamp) are deleted.
+    """
+    
+    def __init__(self, base_path: str = "./data/hot", max_queue: int = 10000, policy: str = "block",
+                 segment_snapshots: int = 20000, segment_seconds: float = 300.0,
+                 retention_hours: Optional[float] = 6.0):
+        try:
+            from xetrade.utils.arrow_ipc import ArrowSegmentWriter
+        except ImportError as e:
+            raise ImportError("ArrowIPCStorage requires pyarrow") from e
+        self.base_path = base_path
+        self.segments = ArrowSegmentWriter(
+            base_path, segment_snapshots=segment_snapshots, segment_seconds=segment_seconds,
+            retention_ms=int(retention_hours * 3600_000) if retention_hours is not None else None,
+        )
+        self.writer = BackgroundWriter(self.segments.write, max_queue=max_queue, batch_size=1000,
+                                       flush_interval=1.0, policy=policy, name="arrow-ipc-writer")
+    
+    async def store_snapshot(self, snapshot: OrderBookSnapshot) -> bool:
+        """Queue a snapshot for the writer thread."""
+        return await self.store_batch([snapshot])
+    
+    async def store_batch(self, snapshots: List[OrderBookSnapshot]) -> bool:
+        """Queue snapshots for the writer thread."""
+        try:
+            return await self.writer.submit(snapshots)
+        except Exception as e:
+            logger.error(f"Failed to store batch: {e}")
+            return False
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "writer": self.writer.metrics(),
+            "open_segment": self.segments.open_segment,
+            "segments_closed": self.segments.segments_closed,
+            "segments_deleted": self.segments.segments_deleted,
+        }
+    
+    async def close(self):
+        """Drain the writer, then publish the open segment."""
+        await self.writer.close()
+        await asyncio.to_thread(self.segments.close)
 
 class S3ParquetStorage(DataStorage):
-    """AWS S3 storage with Parquet files for efficient storage and querying."""
+    """
+    AWS S3 storage with Parquet files for efficient storage and querying.
+    
+    With pyarrow, data lands in a Hive-partitioned layout,
+    orderbook_data/exchange=<venue>/pair=<pair>/date=YYYY-MM-DD/hour=HH/,
+    so readers can prune by venue, pair and time from the path alone.
+    Batches are appended straight from the snapshots' level arrays to one
+    open ParquetWriter per partition (zstd, fixed-size row groups), each
+    file uniquely named and finished after snapshots_per_file snapshots or
+    when the hour rolls over. utils.parquet.compact_dataset merges the
+    resulting small files. Without pyarrow, each batch of max_buffer_size
+    snapshots goes through pandas into its own flat file.
+    
+    keyframe_interval (nested layout, pyarrow only) stores keyframes plus
+    level diffs instead of every full book; see LocalFileStorage.
+    
+    Uploads go through utils.s3_upload.MultipartUploader on the event loop
+    (parallel MD5-checked parts, retries, at most max_uploads_in_flight
+    objects at once), so neither the loop nor the writer thread waits on
+    S3 unless that limit is reached. Pass s3_client (e.g.
+    utils.s3_local.LocalS3) to upload somewhere other than boto3's default.
+    """
     
     def __init__(self, bucket_name: str = "xetrade-data", 
                  aws_region: str = "us-east-1", 
-                 mock_mode: bool = True):
+                 mock_mode: bool = True,
+                 max_queue: int = 10000,
+                 policy: str = "block",
+                 layout: str = "flat",
+                 compression: str = "zstd",
+                 row_group_size: int = 128 * 1024,
+                 snapshots_per_file: int = 10000,
+                 keyframe_interval: Optional[int] = None,
+                 s3_client: Any = None,
+                 part_size: int = 8 * 1024 * 1024,
+                 max_uploads_in_flight: int = 2):
         self.bucket_name = bucket_name
         self.aws_region = aws_region
         self.mock_mode = mock_mode
-        self.buffer: List[OrderBookSnapshot] = []
-        self.max_buffer_size = 100  # Flush to S3 every 100 snapshots
+        self.max_buffer_size = 100  # Snapshots handed to the writer per flush
+        self.layout = layout
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.snapshots_per_file = snapshots_per_file
+        self.keyframe_interval = keyframe_interval
+        self._parquet = None       # PartitionedSnapshotWriter (pyarrow path), opened on first write
+        try:
+            from xetrade.utils.parquet import PartitionedSnapshotWriter
+            self._writer_cls = PartitionedSnapshotWriter
+        except ImportError:
+            logger.warning("pyarrow not available, falling back to pandas Parquet export")
+            self._writer_cls = None
+        if keyframe_interval:
+            if layout != "nested":
+                raise ValueError("keyframe_interval requires layout='nested'")
+            if self._writer_cls is None:
+                logger.warning("delta encoding needs pyarrow; storing full snapshots")
         
-        if not mock_mode:
+        if s3_client is not None:
+            self.s3_client = s3_client
+            self.mock_mode = False
+        elif not mock_mode:
             try:
                 import boto3
                 self.s3_client = boto3.client('s3', region_name=aws_region)
@@ -144,91 +428,111 @@ class S3ParquetStorage(DataStorage):
             logger.info("Running in MOCK mode - data will be saved locally instead of S3")
             self.mock_base_path = "./data/s3_mock"
             os.makedirs(self.mock_base_path, exist_ok=True)
+        
+        self.uploader: Optional[MultipartUploader] = None
+        if not self.mock_mode:
+            self.uploader = MultipartUploader(self.s3_client, bucket_name, part_size=part_size,
+                                              max_uploads=max_uploads_in_flight)
+        # writer-thread backpressure: waits here once max_uploads_in_flight uploads are pending
+        self._upload_slots = threading.BoundedSemaphore(max_uploads_in_flight)
+        self._pending_uploads: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # the writer thread does the buffering: a file per max_buffer_size snapshots, remainder on close
+        self.writer = BackgroundWriter(self._flush_buffer, max_queue=max_queue,
+                                       batch_size=self.max_buffer_size, flush_interval=None,
+                                       policy=policy, name="s3-parquet-writer")
     
     async def store_snapshot(self, snapshot: OrderBookSnapshot) -> bool:
-        """Add snapshot to buffer and flush if needed."""
-        try:
-            self.buffer.append(snapshot)
-            
-            if len(self.buffer) >= self.max_buffer_size:
-                return await self._flush_buffer()
-            
-            return True
-        except Exception as e:
-            logger.error(f"Failed to store snapshot: {e}")
-            return False
+        """Queue a snapshot for the writer thread."""
+        return await self.store_batch([snapshot])
     
     async def store_batch(self, snapshots: List[OrderBookSnapshot]) -> bool:
-        """Store multiple snapshots."""
+        """Queue snapshots for the writer thread."""
+        self._loop = asyncio.get_running_loop()  # uploads are scheduled on it from the writer thread
         try:
-            for snapshot in snapshots:
-                self.buffer.append(snapshot)
-            
-            if len(self.buffer) >= self.max_buffer_size:
-                return await self._flush_buffer()
-            
-            return True
+            return await self.writer.submit(snapshots)
         except Exception as e:
             logger.error(f"Failed to store batch: {e}")
             return False
     
-    async def _flush_buffer(self) -> bool:
-        """Flush buffer to S3 as Parquet file."""
-        if not self.buffer:
-            return True
+    def _start_upload(self, key: str, *, path: Optional[str] = None, data: Optional[bytes] = None) -> None:
+        """Hand an upload to the event loop (called on the writer thread). Staging files are removed once uploaded."""
+        self._upload_slots.acquire()
+        if path is not None:
+            coro = self.uploader.upload_file(path, key)
+        else:
+            coro = self.uploader.upload_bytes(key, data)
+        fut = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        self._pending_uploads.add(fut)
         
-        try:
-            # Convert snapshots to DataFrame format
-            data = []
-            for snapshot in self.buffer:
-                # Flatten the snapshot for Parquet storage
-                for bid in snapshot.bids:
-                    data.append({
-                        'exchange': snapshot.exchange,
-                        'pair': snapshot.pair,
-                        'timestamp_ms': snapshot.timestamp_ms,
-                        'side': 'bid',
-                        'price': bid['price'],
-                        'quantity': bid['qty'],
-                        'capture_latency_ms': snapshot.capture_latency_ms,
-                        'sequence_number': snapshot.sequence_number
-                    })
-                
-                for ask in snapshot.asks:
-                    data.append({
-                        'exchange': snapshot.exchange,
-                        'pair': snapshot.pair,
-                        'timestamp_ms': snapshot.timestamp_ms,
-                        'side': 'ask',
-                        'price': ask['price'],
-                        'quantity': ask['qty'],
-                        'capture_latency_ms': snapshot.capture_latency_ms,
-                        'sequence_number': snapshot.sequence_number
-                    })
-            
-            # Create Parquet file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"orderbook_snapshots_{timestamp}.parquet"
-            
-            if self.mock_mode:
-                # Save locally in mock mode
-                filepath = os.path.join(self.mock_base_path, filename)
-                await self._save_parquet_mock(data, filepath)
-                logger.info(f"Mock S3: Saved {len(self.buffer)} snapshots to {filepath}")
-            else:
-                # Save to actual S3
-                await self._save_parquet_s3(data, filename)
-                logger.info(f"S3: Uploaded {len(self.buffer)} snapshots to s3://{self.bucket_name}/{filename}")
-            
-            # Clear buffer
-            self.buffer.clear()
-            return True
+        def _done(f) -> None:
+            self._pending_uploads.discard(f)
+            self._upload_slots.release()
+            if f.cancelled() or f.exception() is not None:
+                err = "cancelled" if f.cancelled() else f.exception()
+                kept = f" (kept {path})" if path else ""
+                logger.error(f"S3: upload of s3://{self.bucket_name}/{key} failed: {err}{kept}")
+                return
+            result = f.result()
+            logger.info(f"S3: Uploaded s3://{self.bucket_name}/{key} "
+                        f"({result.size} bytes, {result.parts} parts, {result.elapsed_ms:.0f} ms)")
+            if path is not None:
+                os.unlink(path)
+        fut.add_done_callback(_done)
+    
+    def _flush_buffer(self, buffer: List[OrderBookSnapshot]) -> None:
+        """Write one batch (runs on the writer thread)."""
+        if not buffer:
+            return
+        
+        if self._writer_cls is not None:
+            self._append_arrow(buffer)
+            return
+        
+        # Convert snapshots to DataFrame format
+        data = []
+        for snapshot in buffer:
+            # Flatten the snapshot for Parquet storage
+            for bid in snapshot.bids:
+                data.append({
+                    'exchange': snapshot.exchange,
+                    'pair': snapshot.pair,
+                    'timestamp_ms': snapshot.timestamp_ms,
+                    'side': 'bid',
+                    'price': bid['price'],
+                    'quantity': bid['qty'],
+                    'capture_latency_ms': snapshot.capture_latency_ms,
+                    'sequence_number': snapshot.sequence_number
+                })
             
-        except Exception as e:
-            logger.error(f"Failed to flush buffer: {e}")
-            return False
+            for ask in snapshot.asks:
+                data.append({
+                    'exchange': snapshot.exchange,
+                    'pair': snapshot.pair,
+                    'timestamp_ms': snapshot.timestamp_ms,
+                    'side': 'ask',
+                    'price': ask['price'],
+                    'quantity': ask['qty'],
+                    'capture_latency_ms': snapshot.capture_latency_ms,
+                    'sequence_number': snapshot.sequence_number
+                })
+        
+        # Create Parquet file (uuid suffix: flushes in the same instant must not clash)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filename = f"orderbook_snapshots_{timestamp}_{uuid.uuid4().hex[:8]}.parquet"
+        
+        if self.mock_mode:
+            # Save locally in mock mode
+            filepath = os.path.join(self.mock_base_path, filename)
+            self._save_parquet_mock(data, filepath)
+            logger.info(f"Mock S3: Saved {len(buffer)} snapshots to {filepath}")
+        else:
+            # Save to actual S3
+            self._save_parquet_s3(data, filename)
+            logger.info(f"S3: Queued {len(buffer)} snapshots for s3://{self.bucket_name}/{filename}")
     
-    async def _save_parquet_mock(self, data: List[Dict], filepath: str):
+    def _save_parquet_mock(self, data: List[Dict], filepath: str):
         """Save Parquet file locally in mock mode."""
         try:
             import pandas as pd
@@ -240,54 +544,151 @@ class S3ParquetStorage(DataStorage):
                 for row in data:
                     f.write(json.dumps(row) + '\n')
     
-    async def _save_parquet_s3(self, data: List[Dict], filename: str):
-        """Save Parquet file to S3."""
+    def _save_parquet_s3(self, data: List[Dict], filename: str):
+        """Write the Parquet file to memory and queue its upload."""
         try:
             import pandas as pd
-            import tempfile
             
-            # Create temporary Parquet file
-            df = pd.DataFrame(data)
-            with tempfile.NamedTemporaryFile(suffix='.parquet', delete=False) as tmp_file:
-                df.to_parquet(tmp_file.name, index=False)
-                
-                # Upload to S3
-                s3_key = f"orderbook_data/{datetime.now().strftime('%Y/%m/%d')}/{filename}"
-                self.s3_client.upload_file(tmp_file.name, self.bucket_name, s3_key)
-                
-                # Clean up temp file
-                os.unlink(tmp_file.name)
+            buf = io.BytesIO()
+            pd.DataFrame(data).to_parquet(buf, index=False)
+            s3_key = f"orderbook_data/{datetime.now().strftime('%Y/%m/%d')}/{filename}"
+            self._start_upload(s3_key, data=buf.getvalue())
                 
         except ImportError:
             logger.error("pandas not available for Parquet export")
             raise
     
+    def _append_arrow(self, buffer: List[OrderBookSnapshot]) -> None:
+        """Route a batch to its partitions' open Parquet files."""
+        if self._parquet is None:
+            root = self.mock_base_path if self.mock_mode else os.path.join(tempfile.gettempdir(), "xetrade_s3_staging")
+            self._parquet = self._writer_cls(root, layout=self.layout, compression=self.compression,
+                                             row_group_size=self.row_group_size,
+                                             snapshots_per_file=self.snapshots_per_file,
+                                             on_file_closed=self._file_closed,
+                                             keyframe_interval=self.keyframe_interval)
+        self._parquet.write(buffer)
+    
+    def _file_closed(self, path: str, rel_key: str) -> None:
+        """A partition file is finished; outside mock mode, queue its upload (the local copy goes once it's up)."""
+        if self.mock_mode:
+            logger.info(f"Mock S3: Saved {path}")
+            return
+        self._start_upload(f"orderbook_data/{rel_key}", path=path)
+    
+    def _finish_files(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {"writer": self.writer.metrics()}
+        if self._parquet is not None:
+            metrics["open_files"] = self._parquet.open_files()
+            metrics["files_closed"] = self._parquet.files_closed
+            if self._parquet.delta_stats is not None:
+                metrics["delta"] = self._parquet.delta_stats.to_dict()
+        if self.uploader is not None:
+            metrics["uploads"] = {**self.uploader.metrics(), "pending": len(self._pending_uploads)}
+        return metrics
+    
     async def close(self):
-        """Flush remaining buffer before closing."""
-        if self.buffer:
-            await self._flush_buffer()
+        """Write the remaining snapshots, stop the writer, finish the open files and wait for their uploads."""
+        await self.writer.close()
+        await asyncio.to_thread(self._finish_files)
+        pending = [asyncio.wrap_future(f) for f in list(self._pending_uploads)]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+@dataclass
+class JobTiming:
+    """Latency of one (venue, pair) capture job, measured around its own request."""
+    count: int = 0
+    failures: int = 0
+    last_ms: float = 0.0
+    max_ms: float = 0.0
+    total_ms: float = 0.0
+
+    def record(self, latency_ms: float) -> None:
+        self.count += 1
+        self.last_ms = latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.total_ms += latency_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        avg = self.total_ms / self.count if self.count else 0.0
+        return {"count": self.count, "failures": self.failures, "last_ms": round(self.last_ms, 3),
+                "avg_ms": round(avg, 3), "max_ms": round(self.max_ms, 3)}
+
+@dataclass
+class SchedulerStats:
+    ticks: int = 0              # capture cycles run
+    missed_deadlines: int = 0   # cycles that finished after the next tick was due
+    skipped_ticks: int = 0      # ticks dropped because a cycle overran them
+    last_cycle_ms: float = 0.0
+    max_cycle_ms: float = 0.0
 
 class HistoricalDataService:
     """Service for capturing and storing historical L2 order book data."""
     
-    def __init__(self, exchanges: List[BaseExchange], storage: DataStorage):
+    def __init__(self, exchanges: List[BaseExchange], storage: DataStorage,
+                 max_concurrency_per_venue: int = 8, depth: int = 100):
         self.exchanges = exchanges
         self.storage = storage
         self.running = False
         self.sequence_counters: Dict[str, int] = {}
+        self.max_concurrency_per_venue = max_concurrency_per_venue
+        self.depth = depth
+        self.scheduler_stats = SchedulerStats()
+        self.job_timings: Dict[str, JobTiming] = {}
+        self._venue_slots: Dict[str, asyncio.Semaphore] = {}
         
+    async def _capture_one(self, exchange: BaseExchange, pair: Pair) -> Optional[OrderBookSnapshot]:
+        """One (venue, pair) job, bounded by the venue's concurrency slots and timed on its own."""
+        key = f"{exchange.name}_{pair.human()}"
+        timing = self.job_timings.setdefault(key, JobTiming())
+        async with self._venue_slots[exchange.name]:
+            job_start = time.perf_counter()
+            try:
+                orderbook = await exchange.get_l2_orderbook(pair, depth=self.depth)
+            except Exception as e:
+                timing.failures += 1
+                logger.error(f"Failed to capture {pair.human()} on {exchange.name}: {e}")
+                return None
+            capture_latency = (time.perf_counter() - job_start) * 1000
+        timing.record(capture_latency)
+        self.sequence_counters[key] = self.sequence_counters.get(key, 0) + 1
+        return OrderBookSnapshot.from_orderbook(
+            orderbook, exchange.name, pair, capture_latency, self.sequence_counters[key]
+        )
+
+    async def _capture_cycle(self, pairs: List[Pair]) -> List[OrderBookSnapshot]:
+        """Run every (venue, pair) job concurrently; per-venue semaphores cap in-flight requests."""
+        jobs = [self._capture_one(exchange, pair) for exchange in self.exchanges for pair in pairs]
+        results = await asyncio.gather(*jobs)
+        return [snap for snap in results if snap is not None]
+
     async def start_capture(self, pairs: List[Pair], interval_seconds: float = 1.0,
                            max_duration_minutes: Optional[int] = None):
         """
         Start capturing L2 order book data for specified pairs.
         
+        Every tick captures all (exchange, pair) combinations concurrently.
+        Ticks sit on a fixed monotonic grid (start + n * interval), so the
+        cadence doesn't drift by the time spent capturing. A cycle that runs
+        past the next tick counts as a missed deadline, and the ticks it
+        overran are skipped instead of being fired back to back.
+        
         Args:
             pairs: List of trading pairs to capture
             interval_seconds: Capture interval in seconds
             max_duration_minutes: Maximum duration to run (None = run indefinitely)
         """
         self.running = True
-        start_time = time.time()
+        start_time = time.monotonic()
+        deadline = start_time
+        stats = self.scheduler_stats
+        for exchange in self.exchanges:
+            self._venue_slots.setdefault(exchange.name, asyncio.Semaphore(self.max_concurrency_per_venue))
         
         logger.info(f"Starting historical data capture for {len(pairs)} pairs")
         logger.info(f"Interval: {interval_seconds}s, Max duration: {max_duration_minutes}min")
@@ -295,36 +696,12 @@ class HistoricalDataService:
         try:
             while self.running:
                 # Check if we've exceeded max duration
-                if max_duration_minutes and (time.time() - start_time) > (max_duration_minutes * 60):
+                if max_duration_minutes and (time.monotonic() - start_time) > (max_duration_minutes * 60):
                     logger.info(f"Reached maximum duration of {max_duration_minutes} minutes")
                     break
                 
-                # Capture snapshots for all pairs on all exchanges
-                snapshots = []
-                capture_start = time.time()
-                
-                for exchange in self.exchanges:
-                    for pair in pairs:
-                        try:
-                            # Get L2 order book
-                            orderbook = await exchange.get_l2_orderbook(pair, depth=100)
-                            
-                            # Calculate capture latency
-                            capture_latency = (time.time() - capture_start) * 1000
-                            
-                            # Generate sequence number
-                            key = f"{exchange.name}_{pair.human()}"
-                            self.sequence_counters[key] = self.sequence_counters.get(key, 0) + 1
-                            
-                            # Create snapshot
-                            snapshot = OrderBookSnapshot.from_orderbook(
-                                orderbook, exchange.name, pair, capture_latency, 
-                                self.sequence_counters[key]
-                            )
-                            snapshots.append(snapshot)
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to capture {pair.human()} on {exchange.name}: {e}")
+                cycle_start = time.monotonic()
+                snapshots = await self._capture_cycle(pairs)
                 
                 # Store snapshots
                 if snapshots:
@@ -334,10 +711,22 @@ class HistoricalDataService:
                     else:
                         logger.error("Failed to store snapshots")
                 
-                # Wait for next interval
-                elapsed = time.time() - capture_start
-                if elapsed < interval_seconds:
-                    await asyncio.sleep(interval_seconds - elapsed)
+                now = time.monotonic()
+                cycle_ms = (now - cycle_start) * 1000
+                stats.ticks += 1
+                stats.last_cycle_ms = cycle_ms
+                stats.max_cycle_ms = max(stats.max_cycle_ms, cycle_ms)
+                
+                # Next tick on the grid; if we're already past it, skip to the first future one
+                deadline += interval_seconds
+                if now > deadline:
+                    overrun = int((now - deadline) // interval_seconds) + 1
+                    stats.missed_deadlines += 1
+                    stats.skipped_ticks += overrun
+                    deadline += overrun * interval_seconds
+                    logger.warning(f"Capture cycle took {cycle_ms:.0f}ms (interval {interval_seconds}s); "
+                                   f"skipped {overrun} tick(s)")
+                await asyncio.sleep(deadline - now)
                     
         except KeyboardInterrupt:
             logger.info("Capture interrupted by user")
@@ -354,9 +743,17 @@ class HistoricalDataService:
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get capture statistics."""
+        stats = self.scheduler_stats
         return {
             "sequence_counters": self.sequence_counters.copy(),
-            "running": self.running
+            "running": self.running,
+            "ticks": stats.ticks,
+            "missed_deadlines": stats.missed_deadlines,
+            "skipped_ticks": stats.skipped_ticks,
+            "last_cycle_ms": round(stats.last_cycle_ms, 3),
+            "max_cycle_ms": round(stats.max_cycle_ms, 3),
+            "job_latency_ms": {key: t.to_dict() for key, t in self.job_timings.items()},
+            "storage": self.storage.get_metrics(),
         }
 
 class DataCaptureManager:
@@ -0,0 +1,250 @@
+# src/xetrade/services/history_query.py
+from __future__ import annotations
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+logger = logging.getLogger(__name__)
+
+LEVEL_COLUMNS = ["timestamp_ms", "sequence_number", "side", "price", "quantity"]
+
+def _as_list(v: Union[str, Iterable[str], None]) -> Optional[List[str]]:
+    if v is None:
+        return None
+    return [v] if isinstance(v, str) else list(v)
+
+def _utc_hour(ts_ms: int) -> datetime:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+
+def to_numpy(table: pa.Table) -> Dict[str, np.ndarray]:
+    """Column name -> NumPy array (dictionary/string columns become object arrays)."""
+    out: Dict[str, np.ndarray] = {}
+    for name in table.column_names:
+        col = table.column(name)
+        if pa.types.is_dictionary(col.type):
+            col = col.cast(col.type.value_type)
+        out[name] = col.to_numpy()
+    return out
+
+class HistoryQuery:
+    """
+    Read-side API over S3ParquetStorage output. Filters on exchange, pair,
+    timestamp_ms and side are handed to pyarrow.dataset, so partitions
+    (exchange=/pair=/date=/hour=) outside the query are never opened, row
+    groups are skipped using their min/max statistics, and only the
+    projected columns are decoded. Results are Arrow tables; to_numpy()
+    turns one into arrays.
+
+        q = HistoryQuery("./data/s3_mock")
+        top = q.top_levels("okx", "BTC-USDT", t0, t1, n=5)
+        last_per_sec = q.resample("okx", "BTC-USDT", t0, t1, every_ms=1000, n=10)
+
+    The flat layout (one row per level) is assumed; a nested-layout
+    dataset is flattened to the same columns by top_levels/resample.
+    Delta-encoded datasets hold diffs, not books, so level queries refuse
+    them; read those with services.replay.OrderBookReplay.
+    """
+
+    def __init__(self, root: str, *, filesystem: Optional[pafs.FileSystem] = None):
+        self.root = root
+        self.filesystem = filesystem or pafs.LocalFileSystem()
+        self.dataset = self._open(root)
+        self.schema = self.dataset.schema
+        self.partitioned = "date" in self.schema.names and "hour" in self.schema.names
+        self.nested = "bids" in self.schema.names
+        self.delta = "keyframe" in self.schema.names
+
+    def _open(self, root: str) -> ds.Dataset:
+        infos = self.filesystem.get_file_info(pafs.FileSelector(root, recursive=True, allow_not_found=True))
+        files = [i.path for i in infos if i.type == pafs.FileType.File and i.base_name.endswith(".parquet")
+                 and not i.base_name.startswith(".")]
+        hive = [p for p in files if "/exchange=" in p.replace(os.sep, "/")]
+        if hive:
+            if len(hive) < len(files):
+                logger.warning(f"{root}: ignoring {len(files) - len(hive)} non-partitioned files")
+            return ds.dataset(hive, format="parquet", filesystem=self.filesystem,
+                              partitioning="hive", partition_base_dir=root)
+        return ds.dataset(files, format="parquet", filesystem=self.filesystem)
+
+    # --- filters ---
+    def _partition_filter(self, start_ms: Optional[int], end_ms: Optional[int]) -> Optional[ds.Expression]:
+        """date/hour bounds so whole hourly partitions are pruned by path."""
+        if not self.partitioned:
+            return None
+        date, hour = ds.field("date"), ds.field("hour")
+        expr = None
+        if start_ms is not None:
+            t0 = _utc_hour(start_ms)
+            d0 = t0.strftime("%Y-%m-%d")
+            expr = (date > d0) | ((date == d0) & (hour >= t0.hour))
+        if end_ms is not None:
+            t1 = _utc_hour(end_ms)
+            d1 = t1.strftime("%Y-%m-%d")
+            upper = (date < d1) | ((date == d1) & (hour <= t1.hour))
+            expr = upper if expr is None else expr & upper
+        return expr
+
+    def build_filter(self, exchanges=None, pairs=None, start_ms: Optional[int] = None,
+                     end_ms: Optional[int] = None, sides=None) -> Optional[ds.Expression]:
+        parts: List[ds.Expression] = []
+        exchanges, pairs, sides = _as_list(exchanges), _as_list(pairs), _as_list(sides)
+        if exchanges:
+            parts.append(ds.field("exchange").isin(exchanges))
+        if pairs:
+            parts.append(ds.field("pair").isin(pairs))
+        if start_ms is not None:
+            parts.append(ds.field("timestamp_ms") >= start_ms)
+        if end_ms is not None:
+            parts.append(ds.field("timestamp_ms") <= end_ms)
+        if sides and not self.nested:
+            parts.append(ds.field("side").isin(sides))
+        pexpr = self._partition_filter(start_ms, end_ms)
+        if pexpr is not None:
+            parts.append(pexpr)
+        if not parts:
+            return None
+        expr = parts[0]
+        for p in parts[1:]:
+            expr = expr & p
+        return expr
+
+    # --- queries ---
+    def scan(self, columns: Optional[Sequence[str]] = None, *, exchanges=None, pairs=None,
+             start_ms: Optional[int] = None, end_ms: Optional[int] = None, sides=None,
+             extra_filter: Optional[ds.Expression] = None) -> pa.Table:
+        """Filtered, projected read; columns=None reads every column."""
+        expr = self.build_filter(exchanges, pairs, start_ms, end_ms, sides)
+        if extra_filter is not None:
+            expr = extra_filter if expr is None else expr & extra_filter
+        return self.dataset.to_table(columns=list(columns) if columns else None, filter=expr)
+
+    def _flatten_nested(self, table: pa.Table, n: Optional[int], sides: Optional[List[str]]) -> pa.Table:
+        """Nested rows -> flat level rows (with 'level'), keeping the first n levels per side."""
+        pieces = []
+        for side, col in (("bid", "bids"), ("ask", "asks")):
+            if sides and side not in sides:
+                continue
+            lists = table.column(col)
+            if n is not None:
+                lists = pc.list_slice(lists, 0, n)
+            parent = pc.list_parent_indices(lists)
+            values = pc.list_flatten(lists)
+            lengths = pc.list_value_length(lists).to_numpy(zero_copy_only=False)
+            level = np.concatenate([np.arange(k) for k in lengths]) if len(lengths) else np.empty(0, np.int64)
+            pieces.append(pa.table({
+                "timestamp_ms": pc.take(table.column("timestamp_ms"), parent),
+                "sequence_number": pc.take(table.column("sequence_number"), parent),
+                "side": pa.array(np.full(len(values), side, dtype=object), type=pa.string()),
+                "level": pa.array(level.astype(np.int32)),
+                "price": pc.struct_field(values, "price"),
+                "quantity": pc.struct_field(values, "qty"),
+            }))
+        if not pieces:
+            return pa.table({c: [] for c in ["timestamp_ms", "sequence_number", "side", "level", "price", "quantity"]})
+        out = pa.concat_tables(pieces)
+        return out.take(pc.sort_indices(out, sort_keys=[("timestamp_ms", "ascending"),
+                                                        ("sequence_number", "ascending")]))
+
+    @staticmethod
+    def _rank_levels(table: pa.Table, n: Optional[int]) -> pa.Table:
+        """Add 'level' (0 = best) per snapshot and side and keep levels < n. Rows must be in book order."""
+        if table.num_rows == 0:
+            return table.append_column("level", pa.array([], type=pa.int32()))
+        ts = table.column("timestamp_ms").to_numpy()
+        seq = table.column("sequence_number").to_numpy()
+        is_bid = pc.equal(table.column("side"), "bid").to_numpy(zero_copy_only=False)
+        change = np.empty(len(ts), dtype=bool)
+        change[0] = True
+        change[1:] = (ts[1:] != ts[:-1]) | (seq[1:] != seq[:-1]) | (is_bid[1:] != is_bid[:-1])
+        starts = np.flatnonzero(change)
+        sizes = np.diff(np.append(starts, len(ts)))
+        level = np.arange(len(ts)) - np.repeat(starts, sizes)
+        table = table.append_column("level", pa.array(level.astype(np.int32)))
+        if n is not None:
+            table = table.filter(pa.array(level < n))
+        return table
+
+    def top_levels(self, exchange: str, pair: str, start_ms: Optional[int] = None,
+                   end_ms: Optional[int] = None, n: int = 10, side: Optional[str] = None,
+                   extra_filter: Optional[ds.Expression] = None) -> pa.Table:
+        """
+        Best n levels of every snapshot of one venue/pair in [start_ms, end_ms].
+        Columns: timestamp_ms, sequence_number, side, level, price, quantity.
+        """
+        if self.delta:
+            raise ValueError(f"{self.root} is delta-encoded; use OrderBookReplay to rebuild books")
+        sides = [side] if side else None
+        if self.nested:
+            cols = ["timestamp_ms", "sequence_number"] + [c for s, c in (("bid", "bids"), ("ask", "asks"))
+                                                          if not sides or s in sides]
+            table = self.scan(cols, exchanges=exchange, pairs=pair, start_ms=start_ms, end_ms=end_ms,
+                              extra_filter=extra_filter)
+            return self._flatten_nested(table, n, sides)
+
+        table = self.scan(LEVEL_COLUMNS, exchanges=exchange, pairs=pair, start_ms=start_ms, end_ms=end_ms,
+                          sides=sides, extra_filter=extra_filter)
+        # stable sort: fragments may come back in any order, level order within a snapshot is kept
+        table = table.take(pc.sort_indices(table, sort_keys=[("timestamp_ms", "ascending"),
+                                                             ("sequence_number", "ascending")]))
+        table = table.cast(pa.schema([f if f.name != "side" else pa.field("side", pa.string())
+                                      for f in table.schema]))
+        ranked = self._rank_levels(table, n)
+        return ranked.select(["timestamp_ms", "sequence_number", "side", "level", "price", "quantity"])
+
+    def resample(self, exchange: str, pair: str, start_ms: Optional[int] = None,
+                 end_ms: Optional[int] = None, every_ms: int = 1000, n: Optional[int] = 10,
+                 side: Optional[str] = None) -> pa.Table:
+        """
+        Last book per every_ms bucket (e.g. 1000 for 1s, 60000 for 1m), top n levels.
+
+        First a key-only pass reads just timestamp_ms/sequence_number to pick
+        the last snapshot in each bucket; then level columns are read only for
+        the chosen timestamps (an isin filter inside the scan). Adds 'bucket_ms'.
+        """
+        if every_ms <= 0:
+            raise ValueError("every_ms must be > 0")
+        keys = self.scan(["timestamp_ms", "sequence_number"], exchanges=exchange, pairs=pair,
+                         start_ms=start_ms, end_ms=end_ms)
+        if keys.num_rows == 0:
+            empty = self.top_levels(exchange, pair, start_ms, end_ms, n=n or 1, side=side)
+            return empty.append_column("bucket_ms", pa.array([], type=pa.int64()))
+        ts = keys.column("timestamp_ms").to_numpy()
+        seq = keys.column("sequence_number").to_numpy()
+        order = np.lexsort((seq, ts))
+        ts, seq = ts[order], seq[order]
+        bucket = ts // every_ms
+        last = np.append(bucket[1:] != bucket[:-1], True)
+        chosen_ts = np.unique(ts[last])
+
+        table = self.top_levels(exchange, pair, start_ms, end_ms, n=n, side=side,
+                                extra_filter=ds.field("timestamp_ms").isin(pa.array(chosen_ts)))
+        if table.num_rows == 0:
+            return table.append_column("bucket_ms", pa.array([], type=pa.int64()))
+        # several snapshots can share a timestamp: keep the highest sequence number
+        t = table.column("timestamp_ms").to_numpy()
+        s = table.column("sequence_number").to_numpy()
+        starts = np.flatnonzero(np.append(True, t[1:] != t[:-1]))
+        max_seq = np.maximum.reduceat(s, starts)
+        keep = s == np.repeat(max_seq, np.diff(np.append(starts, len(t))))
+        table = table.filter(pa.array(keep))
+        bucket_ms = (table.column("timestamp_ms").to_numpy() // every_ms) * every_ms
+        return table.append_column("bucket_ms", pa.array(bucket_ms))
+
+    def snapshot_count(self, *, exchanges=None, pairs=None, start_ms: Optional[int] = None,
+                       end_ms: Optional[int] = None) -> int:
+        keys = self.scan(["timestamp_ms", "sequence_number"], exchanges=exchanges, pairs=pairs,
+                         start_ms=start_ms, end_ms=end_ms)
+        if self.nested:
+            return keys.num_rows
+        if keys.num_rows == 0:
+            return 0
+        ts = keys.column("timestamp_ms").to_numpy()
+        seq = keys.column("sequence_number").to_numpy()
+        return int(np.count_nonzero(np.append(True, (ts[1:] != ts[:-1]) | (seq[1:] != seq[:-1]))))
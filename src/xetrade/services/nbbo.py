@@ -0,0 +1,289 @@
+# src/xetrade/services/nbbo.py
+from __future__ import annotations
+import asyncio
+import heapq
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from xetrade.models import Pair, Quote, ColumnarOrderBook
+from xetrade.exchanges.base import BaseExchange
+
+logger = logging.getLogger(__name__)
+
+class _IndexedHeap:
+    """
+    Binary min-heap of (key, venue) with a venue -> position index, so a
+    venue's entry can be updated or removed in O(log n) instead of being
+    pushed again and lazily skipped.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._pos: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, venue: str) -> bool:
+        return venue in self._pos
+
+    def peek(self) -> Optional[Tuple[float, str]]:
+        return self._heap[0] if self._heap else None
+
+    def set(self, venue: str, key: float) -> None:
+        i = self._pos.get(venue)
+        if i is None:
+            self._heap.append((key, venue))
+            self._pos[venue] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+            return
+        old = self._heap[i][0]
+        if key == old:
+            return
+        self._heap[i] = (key, venue)
+        if key < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, venue: str) -> None:
+        i = self._pos.pop(venue, None)
+        if i is None:
+            return
+        last = self._heap.pop()
+        if i == len(self._heap):
+            return
+        self._heap[i] = last
+        self._pos[last[1]] = i
+        self._sift_up(i)
+        self._sift_down(self._pos[last[1]])
+
+    def _swap(self, i: int, j: int) -> None:
+        h = self._heap
+        h[i], h[j] = h[j], h[i]
+        self._pos[h[i][1]] = i
+        self._pos[h[j][1]] = j
+
+    def _sift_up(self, i: int) -> None:
+        h = self._heap
+        while i > 0:
+            parent = (i - 1) >> 1
+            if h[i] < h[parent]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                break
+
+    def _sift_down(self, i: int) -> None:
+        h = self._heap
+        n = len(h)
+        while True:
+            left = 2 * i + 1
+            smallest = i
+            if left < n and h[left] < h[smallest]:
+                smallest = left
+            if left + 1 < n and h[left + 1] < h[smallest]:
+                smallest = left + 1
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+@dataclass(frozen=True)
+class NBBO:
+    """Best bid and best ask across venues. A side with no live venue has price NaN and venue None."""
+    pair: Pair
+    bid: float
+    bid_venue: Optional[str]
+    ask: float
+    ask_venue: Optional[str]
+    ts_ms: int             # local time the NBBO last changed
+    venues_live: int
+
+    @property
+    def mid(self) -> float:
+        return (self.bid + self.ask) / 2.0
+
+    @property
+    def spread(self) -> float:
+        return self.ask - self.bid
+
+    def is_crossed(self) -> bool:
+        return self.bid >= self.ask
+
+@dataclass
+class NBBOStats:
+    updates: int = 0       # quotes received
+    published: int = 0     # NBBO changes sent to subscribers
+    evicted: int = 0       # venues dropped for staleness
+    poll_errors: int = 0
+
+class NBBOService:
+    """
+    Long-running NBBO for one pair. Venues push quotes in through update()
+    (directly, from pollers started with start_polling, or from a
+    StreamHub via attach_hub); bids and asks live in indexed heaps so each
+    update costs O(log venues). A venue that hasn't quoted for max_age_ms
+    (local receive time) is evicted. Subscribers are called only when the
+    best prices or the venues holding them change.
+    """
+
+    def __init__(self, pair: Pair, *, max_age_ms: int = 5000, sweep_interval: float = 0.5):
+        self.pair = pair
+        self.max_age_ms = max_age_ms
+        self.sweep_interval = sweep_interval
+        self.stats = NBBOStats()
+        self._bids = _IndexedHeap()   # key: -bid
+        self._asks = _IndexedHeap()   # key: ask
+        self._quotes: Dict[str, Quote] = {}
+        self._seen_ms: Dict[str, int] = {}
+        self._expiry: List[Tuple[int, str]] = []  # (seen_ms, venue) min-heap; outdated entries skipped
+        self._subscribers: List[Callable[[NBBO], None]] = []
+        self._current: Optional[NBBO] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sweeper_task: Optional[asyncio.Task] = None
+
+    # --- subscriptions ---
+    def subscribe(self, fn: Callable[[NBBO], None]) -> Callable[[], None]:
+        """fn(nbbo) is called on every NBBO change; returns an unsubscribe function."""
+        self._subscribers.append(fn)
+
+        def _unsubscribe():
+            if fn in self._subscribers:
+                self._subscribers.remove(fn)
+        return _unsubscribe
+
+    def current(self) -> Optional[NBBO]:
+        return self._current
+
+    def quotes(self) -> Dict[str, Quote]:
+        """Live per-venue quotes."""
+        return dict(self._quotes)
+
+    # --- updates ---
+    def update(self, venue: str, quote: Quote, now_ms: Optional[int] = None) -> Optional[NBBO]:
+        """Apply one venue quote; returns the new NBBO if it changed, else None."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        self.stats.updates += 1
+        self._quotes[venue] = quote
+        self._seen_ms[venue] = now_ms
+        heapq.heappush(self._expiry, (now_ms, venue))
+
+        if quote.bid > 0 and not math.isnan(quote.bid):
+            self._bids.set(venue, -quote.bid)
+        else:
+            self._bids.remove(venue)
+        if quote.ask > 0 and not math.isnan(quote.ask):
+            self._asks.set(venue, quote.ask)
+        else:
+            self._asks.remove(venue)
+
+        self._evict(now_ms)
+        return self._publish(now_ms)
+
+    def remove(self, venue: str, now_ms: Optional[int] = None) -> Optional[NBBO]:
+        """Drop a venue (e.g. its feed failed); returns the new NBBO if it changed."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        self._drop(venue)
+        return self._publish(now_ms)
+
+    def sweep(self, now_ms: Optional[int] = None) -> Optional[NBBO]:
+        """Evict stale venues without a new quote arriving."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        if not self._evict(now_ms):
+            return None
+        return self._publish(now_ms)
+
+    def _drop(self, venue: str) -> None:
+        self._quotes.pop(venue, None)
+        self._seen_ms.pop(venue, None)
+        self._bids.remove(venue)
+        self._asks.remove(venue)
+
+    def _evict(self, now_ms: int) -> int:
+        cutoff = now_ms - self.max_age_ms
+        evicted = 0
+        while self._expiry and self._expiry[0][0] < cutoff:
+            seen, venue = heapq.heappop(self._expiry)
+            if self._seen_ms.get(venue) != seen:
+                continue  # venue quoted again since; a newer entry is in the heap
+            self._drop(venue)
+            evicted += 1
+            logger.warning(f"NBBO {self.pair.human()}: evicted stale venue {venue}")
+        self.stats.evicted += evicted
+        return evicted
+
+    def _publish(self, now_ms: int) -> Optional[NBBO]:
+        top_bid = self._bids.peek()
+        top_ask = self._asks.peek()
+        bid, bid_venue = (-top_bid[0], top_bid[1]) if top_bid else (float("nan"), None)
+        ask, ask_venue = (top_ask[0], top_ask[1]) if top_ask else (float("nan"), None)
+        prev = self._current
+        # NaN != NaN, so compare venues first and only then prices
+        if prev is not None and prev.bid_venue == bid_venue and prev.ask_venue == ask_venue \
+                and (bid_venue is None or prev.bid == bid) and (ask_venue is None or prev.ask == ask):
+            return None
+        nbbo = NBBO(pair=self.pair, bid=bid, bid_venue=bid_venue, ask=ask, ask_venue=ask_venue,
+                    ts_ms=now_ms, venues_live=len(self._quotes))
+        self._current = nbbo
+        self.stats.published += 1
+        for fn in list(self._subscribers):
+            try:
+                fn(nbbo)
+            except Exception as e:
+                logger.error(f"NBBO subscriber failed: {e}")
+        return nbbo
+
+    # --- feeds ---
+    def attach_hub(self, hub) -> None:
+        """Feed from a services.streaming.StreamHub (top of each streamed book)."""
+        def _on_book(venue: str, pair: Pair, book: ColumnarOrderBook) -> None:
+            if pair == self.pair:
+                self.update(venue, Quote(bid=book.best_bid(), ask=book.best_ask(), ts_ms=book.ts_ms))
+        hub.add_listener(_on_book)
+
+    async def _poll(self, ex: BaseExchange, interval: float) -> None:
+        # persistent per-venue loop: one task for the service's lifetime
+        while True:
+            try:
+                self.update(ex.name, await ex.get_best_bid_ask(self.pair))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats.poll_errors += 1
+                logger.warning(f"NBBO poll {ex.name} failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def _sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def start_polling(self, exchanges: Iterable[BaseExchange], interval: float = 1.0) -> None:
+        """Poll every venue's best bid/ask in the background."""
+        self._ensure_sweeper()
+        for ex in exchanges:
+            self._tasks.append(asyncio.create_task(self._poll(ex, interval)))
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper_task is None:
+            self._sweeper_task = asyncio.create_task(self._sweeper())
+            self._tasks.append(self._sweeper_task)
+
+    def start(self) -> None:
+        """Start staleness sweeping for push-fed services (update()/attach_hub)."""
+        self._ensure_sweeper()
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        self._sweeper_task = None
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
@@ -1,38 +1,50 @@
 # src/services/price_impact.py
 from __future__ import annotations
-from typing import Tuple
-from xetrade.models import OrderBook, Side
+from dataclasses import dataclass
+from typing import Dict, Iterable, Sequence, Tuple
 
-def walk_book(book: OrderBook, side: Side, trade_volume_quote: float) -> Tuple[float, float]:
+import numpy as np
+
+from xetrade.models import ColumnarOrderBook, AnyOrderBook, Side
+
+def walk_book(book: AnyOrderBook, side: Side, trade_volume_quote: float) -> Tuple[float, float]:
     """
     Simulate filling a market order of size 'trade_volume_quote' (in quote currency).
     Returns (avg_execution_price, filled_base_qty).
 
     For buys we consume asks from lowest up.
     For sells we consume bids from highest down.
+
+    A level is taken whole while the running quote total stays below the
+    target; the level that reaches it is taken partially. walk_book_batch
+    uses the same arithmetic, so both return identical floats.
     """
     if trade_volume_quote <= 0:
         raise ValueError("trade_volume_quote must be > 0")
 
+    if isinstance(book, ColumnarOrderBook):
+        avg, filled = walk_book_batch(book, side, [trade_volume_quote])
+        return float(avg[0]), float(filled[0])
+
     levels = book.asks if side == "buy" else book.bids
 
-    remaining_q = float(trade_volume_quote)
+    target_q = float(trade_volume_quote)
     spent_q = 0.0         # total quote spent/received
     filled_base = 0.0     # total base acquired/sold
 
     for lvl in levels:
         level_cap_q = lvl.price * lvl.qty  # quote capacity at this level
-        take_q = min(remaining_q, level_cap_q)
-        if take_q <= 0:
+        if level_cap_q <= 0:
             continue
-        base_taken = take_q / lvl.price
-
+        if spent_q + level_cap_q < target_q:
+            # whole level consumed
+            spent_q += level_cap_q
+            filled_base += level_cap_q / lvl.price
+            continue
+        take_q = target_q - spent_q
         spent_q += take_q
-        filled_base += base_taken
-        remaining_q -= take_q
-
-        if remaining_q <= 1e-12:
-            break
+        filled_base += take_q / lvl.price
+        break
 
     if filled_base == 0.0:
         # book too thin for requested size
@@ -42,7 +54,84 @@ def walk_book(book: OrderBook, side: Side, trade_volume_quote: float) -> Tuple[f
     return avg_exec, filled_base
 
 
-def price_impact_pct(book: OrderBook, side: Side, trade_volume_quote: float) -> float:
+def _side_arrays(book: AnyOrderBook, side: Side) -> Tuple[np.ndarray, np.ndarray]:
+    cbook = ColumnarOrderBook.from_orderbook(book)
+    return (cbook.ask_px, cbook.ask_qty) if side == "buy" else (cbook.bid_px, cbook.bid_qty)
+
+
+def walk_book_batch(book: AnyOrderBook, side: Side, sizes_quote: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    walk_book for many order sizes at once.
+    Returns (avg_execution_price[], filled_base_qty[]) aligned with sizes_quote.
+
+    Cumulative quote capacity is built once per side, then each size is
+    located with a binary search, so cost is O(levels + sizes * log(levels)).
+    """
+    sizes = np.asarray(sizes_quote, dtype=np.float64).ravel()
+    if sizes.size and not np.all(sizes > 0):
+        raise ValueError("trade_volume_quote must be > 0")
+
+    px, qty = _side_arrays(book, side)
+    caps = px * qty
+    usable = caps > 0
+    caps = np.where(usable, caps, 0.0)
+    base = np.divide(caps, px, out=np.zeros_like(caps), where=usable)
+
+    # running totals *before* each level, so index k = "levels [0, k) taken whole"
+    cum_q = np.concatenate(([0.0], np.cumsum(caps)))
+    cum_b = np.concatenate(([0.0], np.cumsum(base)))
+
+    # first level whose inclusive total reaches the target
+    k = np.searchsorted(cum_q[1:], sizes, side="left")
+    n = len(caps)
+    inside = k < n
+
+    spent = cum_q[np.minimum(k, n)].copy()
+    filled = cum_b[np.minimum(k, n)].copy()
+    if np.any(inside):
+        ki = k[inside]
+        take = sizes[inside] - spent[inside]
+        spent[inside] = spent[inside] + take
+        filled[inside] = filled[inside] + take / px[ki]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = np.where(filled > 0, spent / filled, np.nan)
+    return avg, filled
+
+
+@dataclass(frozen=True, eq=False)
+class ImpactCurve:
+    """Size-vs-slippage curve for one side of one book."""
+    side: Side
+    sizes_quote: np.ndarray
+    avg_price: np.ndarray
+    filled_base: np.ndarray
+    impact_pct: np.ndarray
+    mid: float
+
+
+def impact_curve(book: AnyOrderBook, sizes_quote: Sequence[float],
+                 sides: Iterable[Side] = ("buy", "sell")) -> Dict[Side, ImpactCurve]:
+    """
+    Average execution price, filled base and % impact vs mid for every size,
+    on each requested side. Per-size values equal walk_book/price_impact_pct.
+    """
+    sizes = np.asarray(sizes_quote, dtype=np.float64).ravel()
+    cbook = ColumnarOrderBook.from_orderbook(book)
+    mid = cbook.mid()
+    out: Dict[Side, ImpactCurve] = {}
+    for side in sides:
+        avg, filled = walk_book_batch(cbook, side, sizes)
+        if mid > 0:
+            impact = np.where(filled > 0, (avg - mid) / mid * 100.0, np.nan)
+        else:
+            impact = np.full_like(avg, np.nan)
+        out[side] = ImpactCurve(side=side, sizes_quote=sizes, avg_price=avg,
+                                filled_base=filled, impact_pct=impact, mid=mid)
+    return out
+
+
+def price_impact_pct(book: AnyOrderBook, side: Side, trade_volume_quote: float) -> float:
     """
     Computes % impact relative to mid-price:
         (avg_exec - mid) / mid * 100
@@ -0,0 +1,330 @@
+# src/xetrade/services/replay.py
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from xetrade.models import ColumnarOrderBook, AnyOrderBook
+from xetrade.utils.book_delta import DeltaDecoder
+from xetrade.utils.decode import json_loads
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ReplayEvent:
+    """One captured snapshot, in replay order."""
+    exchange: str
+    pair: str
+    ts_ms: int
+    sequence_number: int
+    book: AnyOrderBook
+
+def _sort_key(ev: ReplayEvent) -> Tuple:
+    return (ev.ts_ms, ev.exchange, ev.pair, ev.sequence_number)
+
+def _hive_fields(path: str) -> Dict[str, str]:
+    """{'exchange': ..., 'pair': ..., 'date': ..., 'hour': ...} from an exchange=/pair=/date=/hour= path."""
+    fields: Dict[str, str] = {}
+    for seg in os.path.normpath(path).split(os.sep):
+        if "=" in seg:
+            k, v = seg.split("=", 1)
+            fields[k] = v
+    return fields
+
+def _levels(rows: Sequence[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(rows)
+    px = np.fromiter((r["price"] for r in rows), dtype=np.float64, count=n)
+    qty = np.fromiter((r["qty"] for r in rows), dtype=np.float64, count=n)
+    return px, qty
+
+def _pair_arrays(levels: List[Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    if not levels:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    arr = np.array(levels, dtype=np.float64)
+    return arr[:, 0].copy(), arr[:, 1].copy()
+
+def _delta_book(decoder: DeltaDecoder, exchange: str, pair: str, keyframe: Optional[bool],
+                bids: Iterable[Tuple[float, float]], asks: Iterable[Tuple[float, float]],
+                ts: int) -> Optional[ColumnarOrderBook]:
+    """Full book for one delta-encoded record, or None if it can't be resolved yet."""
+    full = decoder.apply(exchange, pair, keyframe, list(bids), list(asks))
+    if full is None:
+        return None
+    bid_px, bid_qty = _pair_arrays(full[0])
+    ask_px, ask_qty = _pair_arrays(full[1])
+    return ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts)
+
+# --- per-file readers (file order) ---
+
+def _iter_jsonl(path: str) -> Iterator[ReplayEvent]:
+    """LocalFileStorage output: one OrderBookSnapshot.to_dict() (or delta-encoded record) per line."""
+    decoder = DeltaDecoder()
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json_loads(line)
+            ts = int(row["timestamp_ms"])
+            if "keyframe" in row:
+                book = _delta_book(decoder, row["exchange"], row["pair"], row["keyframe"],
+                                   ((r["price"], r["qty"]) for r in row["bids"]),
+                                   ((r["price"], r["qty"]) for r in row["asks"]), ts)
+                if book is None:
+                    continue
+            else:
+                bid_px, bid_qty = _levels(row["bids"])
+                ask_px, ask_qty = _levels(row["asks"])
+                book = ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=ts)
+            yield ReplayEvent(
+                exchange=row["exchange"], pair=row["pair"], ts_ms=ts,
+                sequence_number=int(row.get("sequence_number", 0)),
+                book=book,
+            )
+
+def _iter_parquet(path: str, batch_size: int = 65536) -> Iterator[ReplayEvent]:
+    """
+    S3ParquetStorage output, flat (one row per level) or nested (one row per
+    snapshot) layout. Read batch by batch; exchange/pair come from the file
+    or, in the partitioned layout, from the path. Delta-encoded nested files
+    (a 'keyframe' column) are rebuilt into full books.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    names = pf.schema_arrow.names
+    fields = _hive_fields(os.path.dirname(path))
+
+    def _strings(batch, name: str, n: int) -> np.ndarray:
+        if name in batch.schema.names:
+            return batch.column(name).to_numpy(zero_copy_only=False).astype(object)
+        return np.full(n, fields.get(name, ""), dtype=object)
+
+    if "bids" in names:
+        decoder = DeltaDecoder() if "keyframe" in names else None
+        for batch in pf.iter_batches(batch_size=batch_size):
+            n = batch.num_rows
+            ex = _strings(batch, "exchange", n)
+            pair = _strings(batch, "pair", n)
+            ts = batch.column("timestamp_ms").to_numpy()
+            seq = batch.column("sequence_number").to_numpy()
+            sides = []
+            for side in ("bids", "asks"):
+                col = batch.column(side)
+                offsets = col.offsets.to_numpy()
+                values = col.flatten()
+                sides.append((offsets, values.field("price").to_numpy(), values.field("qty").to_numpy()))
+            (bo, bp, bq), (ao, ap, aq) = sides
+            if decoder is not None:
+                keyframe = batch.column("keyframe").to_pylist()  # None: written without delta encoding
+                for i in range(n):
+                    t = int(ts[i])
+                    book = _delta_book(decoder, str(ex[i]), str(pair[i]), keyframe[i],
+                                       zip(bp[bo[i]:bo[i + 1]].tolist(), bq[bo[i]:bo[i + 1]].tolist()),
+                                       zip(ap[ao[i]:ao[i + 1]].tolist(), aq[ao[i]:ao[i + 1]].tolist()), t)
+                    if book is not None:
+                        yield ReplayEvent(str(ex[i]), str(pair[i]), t, int(seq[i]), book)
+                continue
+            for i in range(n):
+                t = int(ts[i])
+                book = ColumnarOrderBook(bid_px=bp[bo[i]:bo[i + 1]], bid_qty=bq[bo[i]:bo[i + 1]],
+                                         ask_px=ap[ao[i]:ao[i + 1]], ask_qty=aq[ao[i]:ao[i + 1]], ts_ms=t)
+                yield ReplayEvent(str(ex[i]), str(pair[i]), t, int(seq[i]), book)
+        return
+
+    # flat: consecutive rows with the same (exchange, pair, ts, seq) form one snapshot;
+    # a snapshot may straddle a batch boundary, so the unfinished tail is carried over
+    carry: Optional[Dict[str, np.ndarray]] = None
+    for batch in pf.iter_batches(batch_size=batch_size):
+        n = batch.num_rows
+        cols = {
+            "exchange": _strings(batch, "exchange", n),
+            "pair": _strings(batch, "pair", n),
+            "ts": batch.column("timestamp_ms").to_numpy(),
+            "seq": batch.column("sequence_number").to_numpy(),
+            "is_bid": pc.equal(batch.column("side"), "bid").to_numpy(zero_copy_only=False),
+            "price": batch.column("price").to_numpy(),
+            "qty": batch.column("quantity").to_numpy(),
+        }
+        if carry is not None:
+            cols = {k: np.concatenate([carry[k], v]) for k, v in cols.items()}
+        n = len(cols["ts"])
+        change = (cols["ts"][1:] != cols["ts"][:-1]) | (cols["seq"][1:] != cols["seq"][:-1]) \
+            | (cols["exchange"][1:] != cols["exchange"][:-1]) | (cols["pair"][1:] != cols["pair"][:-1])
+        starts = np.concatenate(([0], np.flatnonzero(change) + 1))
+        # the last group may continue in the next batch
+        for a, b in zip(starts[:-1], starts[1:]):
+            yield _flat_event(cols, a, b)
+        last = int(starts[-1]) if n else 0
+        carry = {k: v[last:] for k, v in cols.items()} if n else None
+    if carry is not None and len(carry["ts"]):
+        yield _flat_event(carry, 0, len(carry["ts"]))
+
+def _flat_event(cols: Dict[str, np.ndarray], a: int, b: int) -> ReplayEvent:
+    is_bid = cols["is_bid"][a:b]
+    px = cols["price"][a:b]
+    qty = cols["qty"][a:b]
+    ts = int(cols["ts"][a])
+    book = ColumnarOrderBook(bid_px=px[is_bid], bid_qty=qty[is_bid], ask_px=px[~is_bid], ask_qty=qty[~is_bid], ts_ms=ts)
+    return ReplayEvent(str(cols["exchange"][a]), str(cols["pair"][a]), ts, int(cols["seq"][a]), book)
+
+def _reorder(events: Iterable[ReplayEvent], window_ms: int) -> Iterator[ReplayEvent]:
+    """
+    Emit events in timestamp order, assuming none arrives more than
+    window_ms behind the newest seen (venue clocks and capture order differ
+    slightly). Holds at most window_ms worth of events.
+    """
+    heap: List[Tuple[Tuple, int, ReplayEvent]] = []
+    counter = itertools.count()
+    newest = None
+    for ev in events:
+        newest = ev.ts_ms if newest is None else max(newest, ev.ts_ms)
+        heapq.heappush(heap, (_sort_key(ev), next(counter), ev))
+        while heap and heap[0][2].ts_ms <= newest - window_ms:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+class OrderBookReplay:
+    """
+    Replays captured books (LocalFileStorage JSONL and S3ParquetStorage
+    Parquet, flat or partitioned) in timestamp order across venues and pairs.
+
+    Files are grouped into streams: one per (exchange, pair) in the
+    partitioned layout, chained hour by hour, and one per directory of
+    rotated JSONL / flat Parquet files, chained by name. Streams are then
+    k-way merged, so memory holds one pending event per stream plus a
+    reorder_window_ms buffer, not the dataset. Partitioned files outside
+    the venue/pair/time filters are never opened.
+
+        for ev in OrderBookReplay("./data", exchanges=["binance"]):
+            ...
+        async for ev in OrderBookReplay("./data/s3_mock").replay(speed=10):
+            ...  # 10x real time
+    """
+
+    def __init__(self, paths: Union[str, Sequence[str]], *,
+                 exchanges: Optional[Iterable[str]] = None,
+                 pairs: Optional[Iterable[str]] = None,
+                 start_ms: Optional[int] = None,
+                 end_ms: Optional[int] = None,
+                 as_orderbook: bool = False,
+                 reorder_window_ms: int = 5000):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.exchanges = set(exchanges) if exchanges else None
+        self.pairs = set(pairs) if pairs else None
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.as_orderbook = as_orderbook
+        self.reorder_window_ms = reorder_window_ms
+
+    # --- discovery ---
+    def _files(self) -> List[str]:
+        out: List[str] = []
+        for path in self.paths:
+            if os.path.isfile(path):
+                out.append(path)
+                continue
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+                out.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                           if not f.startswith(".") and f.endswith((".jsonl", ".parquet")))
+        return out
+
+    def _hour_in_range(self, fields: Dict[str, str]) -> bool:
+        if "date" not in fields or "hour" not in fields:
+            return True
+        hour = datetime.strptime(f"{fields['date']} {fields['hour']}", "%Y-%m-%d %H").replace(tzinfo=timezone.utc)
+        start = int(hour.timestamp() * 1000)
+        if self.end_ms is not None and start > self.end_ms:
+            return False
+        if self.start_ms is not None and start + 3600_000 <= self.start_ms:
+            return False
+        return True
+
+    def _streams(self) -> List[Iterator[ReplayEvent]]:
+        # stream key -> {hour dir -> files}
+        groups: Dict[Tuple, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+        for path in self._files():
+            d = os.path.dirname(path)
+            fields = _hive_fields(d)
+            if "exchange" in fields or "pair" in fields:
+                if self.exchanges and fields.get("exchange") not in self.exchanges:
+                    continue
+                if self.pairs and fields.get("pair") not in self.pairs:
+                    continue
+                if not self._hour_in_range(fields):
+                    continue
+                key = ("hive", fields.get("exchange"), fields.get("pair"))
+                groups[key][d].append(path)
+            else:
+                # rotated files in one directory follow each other in time
+                groups[("dir", d)][path].append(path)
+
+        streams: List[Iterator[ReplayEvent]] = []
+        for key, by_hour in groups.items():
+            def _chain(by_hour=by_hour) -> Iterator[ReplayEvent]:
+                for hour_dir in sorted(by_hour):
+                    files = by_hour[hour_dir]
+                    # files within one partition may overlap in time (before compaction)
+                    its = [self._read(f) for f in files]
+                    if len(its) == 1:
+                        yield from its[0]
+                    else:
+                        yield from heapq.merge(*its, key=_sort_key)
+            streams.append(_reorder(_chain(), self.reorder_window_ms))
+        return streams
+
+    def _read(self, path: str) -> Iterator[ReplayEvent]:
+        reader = _iter_jsonl(path) if path.endswith(".jsonl") else _iter_parquet(path)
+        for ev in reader:
+            if self.exchanges and ev.exchange not in self.exchanges:
+                continue
+            if self.pairs and ev.pair not in self.pairs:
+                continue
+            if self.start_ms is not None and ev.ts_ms < self.start_ms:
+                continue
+            if self.end_ms is not None and ev.ts_ms > self.end_ms:
+                continue
+            yield ev
+
+    # --- iteration ---
+    def __iter__(self) -> Iterator[ReplayEvent]:
+        merged = heapq.merge(*self._streams(), key=_sort_key)
+        if not self.as_orderbook:
+            return merged
+        return (ReplayEvent(ev.exchange, ev.pair, ev.ts_ms, ev.sequence_number, ev.book.to_orderbook())
+                for ev in merged)
+
+    async def replay(self, speed: Optional[float] = None, yield_every: int = 256) -> AsyncIterator[ReplayEvent]:
+        """
+        Async replay. speed=None runs as fast as possible (handing control
+        back to the loop every yield_every events); speed=k paces events so
+        that k ms of capture time pass per ms of wall time.
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be > 0")
+        wall0: Optional[float] = None
+        ts0 = 0
+        for i, ev in enumerate(self):
+            if speed is not None:
+                if wall0 is None:
+                    wall0, ts0 = time.monotonic(), ev.ts_ms
+                delay = wall0 + (ev.ts_ms - ts0) / 1000.0 / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % yield_every == 0:
+                await asyncio.sleep(0)
+            yield ev
+
+    def __aiter__(self) -> AsyncIterator[ReplayEvent]:
+        return self.replay()
@@ -0,0 +1,442 @@
+# src/xetrade/services/streaming.py
+from __future__ import annotations
+import asyncio
+import base64
+import bisect
+import json
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TextIO, Tuple
+
+import aiohttp
+import numpy as np
+
+from xetrade.models import Pair, BookDelta, ColumnarOrderBook
+from xetrade.exchanges.base import BaseExchange
+from xetrade.utils.http import http
+
+logger = logging.getLogger(__name__)
+
+APPLIED = "applied"
+STALE = "stale"   # already covered by the current book (e.g. buffered before the snapshot)
+GAP = "gap"       # an update was missed; the book must be re-synced
+
+class LocalOrderBook:
+    """
+    Book maintained from a snapshot plus deltas.
+    Each side is a price->qty dict plus a sorted key list (bids keyed by
+    -price), so an update is a dict write and a bisect insert/delete rather
+    than a rebuild, and the top N levels are a slice.
+    """
+
+    def __init__(self):
+        self._bids: Dict[float, float] = {}
+        self._asks: Dict[float, float] = {}
+        self._bid_keys: List[float] = []   # -price ascending => best bid first
+        self._ask_keys: List[float] = []   # price ascending  => best ask first
+        # venue strings per price, kept only for venues whose checksum needs them
+        self._raw_bids: Dict[float, Tuple[str, str]] = {}
+        self._raw_asks: Dict[float, Tuple[str, str]] = {}
+        self.seq: Optional[int] = None
+        self.ts_ms: int = 0
+        self.updates = 0
+
+    # --- mutation ---
+    @staticmethod
+    def _set(levels: Dict[float, float], keys: List[float], key: float, price: float, qty: float) -> None:
+        if qty <= 0:
+            if levels.pop(price, None) is not None:
+                i = bisect.bisect_left(keys, key)
+                if i < len(keys) and keys[i] == key:
+                    del keys[i]
+            return
+        if price not in levels:
+            bisect.insort(keys, key)
+        levels[price] = qty
+
+    @staticmethod
+    def _set_raw(raw: Dict[float, Tuple[str, str]], price: float, qty: float, text: Tuple[str, str]) -> None:
+        if qty <= 0:
+            raw.pop(price, None)
+        else:
+            raw[price] = text
+
+    def _rows(self, levels: List[Tuple[float, float]], seqs: Optional[List[int]]) -> List[Tuple[float, float]]:
+        # a message straddling the snapshot carries rows the snapshot already has
+        if seqs is None or self.seq is None:
+            return levels
+        return [lvl for lvl, seq in zip(levels, seqs) if seq > self.seq]
+
+    def _apply_levels(self, delta: BookDelta) -> None:
+        for price, qty in self._rows(delta.bids, delta.bid_seqs):
+            self._set(self._bids, self._bid_keys, -price, price, qty)
+        for price, qty in self._rows(delta.asks, delta.ask_seqs):
+            self._set(self._asks, self._ask_keys, price, price, qty)
+        if delta.raw_bids is not None:
+            for (price, qty), text in zip(delta.bids, delta.raw_bids):
+                self._set_raw(self._raw_bids, price, qty, text)
+        if delta.raw_asks is not None:
+            for (price, qty), text in zip(delta.asks, delta.raw_asks):
+                self._set_raw(self._raw_asks, price, qty, text)
+
+    def reset(self, snapshot: BookDelta) -> None:
+        self._bids.clear()
+        self._asks.clear()
+        self._bid_keys.clear()
+        self._ask_keys.clear()
+        self._raw_bids.clear()
+        self._raw_asks.clear()
+        self._apply_levels(snapshot)
+        self.seq = snapshot.last_seq
+        self.ts_ms = snapshot.ts_ms
+        self.updates = 0
+
+    def check_sequence(self, delta: BookDelta) -> str:
+        """Classify an update against the current sequence without applying it."""
+        if self.seq is None:
+            return APPLIED
+        if delta.prev_seq is not None:
+            if delta.prev_seq == self.seq:
+                return APPLIED
+            if delta.last_seq is not None and delta.last_seq <= self.seq:
+                return STALE
+            return GAP
+        if delta.last_seq is not None and delta.last_seq <= self.seq:
+            return STALE
+        if delta.first_seq is not None and delta.first_seq > self.seq + 1:
+            return GAP
+        return APPLIED
+
+    def apply(self, delta: BookDelta) -> str:
+        status = self.check_sequence(delta)
+        if status != APPLIED:
+            return status
+        self._apply_levels(delta)
+        if delta.last_seq is not None:
+            self.seq = delta.last_seq
+        self.ts_ms = delta.ts_ms or self.ts_ms
+        self.updates += 1
+        return APPLIED
+
+    # --- reads ---
+    def top_bids(self, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        keys = self._bid_keys if n is None else self._bid_keys[:n]
+        return [(-k, self._bids[-k]) for k in keys]
+
+    def top_asks(self, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        keys = self._ask_keys if n is None else self._ask_keys[:n]
+        return [(k, self._asks[k]) for k in keys]
+
+    def top_raw_bids(self, n: int) -> List[Tuple[str, str]]:
+        """Best n bids as the venue's original (price, qty) strings."""
+        return [self._raw_bids[-k] for k in self._bid_keys[:n]]
+
+    def top_raw_asks(self, n: int) -> List[Tuple[str, str]]:
+        return [self._raw_asks[k] for k in self._ask_keys[:n]]
+
+    def best_bid(self) -> float:
+        return -self._bid_keys[0] if self._bid_keys else float("nan")
+
+    def best_ask(self) -> float:
+        return self._ask_keys[0] if self._ask_keys else float("nan")
+
+    def depth(self) -> Tuple[int, int]:
+        return len(self._bid_keys), len(self._ask_keys)
+
+    def to_columnar(self, depth: Optional[int] = None) -> ColumnarOrderBook:
+        bk = self._bid_keys if depth is None else self._bid_keys[:depth]
+        ak = self._ask_keys if depth is None else self._ask_keys[:depth]
+        bid_px = -np.fromiter(bk, dtype=np.float64, count=len(bk))
+        ask_px = np.fromiter(ak, dtype=np.float64, count=len(ak))
+        bid_qty = np.fromiter((self._bids[-k] for k in bk), dtype=np.float64, count=len(bk))
+        ask_qty = np.fromiter((self._asks[k] for k in ak), dtype=np.float64, count=len(ak))
+        return ColumnarOrderBook(bid_px=bid_px, bid_qty=bid_qty, ask_px=ask_px, ask_qty=ask_qty, ts_ms=self.ts_ms)
+
+@dataclass
+class StreamStats:
+    frames: int = 0
+    updates_applied: int = 0
+    stale_dropped: int = 0
+    gaps: int = 0
+    checksums_verified: int = 0
+    checksum_mismatches: int = 0
+    resyncs: int = 0
+    reconnects: int = 0
+    books_emitted: int = 0
+
+class _Resubscribe(Exception):
+    """The local book can't be repaired in place (gap on a WS-snapshot venue, checksum mismatch)."""
+
+class OrderBookStream:
+    """
+    Streams one (venue, pair) book over the venue's diff-depth WebSocket.
+
+    The adapter supplies the protocol (endpoint, subscribe frames, message
+    parsing, REST snapshot). Deltas that arrive before the snapshot are
+    buffered and replayed onto it; any sequence gap triggers a re-sync.
+    Iterating yields a ColumnarOrderBook (top `depth` levels) after every
+    applied message.
+
+    ws_url / snapshot override the adapter's endpoint and REST snapshot
+    (used to point a stream at ReplayWebSocketServer). record_path appends
+    every raw frame to a JSONL file that the replay server can play back;
+    the file stays open, is flushed every record_flush_interval seconds
+    and is closed by close().
+    """
+
+    def __init__(self, exchange: BaseExchange, pair: Pair, depth: int = 100, *,
+                 ws_url: Optional[str] = None,
+                 snapshot: Optional[Callable[[], Awaitable[BookDelta]]] = None,
+                 record_path: Optional[str] = None,
+                 record_flush_interval: float = 1.0,
+                 reconnect_backoff: float = 1.0,
+                 max_reconnects: Optional[int] = None):
+        self.exchange = exchange
+        self.pair = pair
+        self.depth = depth
+        self.ws_url = ws_url
+        self._snapshot_fn = snapshot
+        self.record_path = record_path
+        self.record_flush_interval = record_flush_interval
+        self._record_file: Optional[TextIO] = None
+        self._record_flushed = 0.0
+        self.reconnect_backoff = reconnect_backoff
+        self.max_reconnects = max_reconnects
+        self.book = LocalOrderBook()
+        self.stats = StreamStats()
+        self._closed = False
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.exchange.name, self.pair.human()
+
+    def latest(self) -> ColumnarOrderBook:
+        return self.book.to_columnar(self.depth)
+
+    def close(self) -> None:
+        self._closed = True
+        self._close_record()
+
+    async def _fetch_snapshot(self) -> BookDelta:
+        if self._snapshot_fn is not None:
+            return await self._snapshot_fn()
+        return await self.exchange.ws_book_snapshot(self.pair, self.depth)
+
+    def _record(self, raw: Any) -> None:
+        if not self.record_path or self._closed:
+            return
+        now = time.monotonic()
+        if self._record_file is None:
+            # one handle for the whole stream; writes land in its buffer, not on disk
+            self._record_file = open(self.record_path, "a", buffering=1 << 20)
+            self._record_flushed = now
+        row: Dict[str, Any] = {"ts_ms": int(time.time() * 1000)}
+        if isinstance(raw, bytes):
+            row["b64"] = base64.b64encode(raw).decode("ascii")
+        else:
+            row["text"] = raw
+        self._record_file.write(json.dumps(row) + "\n")
+        if now - self._record_flushed >= self.record_flush_interval:
+            self._record_file.flush()
+            self._record_flushed = now
+
+    def _close_record(self) -> None:
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
+
+    async def _pinger(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        msg = self.exchange.ws_ping_message()
+        if msg is None:
+            return
+        while not ws.closed:
+            await asyncio.sleep(self.exchange.ws_ping_interval)
+            payload = msg if isinstance(msg, str) else json.dumps(msg)
+            await ws.send_str(payload)
+
+    def _verify(self, delta: BookDelta) -> None:
+        """Compare the local book against the venue checksum carried by delta, if any."""
+        if delta.checksum is None:
+            return
+        local = self.exchange.ws_checksum(self.book)
+        if local is None:
+            return
+        if local != delta.checksum:
+            self.stats.checksum_mismatches += 1
+            raise _Resubscribe(f"checksum mismatch (local {local}, venue {delta.checksum})")
+        self.stats.checksums_verified += 1
+
+    def __aiter__(self) -> AsyncIterator[ColumnarOrderBook]:
+        return self._run()
+
+    async def _run(self) -> AsyncIterator[ColumnarOrderBook]:
+        attempts = 0
+        try:
+            while not self._closed:
+                try:
+                    async for book in self._session():
+                        attempts = 0
+                        yield book
+                    if self._closed:
+                        return
+                    logger.warning(f"{self.key} stream closed by venue; reconnecting")
+                except _Resubscribe as e:
+                    self.stats.resyncs += 1
+                    logger.warning(f"{self.key} {e}; resubscribing")
+                except Exception as e:
+                    # network errors and failed REST snapshots alike: reconnect and re-sync
+                    logger.warning(f"{self.key} stream error: {e}")
+                attempts += 1
+                self.stats.reconnects += 1
+                if self.max_reconnects is not None and attempts > self.max_reconnects:
+                    raise RuntimeError(f"{self.key} stream gave up after {self.max_reconnects} reconnects")
+                await asyncio.sleep(min(30.0, self.reconnect_backoff * (2 ** (attempts - 1))))
+        finally:
+            self._close_record()
+
+    async def _session(self) -> AsyncIterator[ColumnarOrderBook]:
+        ex = self.exchange
+        url = self.ws_url or await ex.ws_endpoint()
+        session = await http.session(ex.name)
+        async with session.ws_connect(url, heartbeat=ex.ws_heartbeat) as ws:
+            for msg in ex.ws_subscribe_messages(self.pair, self.depth):
+                await ws.send_str(msg if isinstance(msg, str) else json.dumps(msg))
+            pinger = asyncio.create_task(self._pinger(ws))
+
+            rest_snapshot = ex.ws_snapshot_via_rest
+            synced = False
+            buffer: List[BookDelta] = []
+            # per the venues' sync guides: subscribe first, then fetch the snapshot
+            snap_task = asyncio.create_task(self._fetch_snapshot()) if rest_snapshot else None
+            try:
+                async for frame in ws:
+                    if frame.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+                    if frame.type not in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                        continue
+                    self.stats.frames += 1
+                    self._record(frame.data)
+                    delta = ex.ws_parse_book(ex.ws_decode(frame.data))
+                    if delta is None:
+                        continue
+
+                    if delta.is_snapshot:
+                        self.book.reset(delta)
+                        self._verify(delta)
+                        synced = True
+                        self.stats.books_emitted += 1
+                        yield self.latest()
+                        continue
+
+                    if not synced:
+                        buffer.append(delta)
+                        if snap_task is None or not snap_task.done():
+                            continue
+                        self.book.reset(snap_task.result())
+                        pending, buffer = buffer, []
+                        synced = True
+                        for d in pending:
+                            status = self.book.apply(d)
+                            if status == STALE:
+                                self.stats.stale_dropped += 1
+                            elif status == GAP:
+                                # snapshot older than the oldest buffered delta
+                                synced = False
+                                break
+                            else:
+                                self._verify(d)
+                                self.stats.updates_applied += 1
+                        if not synced:
+                            self.stats.gaps += 1
+                            self.stats.resyncs += 1
+                            snap_task = asyncio.create_task(self._fetch_snapshot())
+                            continue
+                        self.stats.books_emitted += 1
+                        yield self.latest()
+                        continue
+
+                    status = self.book.apply(delta)
+                    if status == STALE:
+                        self.stats.stale_dropped += 1
+                        continue
+                    if status == GAP:
+                        self.stats.gaps += 1
+                        if not rest_snapshot:
+                            raise _Resubscribe("sequence gap")
+                        self.stats.resyncs += 1
+                        synced = False
+                        buffer = [delta]
+                        snap_task = asyncio.create_task(self._fetch_snapshot())
+                        continue
+                    self._verify(delta)
+                    self.stats.updates_applied += 1
+                    self.stats.books_emitted += 1
+                    yield self.latest()
+            finally:
+                pinger.cancel()
+                if snap_task is not None and not snap_task.done():
+                    snap_task.cancel()
+
+class StreamHub:
+    """
+    Keeps one running OrderBookStream per (venue, pair) in the background so
+    many readers can share a local book instead of each opening a socket.
+    """
+
+    def __init__(self):
+        self._streams: Dict[Tuple[str, str], OrderBookStream] = {}
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._listeners: List[Callable[[str, Pair, ColumnarOrderBook], None]] = []
+
+    def add_listener(self, fn: Callable[[str, Pair, ColumnarOrderBook], None]) -> None:
+        """fn(venue, pair, book) is called after every book update."""
+        self._listeners.append(fn)
+
+    def start(self, exchange: BaseExchange, pair: Pair, depth: int = 100, **kwargs) -> OrderBookStream:
+        key = (exchange.name, pair.human())
+        if key in self._streams:
+            return self._streams[key]
+        stream = OrderBookStream(exchange, pair, depth, **kwargs)
+        self._streams[key] = stream
+        self._tasks[key] = asyncio.create_task(self._pump(stream))
+        return stream
+
+    async def _pump(self, stream: OrderBookStream) -> None:
+        try:
+            async for book in stream:
+                for fn in self._listeners:
+                    try:
+                        fn(stream.exchange.name, stream.pair, book)
+                    except Exception as e:
+                        logger.error(f"Stream listener failed: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Stream {stream.key} stopped: {e}")
+
+    def latest(self, venue: str, pair: Pair) -> Optional[ColumnarOrderBook]:
+        stream = self._streams.get((venue, pair.human()))
+        if stream is None or stream.stats.books_emitted == 0:
+            return None
+        return stream.latest()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {f"{v}:{p}": asdict(s.stats) for (v, p), s in self._streams.items()}
+
+    async def stop(self, venue: str, pair: Pair) -> None:
+        key = (venue, pair.human())
+        stream = self._streams.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if stream:
+            stream.close()
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def stop_all(self) -> None:
+        for stream in list(self._streams.values()):
+            await self.stop(stream.exchange.name, stream.pair)
@@ -0,0 +1,192 @@
+# src/xetrade/utils/arrow_ipc.py
+from __future__ import annotations
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from xetrade.utils.parquet import layout_schema, snapshots_to_table
+
+logger = logging.getLogger(__name__)
+
+# hot-<first ts>-<last ts>-<id>.arrow; the time range is readable without opening the file
+_SEGMENT_RE = re.compile(r"^hot-(\d+)-(\d+)-[0-9a-f]+\.arrow$")
+
+def ipc_schema(layout: str = "nested") -> pa.Schema:
+    """
+    The Parquet layout with plain string columns: an IPC file holds one
+    dictionary per column for all its batches, while snapshots_to_table
+    builds a fresh dictionary per batch.
+    """
+    schema = layout_schema(layout)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, pa.field(field.name, field.type.value_type))
+    return schema
+
+def segment_range(path: str) -> Optional[Tuple[int, int]]:
+    """(first_ts_ms, last_ts_ms) of a finished segment, from its name."""
+    m = _SEGMENT_RE.match(os.path.basename(path))
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+class ArrowSegmentWriter:
+    """
+    Rolling Arrow IPC file (Feather v2) writer. Each batch of snapshots is
+    appended as one uncompressed record batch to the open segment, which is
+    written under a dot-prefixed name and renamed to hot-<first>-<last>-<id>.arrow
+    once it holds segment_snapshots snapshots or is segment_seconds old, so
+    readers only ever see complete files. Finished segments whose newest
+    book is more than retention_ms older than the newest book written are
+    deleted.
+    """
+
+    def __init__(self, base_path: str, *, layout: str = "nested", segment_snapshots: int = 20000,
+                 segment_seconds: float = 300.0, retention_ms: Optional[int] = 6 * 3600_000):
+        self.base_path = base_path
+        self.layout = layout
+        self.schema = ipc_schema(layout)
+        self.segment_snapshots = segment_snapshots
+        self.segment_seconds = segment_seconds
+        self.retention_ms = retention_ms
+        self.segments_closed = 0
+        self.segments_deleted = 0
+        self._writer: Optional[pa.ipc.RecordBatchFileWriter] = None
+        self._sink: Optional[pa.OSFile] = None
+        self._tmp_path: Optional[str] = None
+        self._opened_at = 0.0
+        self._snapshots = 0
+        self._first_ts: Optional[int] = None
+        self._last_ts: Optional[int] = None
+        self._newest_ts: Optional[int] = None
+
+    @property
+    def open_segment(self) -> Optional[str]:
+        return self._tmp_path
+
+    def write(self, snapshots: Sequence[Any]) -> None:
+        if not snapshots:
+            return
+        if self._writer is not None and time.monotonic() - self._opened_at >= self.segment_seconds:
+            self._roll()
+        if self._writer is None:
+            self._open()
+        self._writer.write_table(snapshots_to_table(snapshots, self.layout).cast(self.schema))
+        ts = [s.timestamp_ms for s in snapshots]
+        lo, hi = min(ts), max(ts)
+        self._first_ts = lo if self._first_ts is None else min(self._first_ts, lo)
+        self._last_ts = hi if self._last_ts is None else max(self._last_ts, hi)
+        self._newest_ts = hi if self._newest_ts is None else max(self._newest_ts, hi)
+        self._snapshots += len(snapshots)
+        if self._snapshots >= self.segment_snapshots:
+            self._roll()
+
+    def _open(self) -> None:
+        os.makedirs(self.base_path, exist_ok=True)
+        self._tmp_path = os.path.join(self.base_path, f".hot-open-{uuid.uuid4().hex[:12]}.arrow")
+        self._sink = pa.OSFile(self._tmp_path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._opened_at = time.monotonic()
+        self._snapshots = 0
+        self._first_ts = self._last_ts = None
+
+    def _roll(self) -> None:
+        """Finish the open segment and publish it under its final name."""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._sink.close()
+        final = os.path.join(self.base_path, f"hot-{self._first_ts}-{self._last_ts}-{uuid.uuid4().hex[:12]}.arrow")
+        os.replace(self._tmp_path, final)
+        logger.info(f"Closed hot segment {final}: {self._snapshots} snapshots")
+        self._writer = self._sink = self._tmp_path = None
+        self.segments_closed += 1
+        self._expire()
+
+    def _expire(self) -> None:
+        if self.retention_ms is None or self._newest_ts is None:
+            return
+        cutoff = self._newest_ts - self.retention_ms
+        for name in os.listdir(self.base_path):
+            rng = segment_range(name)
+            if rng is not None and rng[1] < cutoff:
+                # open memory maps stay valid after unlink on POSIX
+                os.unlink(os.path.join(self.base_path, name))
+                self.segments_deleted += 1
+
+    def close(self) -> None:
+        self._roll()
+
+class HotStoreReader:
+    """
+    Memory-mapped access to finished segments. Record batches reference the
+    mapped file directly, so an unfiltered read_table() costs no parsing,
+    decompression or copying; exchange/pair filters copy only the matching
+    rows. Batches entirely outside [start_ms, end_ms] are skipped.
+
+        table = HotStoreReader("./data/hot").read_table(start_ms=now_ms - 3600_000)
+    """
+
+    def __init__(self, base_path: str, layout: str = "nested"):
+        self.base_path = base_path
+        self.layout = layout  # only used for the schema of an empty result
+
+    def segments(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[str]:
+        """Finished segments overlapping [start_ms, end_ms], oldest first."""
+        if not os.path.isdir(self.base_path):
+            return []
+        found = []
+        for name in os.listdir(self.base_path):
+            rng = segment_range(name)
+            if rng is None:
+                continue
+            if end_ms is not None and rng[0] > end_ms:
+                continue
+            if start_ms is not None and rng[1] < start_ms:
+                continue
+            found.append((rng, os.path.join(self.base_path, name)))
+        return [path for _, path in sorted(found)]
+
+    def iter_batches(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                     exchanges: Optional[Iterable[str]] = None, pairs: Optional[Iterable[str]] = None
+                     ) -> Iterable[pa.RecordBatch]:
+        exchanges = list(exchanges) if exchanges else None
+        pairs = list(pairs) if pairs else None
+        for path in self.segments(start_ms, end_ms):
+            try:
+                reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+            except FileNotFoundError:
+                continue  # expired between listing and opening
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                ts = batch.column("timestamp_ms")
+                bounds = pc.min_max(ts)
+                if end_ms is not None and bounds["min"].as_py() > end_ms:
+                    continue
+                if start_ms is not None and bounds["max"].as_py() < start_ms:
+                    continue
+                mask = None
+                for expr in (
+                    pc.greater_equal(ts, start_ms) if start_ms is not None else None,
+                    pc.less_equal(ts, end_ms) if end_ms is not None else None,
+                    pc.is_in(batch.column("exchange"), pa.array(exchanges)) if exchanges else None,
+                    pc.is_in(batch.column("pair"), pa.array(pairs)) if pairs else None,
+                ):
+                    if expr is not None:
+                        mask = expr if mask is None else pc.and_(mask, expr)
+                if mask is not None and not pc.all(mask).as_py():
+                    batch = batch.filter(mask)
+                if batch.num_rows:
+                    yield batch
+
+    def read_table(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                   exchanges: Optional[Iterable[str]] = None, pairs: Optional[Iterable[str]] = None,
+                   columns: Optional[Sequence[str]] = None) -> pa.Table:
+        """Snapshots in [start_ms, end_ms] as one table, chunked per record batch (no concatenation)."""
+        batches = list(self.iter_batches(start_ms, end_ms, exchanges, pairs))
+        table = pa.Table.from_batches(batches) if batches else ipc_schema(self.layout).empty_table()
+        return table.select(list(columns)) if columns else table
@@ -0,0 +1,135 @@
+# src/xetrade/utils/book_delta.py
+from __future__ import annotations
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Levels = List[Dict[str, float]]  # [{"price": float, "qty": float}, ...], as in OrderBookSnapshot
+
+@dataclass
+class EncodedSnapshot:
+    """
+    OrderBookSnapshot as stored in delta mode. A keyframe carries the full
+    book; otherwise bids/asks hold only the levels that were added or whose
+    quantity changed since the previous snapshot of the same (exchange,
+    pair), and removed levels appear with qty 0.
+    """
+    exchange: str
+    pair: str
+    timestamp_ms: int
+    bids: Levels
+    asks: Levels
+    capture_latency_ms: float
+    sequence_number: int
+    keyframe: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass
+class DeltaStats:
+    keyframes: int = 0
+    deltas: int = 0
+    levels_in: int = 0     # levels in the full snapshots
+    levels_out: int = 0    # levels actually written
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        out["level_ratio"] = round(self.levels_out / self.levels_in, 4) if self.levels_in else None
+        return out
+
+def _diff(prev: Dict[float, float], levels: Levels) -> Tuple[Levels, Dict[float, float]]:
+    cur = {lvl["price"]: lvl["qty"] for lvl in levels}
+    out = [{"price": px, "qty": qty} for px, qty in cur.items() if prev.get(px) != qty]
+    out.extend({"price": px, "qty": 0.0} for px in prev if px not in cur)
+    return out, cur
+
+class DeltaEncoder:
+    """
+    Turns a stream of full snapshots into keyframes plus level diffs. Each
+    (exchange, pair) gets a keyframe on its first snapshot and then every
+    keyframe_interval snapshots, so a reader can start at any keyframe.
+    One encoder per output file keeps every file decodable on its own.
+
+    Levels with qty 0 in the input are treated as absent.
+    """
+
+    def __init__(self, keyframe_interval: int = 60, stats: Optional[DeltaStats] = None):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be >= 1")
+        self.keyframe_interval = keyframe_interval
+        self.stats = stats if stats is not None else DeltaStats()
+        # (exchange, pair) -> (bids by price, asks by price, snapshots since keyframe)
+        self._state: Dict[Tuple[str, str], Tuple[Dict[float, float], Dict[float, float], int]] = {}
+
+    def reset(self) -> None:
+        """Forget all books: the next snapshot of every (exchange, pair) is a keyframe."""
+        self._state.clear()
+
+    def encode(self, snap: Any) -> EncodedSnapshot:
+        key = (snap.exchange, snap.pair)
+        bids = [lvl for lvl in snap.bids if lvl["qty"]]
+        asks = [lvl for lvl in snap.asks if lvl["qty"]]
+        self.stats.levels_in += len(bids) + len(asks)
+        state = self._state.get(key)
+        if state is None or state[2] + 1 >= self.keyframe_interval:
+            self._state[key] = ({lvl["price"]: lvl["qty"] for lvl in bids},
+                                {lvl["price"]: lvl["qty"] for lvl in asks}, 0)
+            self.stats.keyframes += 1
+            self.stats.levels_out += len(bids) + len(asks)
+            keyframe = True
+        else:
+            bids, bid_book = _diff(state[0], bids)
+            asks, ask_book = _diff(state[1], asks)
+            self._state[key] = (bid_book, ask_book, state[2] + 1)
+            self.stats.deltas += 1
+            self.stats.levels_out += len(bids) + len(asks)
+            keyframe = False
+        return EncodedSnapshot(
+            exchange=snap.exchange, pair=snap.pair, timestamp_ms=snap.timestamp_ms,
+            bids=bids, asks=asks, capture_latency_ms=snap.capture_latency_ms,
+            sequence_number=snap.sequence_number, keyframe=keyframe,
+        )
+
+class DeltaDecoder:
+    """
+    Rebuilds full books from keyframes and diffs, per (exchange, pair).
+    apply() works on plain (price, qty) pairs so readers can feed it from
+    JSON rows or Arrow arrays. A diff seen before any keyframe of its
+    (exchange, pair) can't be resolved; apply() returns None for it.
+    """
+
+    def __init__(self):
+        self._books: Dict[Tuple[str, str], Tuple[Dict[float, float], Dict[float, float]]] = {}
+        self.skipped = 0
+
+    def apply(self, exchange: str, pair: str, keyframe: Optional[bool],
+              bids: Sequence[Tuple[float, float]], asks: Sequence[Tuple[float, float]]
+              ) -> Optional[Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]]:
+        """
+        Apply one record; returns the full (bids, asks), bids best (highest)
+        first and asks best (lowest) first. keyframe=None (a record written
+        without delta encoding) counts as a keyframe.
+        """
+        key = (exchange, pair)
+        if keyframe is None or keyframe:
+            bid_book = {px: qty for px, qty in bids if qty}
+            ask_book = {px: qty for px, qty in asks if qty}
+            self._books[key] = (bid_book, ask_book)
+        else:
+            books = self._books.get(key)
+            if books is None:
+                self.skipped += 1
+                if self.skipped == 1:
+                    logger.warning(f"{exchange} {pair}: delta before any keyframe, skipping until one arrives")
+                return None
+            bid_book, ask_book = books
+            for book, levels in ((bid_book, bids), (ask_book, asks)):
+                for px, qty in levels:
+                    if qty:
+                        book[px] = qty
+                    else:
+                        book.pop(px, None)
+        return (sorted(bid_book.items(), reverse=True), sorted(ask_book.items()))
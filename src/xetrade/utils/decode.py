@@ -0,0 +1,74 @@
+# src/xetrade/utils/decode.py
+from __future__ import annotations
+import json
+from typing import Any, Callable, List, Sequence, Tuple, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # stdlib fallback
+    orjson = None
+    HAS_ORJSON = False
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Decoder = Callable[[Union[bytes, str]], Any]
+
+def _stdlib_loads(body: Union[bytes, str]) -> Any:
+    return json.loads(body)
+
+def json_loads(body: Union[bytes, str]) -> Any:
+    """Decode a JSON body (bytes or str) with orjson if installed, else stdlib json."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+def get_decoder(name: str = "auto") -> Decoder:
+    """'auto' (orjson when available), 'orjson' or 'json'."""
+    if name == "auto":
+        return json_loads
+    if name == "orjson":
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        return orjson.loads
+    if name == "json":
+        return _stdlib_loads
+    raise ValueError(f"Unknown decoder '{name}'")
+
+def parse_levels(raw: Sequence[Sequence[Any]]) -> Tuple[Any, Any]:
+    """
+    Turn venue level rows like [["price","qty"], ...] or OKX's
+    [["price","qty","0","n"], ...] into (prices, qtys).
+
+    With numpy the whole side is converted in one vectorized string->float64
+    cast and two contiguous arrays are returned; without it, two lists of floats.
+    Only the first two columns are used.
+    """
+    if not raw:
+        if np is not None:
+            empty = np.empty(0, dtype=np.float64)
+            return empty, empty.copy()
+        return [], []
+    if np is not None:
+        try:
+            arr = np.asarray(raw)
+        except ValueError:  # ragged rows (mixed widths): numpy refuses the shape
+            arr = None
+        if arr is None or arr.ndim != 2:
+            arr = np.asarray([row[:2] for row in raw])
+        cols = arr[:, :2].astype(np.float64)
+        return np.ascontiguousarray(cols[:, 0]), np.ascontiguousarray(cols[:, 1])
+    prices: List[float] = [float(row[0]) for row in raw]
+    qtys: List[float] = [float(row[1]) for row in raw]
+    return prices, qtys
+
+def parse_level_dicts(raw: Sequence[dict], price_key: str = "price", qty_key: str = "size") -> Tuple[Any, Any]:
+    """Same as parse_levels for dict rows (e.g., dYdX {"price": "...", "size": "..."})."""
+    return parse_levels([(row[price_key], row[qty_key]) for row in raw])
+
+def float_pairs(raw: Sequence[Sequence[Any]]) -> List[Tuple[float, float]]:
+    """[["price","qty",...], ...] -> [(price, qty), ...]; for small streamed deltas where arrays don't pay off."""
+    return [(float(row[0]), float(row[1])) for row in raw]
@@ -1,29 +1,168 @@
 # src/utils/http.py
 from __future__ import annotations
 import asyncio
-import json
 import time
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 import aiohttp
 
+from xetrade.utils.decode import Decoder, json_loads
+from xetrade.utils.rate_limit import RateLimiter, limiter as shared_limiter
+
 DEFAULT_TIMEOUT = 10
 DEFAULT_RETRIES = 3
 DEFAULT_BACKOFF = 0.5  # seconds, exponential
+DEFAULT_POOL = "default"
+MAX_CACHE_ENTRIES = 4096
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Connector settings for one venue's connection pool."""
+    limit: int = 20                  # total open connections for the pool
+    limit_per_host: int = 10         # connections per (host, port)
+    keepalive_timeout: float = 30.0  # seconds an idle connection is kept
+    ttl_dns_cache: int = 300         # seconds a DNS lookup is cached
+    warmup_urls: tuple = ()          # cheap GETs used to pre-open connections
+
+@dataclass
+class PoolStats:
+    """Usage counters for one pool (useful for sizing PoolConfig.limit)."""
+    requests: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    retries: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    queued_for_connection: int = 0   # requests that waited for a free connector slot
+    coalesced: int = 0               # callers that joined an identical in-flight request
+    cache_hits: int = 0              # callers served from the micro-cache
+
+# Per-venue defaults; anything not listed gets PoolConfig().
+POOL_CONFIGS: Dict[str, PoolConfig] = {
+    "binance": PoolConfig(limit=30, limit_per_host=15, warmup_urls=("https://api.binance.com/api/v3/ping",)),
+    "okx": PoolConfig(limit=20, limit_per_host=10, warmup_urls=("https://www.okx.com/api/v5/public/time",)),
+    "kucoin": PoolConfig(limit=20, limit_per_host=10, warmup_urls=("https://api.kucoin.com/api/v1/timestamp",)),
+    "bitmart": PoolConfig(limit=10, limit_per_host=5, warmup_urls=("https://api-cloud.bitmart.com/system/time",)),
+    "derive": PoolConfig(limit=10, limit_per_host=5),
+}
 
 class HTTPClient:
-    def __init__(self):
-        self._session: Optional[aiohttp.ClientSession] = None
+    def __init__(self, pool_configs: Optional[Dict[str, PoolConfig]] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 default_cache_ttl: float = 0.0,
+                 decoder: Optional[Decoder] = None):
+        self.decoder: Decoder = decoder or json_loads
+        self.default_cache_ttl = default_cache_ttl
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self.rate_limiter = rate_limiter if rate_limiter is not None else shared_limiter
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._configs: Dict[str, PoolConfig] = dict(POOL_CONFIGS if pool_configs is None else pool_configs)
+        self._stats: Dict[str, PoolStats] = {}
+
+    def configure_pool(self, pool: str, config: PoolConfig) -> None:
+        """Set connector settings for a pool. Takes effect the next time the pool is opened."""
+        self._configs[pool] = config
+
+    def _trace_config(self, stats: PoolStats) -> aiohttp.TraceConfig:
+        tc = aiohttp.TraceConfig()
+
+        async def on_create(session, ctx, params):
+            stats.connections_created += 1
+
+        async def on_reuse(session, ctx, params):
+            stats.connections_reused += 1
+
+        async def on_queued(session, ctx, params):
+            stats.queued_for_connection += 1
 
-    async def _ensure(self):
-        if self._session is None or self._session.closed:
+        tc.on_connection_create_end.append(on_create)
+        tc.on_connection_reuseconn.append(on_reuse)
+        tc.on_connection_queued_start.append(on_queued)
+        return tc
+
+    async def _ensure(self, pool: str = DEFAULT_POOL) -> aiohttp.ClientSession:
+        session = self._sessions.get(pool)
+        if session is None or session.closed:
+            cfg = self._configs.get(pool, PoolConfig())
+            stats = self._stats.setdefault(pool, PoolStats())
+            connector = aiohttp.TCPConnector(
+                limit=cfg.limit,
+                limit_per_host=cfg.limit_per_host,
+                keepalive_timeout=cfg.keepalive_timeout,
+                ttl_dns_cache=cfg.ttl_dns_cache,
+            )
             timeout = aiohttp.ClientTimeout(total=None, sock_connect=DEFAULT_TIMEOUT, sock_read=DEFAULT_TIMEOUT)
-            self._session = aiohttp.ClientSession(timeout=timeout)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                trace_configs=[self._trace_config(stats)],
+            )
+            self._sessions[pool] = session
+        return session
+
+    async def warm_up(self, pools: Optional[Iterable[str]] = None) -> None:
+        """
+        Open the pools and pre-establish connections (DNS + TCP + TLS) by hitting
+        each pool's warm-up URLs, so the first real request doesn't pay for them.
+        Failures are ignored; warm-up is best effort.
+        """
+        names = list(pools) if pools is not None else list(self._configs.keys())
+
+        async def _hit(session: aiohttp.ClientSession, url: str):
+            try:
+                async with session.get(url) as resp:
+                    await resp.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+
+        tasks = []
+        for name in names:
+            session = await self._ensure(name)
+            cfg = self._configs.get(name, PoolConfig())
+            tasks.extend(_hit(session, url) for url in cfg.warmup_urls)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of usage counters per pool, plus configured limits."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for name, stats in self._stats.items():
+            cfg = self._configs.get(name, PoolConfig())
+            row = asdict(stats)
+            row["limit"] = cfg.limit
+            row["limit_per_host"] = cfg.limit_per_host
+            session = self._sessions.get(name)
+            row["open"] = session is not None and not session.closed
+            out[name] = row
+        return out
 
     async def close(self):
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        self._cache.clear()
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+    @staticmethod
+    def _flight_key(pool: str, url: str, params: Optional[Dict[str, Any]],
+                    headers: Optional[Dict[str, str]]) -> Tuple:
+        p = tuple(sorted((k, str(v)) for k, v in params.items())) if params else ()
+        h = tuple(sorted(headers.items())) if headers else ()
+        return (pool, url, p, h)
+
+    def _cache_put(self, key: Tuple, value: Any, ttl: float) -> None:
+        now = time.monotonic()
+        if len(self._cache) >= MAX_CACHE_ENTRIES:
+            for k in [k for k, (exp, _) in self._cache.items() if exp <= now]:
+                del self._cache[k]
+            if len(self._cache) >= MAX_CACHE_ENTRIES:
+                self._cache.clear()
+        self._cache[key] = (now + ttl, value)
 
     async def get_json(
         self,
@@ -34,34 +173,120 @@ class HTTPClient:
         retries: int = DEFAULT_RETRIES,
         backoff: float = DEFAULT_BACKOFF,
         timeout: int = DEFAULT_TIMEOUT,
+        pool: Optional[str] = None,
+        coalesce: bool = True,
+        cache_ttl: Optional[float] = None,
+    ) -> Any:
+        """
+        GET and decode JSON. Identical concurrent requests (same pool, url,
+        params and headers) share one upstream call; with cache_ttl > 0 the
+        decoded result is also reused for that many seconds. Results may be
+        shared between callers, so treat them as read-only.
+        """
+        pool = pool or DEFAULT_POOL
+        if not coalesce:
+            return await self._fetch(pool, url, params, headers, retries, backoff, timeout)
+
+        ttl = self.default_cache_ttl if cache_ttl is None else cache_ttl
+        key = self._flight_key(pool, url, params, headers)
+        stats = self._stats.setdefault(pool, PoolStats())
+
+        if ttl > 0:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                stats.cache_hits += 1
+                return hit[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(pool, url, params, headers, retries, backoff, timeout))
+            self._inflight[key] = task
+
+            def _done(t: asyncio.Future, key=key, ttl=ttl):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if t.cancelled():
+                    return
+                if t.exception() is None and ttl > 0:
+                    self._cache_put(key, t.result(), ttl)
+
+            task.add_done_callback(_done)
+        else:
+            stats.coalesced += 1
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def post_json(
+        self,
+        url: str,
+        *,
+        json: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        timeout: int = DEFAULT_TIMEOUT,
+        pool: Optional[str] = None,
     ) -> Any:
-        await self._ensure()
+        """POST and decode JSON. Never coalesced or cached."""
+        return await self._fetch(pool or DEFAULT_POOL, url, params, headers, retries, backoff, timeout,
+                                 method="POST", json_body=json)
+
+    async def session(self, pool: Optional[str] = None) -> aiohttp.ClientSession:
+        """The pool's session, e.g. for WebSocket connections that should share its connector."""
+        return await self._ensure(pool or DEFAULT_POOL)
+
+    async def _fetch(self, pool, url, params, headers, retries, backoff, timeout,
+                     method: str = "GET", json_body: Any = None) -> Any:
+        session = await self._ensure(pool)
+        stats = self._stats[pool]
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            return await self._request_json(session, stats, pool, method, url, params, headers,
+                                            json_body, retries, backoff, timeout)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+
+    async def _request_json(self, session, stats, pool, method, url, params, headers, json_body,
+                            retries, backoff, timeout) -> Any:
         attempt = 0
         last_err: Exception | None = None
 
         while attempt <= retries:
+            # spend the venue's request weight before it is counted server-side
+            await self.rate_limiter.acquire(pool, url, params)
             try:
-                async with self._session.get(url, params=params, headers=headers, timeout=timeout) as resp:
+                async with session.request(method, url, params=params, headers=headers,
+                                           json=json_body, timeout=timeout) as resp:
                     if resp.status == 429:
                         # rate limited; honor Retry-After if present
+                        stats.rate_limited += 1
                         ra = resp.headers.get("Retry-After")
                         delay = float(ra) if ra else backoff * (2 ** attempt)
-                        await asyncio.sleep(delay)
+                        # drain the bucket so concurrent callers back off too
+                        self.rate_limiter.penalize(pool, url, delay)
                         attempt += 1
+                        stats.retries += 1
                         continue
                     if 200 <= resp.status < 300:
-                        ctype = resp.headers.get("Content-Type", "")
-                        if "application/json" in ctype:
-                            return await resp.json()
-                        text = await resp.text()
+                        # decode from raw bytes regardless of Content-Type; skips
+                        # aiohttp's str round-trip and lets orjson do the work
+                        body = await resp.read()
                         try:
-                            return json.loads(text)
-                        except json.JSONDecodeError:
+                            return self.decoder(body)
+                        except ValueError:
+                            ctype = resp.headers.get("Content-Type", "")
                             raise RuntimeError(f"Expected JSON from {url}, got: {ctype}")
                     # transient server/network errors => retry
                     if resp.status in (500, 502, 503, 504):
                         await asyncio.sleep(backoff * (2 ** attempt))
                         attempt += 1
+                        stats.retries += 1
                         continue
                     # other HTTP errors => raise
                     text = await resp.text()
@@ -72,12 +297,16 @@ class HTTPClient:
                     break
                 await asyncio.sleep(backoff * (2 ** attempt))
                 attempt += 1
+                stats.retries += 1
 
         raise RuntimeError(f"Request failed after {retries+1} attempts: {last_err}")
 
 # single shared instance
 http = HTTPClient()
 
-# convenience function
+# convenience functions
 async def get_json(*args, **kwargs) -> Any:
     return await http.get_json(*args, **kwargs)
+
+async def post_json(*args, **kwargs) -> Any:
+    return await http.post_json(*args, **kwargs)
@@ -0,0 +1,394 @@
+# src/xetrade/utils/parquet.py
+from __future__ import annotations
+import logging
+import os
+import posixpath
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from xetrade.utils.book_delta import DeltaEncoder, DeltaStats
+
+logger = logging.getLogger(__name__)
+
+_DICT_STR = pa.dictionary(pa.int32(), pa.string())
+
+# One row per level; same columns as the original pandas export, with the
+# repeated strings dictionary-encoded.
+FLAT_SCHEMA = pa.schema([
+    ("exchange", _DICT_STR),
+    ("pair", _DICT_STR),
+    ("timestamp_ms", pa.int64()),
+    ("side", _DICT_STR),
+    ("price", pa.float64()),
+    ("quantity", pa.float64()),
+    ("capture_latency_ms", pa.float64()),
+    ("sequence_number", pa.int64()),
+])
+
+_LEVEL = pa.struct([("price", pa.float64()), ("qty", pa.float64())])
+
+# One row per snapshot; each side is a list<struct<price, qty>>.
+NESTED_SCHEMA = pa.schema([
+    ("exchange", _DICT_STR),
+    ("pair", _DICT_STR),
+    ("timestamp_ms", pa.int64()),
+    ("capture_latency_ms", pa.float64()),
+    ("sequence_number", pa.int64()),
+    ("bids", pa.list_(_LEVEL)),
+    ("asks", pa.list_(_LEVEL)),
+])
+
+LAYOUTS = {"flat": FLAT_SCHEMA, "nested": NESTED_SCHEMA}
+
+# Columns that move into the directory path in the partitioned layout.
+# Files there don't repeat them: pyarrow.dataset refuses to merge a path
+# field with a same-named file column of a different type.
+PARTITION_KEYS = ("exchange", "pair")
+
+def layout_schema(layout: str, include_keys: bool = True, delta: bool = False) -> pa.Schema:
+    """delta=True adds the 'keyframe' column of delta-encoded files (nested layout only)."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {sorted(LAYOUTS)}")
+    if delta and layout != "nested":
+        # a flat-layout diff with no changed levels would have no rows, and its snapshot would vanish
+        raise ValueError("delta encoding requires layout='nested'")
+    schema = LAYOUTS[layout]
+    if not include_keys:
+        for key in PARTITION_KEYS:
+            schema = schema.remove(schema.get_field_index(key))
+    if delta:
+        schema = schema.append(pa.field("keyframe", pa.bool_()))
+    return schema
+
+def _side_arrays(levels: Sequence[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(levels)
+    px = np.fromiter((lvl["price"] for lvl in levels), dtype=np.float64, count=n)
+    qty = np.fromiter((lvl["qty"] for lvl in levels), dtype=np.float64, count=n)
+    return px, qty
+
+def _dict_column(values: Sequence[str], repeats: Optional[np.ndarray] = None) -> pa.DictionaryArray:
+    """Dictionary-encode per-snapshot strings, optionally repeated once per level."""
+    uniq, codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    codes = codes.astype(np.int32)
+    if repeats is not None:
+        codes = np.repeat(codes, repeats)
+    return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()),
+                                          pa.array(uniq.tolist(), type=pa.string()))
+
+def snapshots_to_table(snapshots: Sequence[Any], layout: str = "flat", include_keys: bool = True,
+                       delta: bool = False) -> pa.Table:
+    """
+    Build an Arrow table from OrderBookSnapshot-like objects (exchange, pair,
+    timestamp_ms, bids, asks, capture_latency_ms, sequence_number) without
+    per-row dicts or pandas: each side becomes two float64 arrays and the
+    per-snapshot fields are repeated with np.repeat.
+    include_keys=False leaves out the exchange/pair columns (partitioned layout);
+    delta=True expects book_delta.EncodedSnapshot objects and adds 'keyframe'.
+    """
+    schema = layout_schema(layout, include_keys, delta)
+    if not snapshots:
+        return schema.empty_table()
+
+    exchanges = [s.exchange for s in snapshots]
+    pairs = [s.pair for s in snapshots]
+    ts = np.fromiter((s.timestamp_ms for s in snapshots), dtype=np.int64, count=len(snapshots))
+    lat = np.fromiter((s.capture_latency_ms for s in snapshots), dtype=np.float64, count=len(snapshots))
+    seq = np.fromiter((s.sequence_number for s in snapshots), dtype=np.int64, count=len(snapshots))
+    bid_sides = [_side_arrays(s.bids) for s in snapshots]
+    ask_sides = [_side_arrays(s.asks) for s in snapshots]
+    n_bids = np.fromiter((len(b[0]) for b in bid_sides), dtype=np.int64, count=len(snapshots))
+    n_asks = np.fromiter((len(a[0]) for a in ask_sides), dtype=np.int64, count=len(snapshots))
+
+    def _concat(parts: List[np.ndarray]) -> np.ndarray:
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.float64)
+
+    if layout == "nested":
+        def _levels(sides, counts) -> pa.ListArray:
+            offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int32)
+            values = pa.StructArray.from_arrays(
+                [pa.array(_concat([p for p, _ in sides])), pa.array(_concat([q for _, q in sides]))],
+                fields=list(_LEVEL),
+            )
+            return pa.ListArray.from_arrays(pa.array(offsets), values)
+
+        keys = [_dict_column(exchanges), _dict_column(pairs)] if include_keys else []
+        flags = [pa.array([s.keyframe for s in snapshots], type=pa.bool_())] if delta else []
+        return pa.Table.from_arrays(keys + [
+            pa.array(ts), pa.array(lat), pa.array(seq),
+            _levels(bid_sides, n_bids), _levels(ask_sides, n_asks),
+        ] + flags, schema=schema)
+
+    # flat: per snapshot, its bids then its asks (same row order as the pandas export)
+    per_snap = n_bids + n_asks
+    price = _concat([arr for b, a in zip(bid_sides, ask_sides) for arr in (b[0], a[0])])
+    qty = _concat([arr for b, a in zip(bid_sides, ask_sides) for arr in (b[1], a[1])])
+    side_codes = np.concatenate([
+        np.repeat(np.array([0, 1], dtype=np.int32), [nb, na]) for nb, na in zip(n_bids, n_asks)
+    ])
+    side = pa.DictionaryArray.from_arrays(pa.array(side_codes, type=pa.int32()), pa.array(["bid", "ask"]))
+    keys = [_dict_column(exchanges, per_snap), _dict_column(pairs, per_snap)] if include_keys else []
+    return pa.Table.from_arrays(keys + [
+        pa.array(np.repeat(ts, per_snap)),
+        side,
+        pa.array(price),
+        pa.array(qty),
+        pa.array(np.repeat(lat, per_snap)),
+        pa.array(np.repeat(seq, per_snap)),
+    ], schema=schema)
+
+class ParquetSnapshotWriter:
+    """
+    Appends snapshot batches to one Parquet file through a single open
+    pq.ParquetWriter. Rows are held until a full row group (row_group_size
+    rows) is available, so many small flushes still produce evenly sized
+    row groups; the remainder is written on close().
+
+    keyframe_interval turns on delta encoding (nested layout): the file
+    stores a keyframe every keyframe_interval snapshots per (exchange,
+    pair) and level diffs in between, starting with a keyframe so the file
+    decodes on its own.
+    """
+
+    def __init__(self, path: str, *, layout: str = "flat", compression: str = "zstd",
+                 compression_level: Optional[int] = None, row_group_size: int = 128 * 1024,
+                 include_keys: bool = True, keyframe_interval: Optional[int] = None,
+                 delta_stats: Optional[DeltaStats] = None):
+        self.path = path
+        self.layout = layout
+        self.include_keys = include_keys
+        self.encoder = DeltaEncoder(keyframe_interval, delta_stats) if keyframe_interval else None
+        self.schema = layout_schema(layout, include_keys, delta=self.encoder is not None)
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self.snapshots_written = 0
+        self.row_groups = 0
+        self._pending: List[pa.Table] = []
+        self._pending_rows = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        dict_cols = [c for c in ("exchange", "pair", "side") if c in self.schema.names]
+        self._writer = pq.ParquetWriter(
+            path, self.schema, compression=compression, compression_level=compression_level,
+            use_dictionary=dict_cols or False,
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._writer is None
+
+    def write(self, snapshots: Sequence[Any]) -> None:
+        if self._writer is None:
+            raise RuntimeError(f"{self.path} is closed")
+        if self.encoder is not None:
+            snapshots = [self.encoder.encode(s) for s in snapshots]
+        table = snapshots_to_table(snapshots, self.layout, self.include_keys, delta=self.encoder is not None)
+        self.snapshots_written += len(snapshots)
+        if table.num_rows == 0:
+            return
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self._drain(final=False)
+
+    def _drain(self, final: bool) -> None:
+        if not self._pending:
+            return
+        table = pa.concat_tables(self._pending) if len(self._pending) > 1 else self._pending[0]
+        self._pending, self._pending_rows = [], 0
+        full = table.num_rows if final else (table.num_rows // self.row_group_size) * self.row_group_size
+        if full:
+            head = table.slice(0, full)
+            self._writer.write_table(head, row_group_size=self.row_group_size)
+            self.rows_written += full
+            self.row_groups += -(-full // self.row_group_size)
+        if full < table.num_rows:
+            rest = table.slice(full)
+            self._pending, self._pending_rows = [rest], rest.num_rows
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        self._drain(final=True)
+        self._writer.close()
+        self._writer = None
+        logger.info(f"Closed {self.path}: {self.snapshots_written} snapshots, "
+                    f"{self.rows_written} rows, {self.row_groups} row groups")
+
+
+# --- Hive-partitioned layout ---
+
+def partition_dir(exchange: str, pair: str, ts_ms: int) -> str:
+    """'exchange=<venue>/pair=<pair>/date=YYYY-MM-DD/hour=HH' (UTC, from the book timestamp)."""
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return f"exchange={exchange}/pair={pair}/date={dt:%Y-%m-%d}/hour={dt:%H}"
+
+def unique_part_name(prefix: str = "part") -> str:
+    """File name that can't collide across flushes, processes or hosts."""
+    return f"{prefix}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:12]}.parquet"
+
+class PartitionedSnapshotWriter:
+    """
+    Routes snapshots to one open ParquetSnapshotWriter per Hive partition
+    (exchange=/pair=/date=/hour=) under root. A partition's file is closed
+    once it holds snapshots_per_file snapshots, or once data for a later
+    hour of the same (exchange, pair) has arrived. Open files are named
+    .part-*.parquet.inprogress and renamed to part-*.parquet when closed;
+    on_file_closed(path, relative_key) is then called, e.g. to upload it.
+    keyframe_interval is passed to each file's ParquetSnapshotWriter.
+    """
+
+    def __init__(self, root: str, *, layout: str = "flat", compression: str = "zstd",
+                 row_group_size: int = 128 * 1024, snapshots_per_file: int = 10000,
+                 on_file_closed: Optional[Callable[[str, str], None]] = None,
+                 keyframe_interval: Optional[int] = None):
+        if keyframe_interval:
+            layout_schema(layout, delta=True)  # fail now rather than on the first write
+        self.root = root
+        self.layout = layout
+        self.keyframe_interval = keyframe_interval
+        self.delta_stats = DeltaStats() if keyframe_interval else None
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.snapshots_per_file = snapshots_per_file
+        self.on_file_closed = on_file_closed
+        self.files_closed = 0
+        self._open: Dict[str, ParquetSnapshotWriter] = {}
+        self._final: Dict[str, str] = {}  # in-progress path -> published path
+        self._latest_hour: Dict[Tuple[str, str], str] = {}
+
+    def open_files(self) -> Dict[str, int]:
+        """Partition -> snapshots in its open file."""
+        return {part: w.snapshots_written for part, w in self._open.items()}
+
+    def write(self, snapshots: Sequence[Any]) -> None:
+        groups: Dict[str, List[Any]] = defaultdict(list)
+        for snap in snapshots:
+            groups[partition_dir(snap.exchange, snap.pair, snap.timestamp_ms)].append(snap)
+
+        for part, snaps in groups.items():
+            writer = self._open.get(part)
+            if writer is None:
+                # written under a dot-prefixed name and renamed on close, so readers
+                # (which skip dot files) never see a file without its footer
+                final = os.path.join(self.root, part, unique_part_name())
+                path = os.path.join(self.root, part, f".{os.path.basename(final)}.inprogress")
+                self._final[path] = final
+                writer = ParquetSnapshotWriter(path, layout=self.layout, compression=self.compression,
+                                               row_group_size=self.row_group_size, include_keys=False,
+                                               keyframe_interval=self.keyframe_interval,
+                                               delta_stats=self.delta_stats)
+                self._open[part] = writer
+            writer.write(snaps)
+            if writer.snapshots_written >= self.snapshots_per_file:
+                self._close(part)
+
+            # a newer hour for this (exchange, pair) means older hours are done
+            venue_pair = (snaps[0].exchange, snaps[0].pair)
+            if part > self._latest_hour.get(venue_pair, ""):
+                self._latest_hour[venue_pair] = part
+                prefix = part.rsplit("/date=", 1)[0] + "/"
+                for other in [p for p in self._open if p.startswith(prefix) and p < part]:
+                    self._close(other)
+
+    def _close(self, part: str) -> None:
+        writer = self._open.pop(part, None)
+        if writer is None:
+            return
+        writer.close()
+        final = self._final.pop(writer.path)
+        os.replace(writer.path, final)
+        self.files_closed += 1
+        if self.on_file_closed is not None:
+            rel = os.path.relpath(final, self.root).replace(os.sep, "/")
+            self.on_file_closed(final, rel)
+
+    def close(self) -> None:
+        for part in list(self._open):
+            self._close(part)
+
+# --- Compaction ---
+
+def _list_partitions(fs: pafs.FileSystem, root: str) -> Dict[str, List[pafs.FileInfo]]:
+    parts: Dict[str, List[pafs.FileInfo]] = defaultdict(list)
+    for info in fs.get_file_info(pafs.FileSelector(root, recursive=True, allow_not_found=True)):
+        if info.type == pafs.FileType.File and info.base_name.endswith(".parquet") \
+                and not info.base_name.startswith("."):
+            parts[posixpath.dirname(info.path)].append(info)
+    return parts
+
+def _partition_hour_ms(part_dir: str) -> Optional[int]:
+    fields = dict(seg.split("=", 1) for seg in part_dir.split("/") if "=" in seg)
+    if "date" not in fields or "hour" not in fields:
+        return None
+    dt = datetime.strptime(f"{fields['date']} {fields['hour']}", "%Y-%m-%d %H").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def compact_partition(files: Sequence[str], out_dir: str, *, fs: Optional[pafs.FileSystem] = None,
+                      row_group_size: int = 1024 * 1024, compression: str = "zstd",
+                      sort_by: Sequence[str] = ("timestamp_ms", "sequence_number")) -> Optional[str]:
+    """
+    Merge one partition's files into a single file sorted by sort_by (a
+    stable sort, so level order within a snapshot is kept) with large row
+    groups. The output is written under a dot-prefixed temporary name and
+    moved into place before the inputs are deleted, so readers never see a
+    partition with data missing or duplicated for longer than the rename.
+    """
+    fs = fs or pafs.LocalFileSystem()
+    if len(files) < 2:
+        return None
+    tables = [pq.read_table(path, filesystem=fs) for path in files]
+    table = pa.concat_tables(tables, promote_options="default")
+    keys = [(col, "ascending") for col in sort_by if col in table.column_names]
+    if keys:
+        table = table.take(pc.sort_indices(table, sort_keys=keys))
+
+    name = unique_part_name("compacted")
+    tmp_path = posixpath.join(out_dir, "." + name)
+    final_path = posixpath.join(out_dir, name)
+    with fs.open_output_stream(tmp_path) as sink:
+        pq.write_table(table, sink, row_group_size=row_group_size, compression=compression)
+    fs.move(tmp_path, final_path)
+    for path in files:
+        fs.delete_file(path)
+    return final_path
+
+def compact_dataset(root: str, *, fs: Optional[pafs.FileSystem] = None, min_files: int = 2,
+                    older_than_ms: Optional[int] = None, row_group_size: int = 1024 * 1024,
+                    compression: str = "zstd") -> Dict[str, Any]:
+    """
+    Compact every partition under root that has at least min_files files.
+    Partitions whose hour starts at or after older_than_ms (default: the
+    current hour) are left alone, since writers may still be adding to them.
+    """
+    fs = fs or pafs.LocalFileSystem()
+    if older_than_ms is None:
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        older_than_ms = int(now.timestamp() * 1000)
+
+    summary: Dict[str, Any] = {"partitions_compacted": 0, "files_in": 0, "files_out": 0,
+                               "bytes_in": 0, "bytes_out": 0, "skipped_open": 0}
+    for part_dir, infos in sorted(_list_partitions(fs, root).items()):
+        if len(infos) < min_files:
+            continue
+        hour_ms = _partition_hour_ms(part_dir)
+        if hour_ms is not None and hour_ms >= older_than_ms:
+            summary["skipped_open"] += 1
+            continue
+        out = compact_partition([i.path for i in infos], part_dir, fs=fs,
+                                row_group_size=row_group_size, compression=compression)
+        if out is None:
+            continue
+        summary["partitions_compacted"] += 1
+        summary["files_in"] += len(infos)
+        summary["files_out"] += 1
+        summary["bytes_in"] += sum(i.size or 0 for i in infos)
+        summary["bytes_out"] += fs.get_file_info(out).size or 0
+        logger.info(f"Compacted {len(infos)} files in {part_dir}")
+    return summary
@@ -0,0 +1,230 @@
+# src/xetrade/utils/rate_limit.py
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+Weight = Union[int, Callable[[Mapping[str, Any]], int]]
+
+@dataclass(frozen=True)
+class BucketSpec:
+    """`capacity` tokens, refilled evenly over `period_s` seconds."""
+    capacity: float
+    period_s: float
+
+    @property
+    def refill_per_sec(self) -> float:
+        return self.capacity / self.period_s
+
+@dataclass(frozen=True)
+class EndpointRule:
+    bucket: str      # name of the venue bucket this endpoint draws from
+    weight: Weight   # fixed weight, or fn(params) -> weight
+
+@dataclass(frozen=True)
+class VenueLimits:
+    buckets: Dict[str, BucketSpec]
+    endpoints: Dict[str, EndpointRule] = field(default_factory=dict)  # path prefix -> rule
+    default_bucket: str = "default"
+    default_weight: int = 1
+
+@dataclass
+class BucketStats:
+    acquired: int = 0
+    tokens_spent: float = 0.0
+    throttled: int = 0          # acquisitions that had to wait
+    wait_s_total: float = 0.0
+    penalties: int = 0          # 429s fed back from the HTTP layer
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of holding a lock:
+    each caller debits its weight immediately (tokens may go negative) and
+    sleeps for the deficit. Callers are served in arrival order and the
+    bucket isn't tied to any particular event loop.
+    """
+
+    def __init__(self, spec: BucketSpec):
+        self.spec = spec
+        self.tokens = float(spec.capacity)
+        self.updated = time.monotonic()
+        self.stats = BucketStats()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.spec.capacity, self.tokens + (now - self.updated) * self.spec.refill_per_sec)
+        self.updated = now
+
+    def reserve(self, weight: float) -> float:
+        """Debit `weight` tokens and return how long the caller must wait (s)."""
+        weight = min(float(weight), self.spec.capacity)  # an oversized request would never fit
+        self._refill()
+        self.tokens -= weight
+        self.stats.acquired += 1
+        self.stats.tokens_spent += weight
+        if self.tokens >= 0:
+            return 0.0
+        delay = -self.tokens / self.spec.refill_per_sec
+        self.stats.throttled += 1
+        self.stats.wait_s_total += delay
+        return delay
+
+    async def acquire(self, weight: float = 1.0) -> float:
+        delay = self.reserve(weight)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def penalize(self, seconds: float) -> None:
+        """Venue told us to back off: empty the bucket and push refill out by `seconds`."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.spec.refill_per_sec
+        self.stats.penalties += 1
+
+# ---- weight tables ----
+# Figures follow each venue's published public-endpoint limits; they are
+# deliberately the documented values, not headroom-adjusted ones.
+
+def _binance_depth_weight(params: Mapping[str, Any]) -> int:
+    limit = int(params.get("limit", 100))
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+def _binance_book_ticker_weight(params: Mapping[str, Any]) -> int:
+    return 2 if "symbol" in params else 4
+
+def _binance_premium_index_weight(params: Mapping[str, Any]) -> int:
+    return 1 if "symbol" in params else 10
+
+VENUE_LIMITS: Dict[str, VenueLimits] = {
+    "binance": VenueLimits(
+        buckets={
+            "spot": BucketSpec(6000, 60.0),          # REQUEST_WEIGHT per minute, api.binance.com
+            "fapi": BucketSpec(2400, 60.0),          # REQUEST_WEIGHT per minute, fapi.binance.com
+            "fapi_funding": BucketSpec(500, 300.0),  # /fapi/v1/fundingRate shares 500 / 5min / IP
+        },
+        endpoints={
+            "/api/v3/depth": EndpointRule("spot", _binance_depth_weight),
+            "/api/v3/ticker/bookTicker": EndpointRule("spot", _binance_book_ticker_weight),
+            "/api/v3/": EndpointRule("spot", 1),
+            "/fapi/v1/premiumIndex": EndpointRule("fapi", _binance_premium_index_weight),
+            "/fapi/v1/fundingRate": EndpointRule("fapi_funding", 1),
+            "/fapi/v1/fundingInfo": EndpointRule("fapi_funding", 1),
+            "/fapi/": EndpointRule("fapi", 1),
+        },
+        default_bucket="spot",
+    ),
+    "okx": VenueLimits(
+        # OKX limits each endpoint separately (requests per 2s per IP)
+        buckets={
+            "books": BucketSpec(40, 2.0),
+            "ticker": BucketSpec(20, 2.0),
+            "funding_rate": BucketSpec(20, 2.0),
+            "funding_history": BucketSpec(10, 2.0),
+            "default": BucketSpec(20, 2.0),
+        },
+        endpoints={
+            "/api/v5/market/books": EndpointRule("books", 1),
+            "/api/v5/market/ticker": EndpointRule("ticker", 1),
+            "/api/v5/public/funding-rate-history": EndpointRule("funding_history", 1),
+            "/api/v5/public/funding-rate": EndpointRule("funding_rate", 1),
+        },
+    ),
+    "kucoin": VenueLimits(
+        # VIP0 public resource pool: 2000 weight per 30s
+        buckets={"default": BucketSpec(2000, 30.0)},
+        endpoints={
+            "/api/v1/market/orderbook/level1": EndpointRule("default", 2),
+            "/api/v1/market/orderbook/level2": EndpointRule("default", 3),
+            "/api/v1/contracts/funding-rates": EndpointRule("default", 5),
+        },
+    ),
+    "bitmart": VenueLimits(
+        buckets={
+            "ticker": BucketSpec(10, 2.0),
+            "book": BucketSpec(12, 2.0),
+            "default": BucketSpec(10, 1.0),
+        },
+        endpoints={
+            "/spot/v1/ticker": EndpointRule("ticker", 1),
+            "/spot/v1/symbols/book": EndpointRule("book", 1),
+        },
+    ),
+    "derive": VenueLimits(buckets={"default": BucketSpec(100, 10.0)}),
+}
+
+DEFAULT_LIMITS = VenueLimits(buckets={"default": BucketSpec(50, 1.0)})
+
+class RateLimiter:
+    """
+    Client-side limiter keyed by venue (the same name used for HTTP pools).
+    Each request is matched to an endpoint rule by longest path prefix and
+    charged against that rule's bucket before it is sent.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, VenueLimits]] = None):
+        self._limits: Dict[str, VenueLimits] = dict(VENUE_LIMITS if limits is None else limits)
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._prefixes: Dict[str, Tuple[str, ...]] = {}
+
+    def configure(self, venue: str, limits: VenueLimits) -> None:
+        self._limits[venue] = limits
+        self._prefixes.pop(venue, None)
+        for key in [k for k in self._buckets if k[0] == venue]:
+            del self._buckets[key]
+
+    def _venue_limits(self, venue: str) -> VenueLimits:
+        return self._limits.get(venue, DEFAULT_LIMITS)
+
+    def _bucket(self, venue: str, name: str) -> TokenBucket:
+        key = (venue, name)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limits = self._venue_limits(venue)
+            spec = limits.buckets.get(name) or limits.buckets[limits.default_bucket]
+            bucket = self._buckets[key] = TokenBucket(spec)
+        return bucket
+
+    def resolve(self, venue: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple[str, int]:
+        """Return (bucket_name, weight) for a request."""
+        limits = self._venue_limits(venue)
+        prefixes = self._prefixes.get(venue)
+        if prefixes is None:
+            prefixes = self._prefixes[venue] = tuple(sorted(limits.endpoints, key=len, reverse=True))
+        path = urlparse(url).path
+        for prefix in prefixes:
+            if path.startswith(prefix):
+                rule = limits.endpoints[prefix]
+                weight = rule.weight(params or {}) if callable(rule.weight) else rule.weight
+                return rule.bucket, weight
+        return limits.default_bucket, limits.default_weight
+
+    async def acquire(self, venue: str, url: str, params: Optional[Mapping[str, Any]] = None) -> float:
+        """Wait until the request fits the venue budget. Returns seconds waited."""
+        name, weight = self.resolve(venue, url, params)
+        return await self._bucket(venue, name).acquire(weight)
+
+    def penalize(self, venue: str, url: str, seconds: float) -> None:
+        """Feed a server-side 429 back so every caller on that bucket backs off."""
+        name, _ = self.resolve(venue, url)
+        self._bucket(venue, name).penalize(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for (venue, name), bucket in self._buckets.items():
+            bucket._refill()
+            row = asdict(bucket.stats)
+            row["tokens_available"] = bucket.tokens
+            row["capacity"] = bucket.spec.capacity
+            out[f"{venue}:{name}"] = row
+        return out
+
+# single shared instance
+limiter = RateLimiter()
@@ -0,0 +1,180 @@
+# src/xetrade/utils/s3_local.py
+from __future__ import annotations
+import base64
+import hashlib
+import io
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from xetrade.utils.s3_upload import MIN_PART_SIZE
+
+class LocalS3Error(Exception):
+    """Mirrors an S3 error response; code is the S3 error code (e.g. 'BadDigest')."""
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
+
+class LocalS3:
+    """
+    Filesystem-backed stand-in for the subset of boto3's S3 client that
+    the storage code uses, so uploads can be exercised with no network.
+    Objects live at root/<bucket>/<key>; in-progress multipart uploads at
+    root/.multipart/<upload id>/. Like S3 it verifies Content-MD5, returns
+    MD5 ETags (multipart: MD5 of the part digests plus '-<parts>'), and
+    rejects non-final parts smaller than min_part_size.
+
+    fail_next_parts(n) / corrupt_next_parts(n) make the next n upload_part
+    calls fail or return a wrong ETag, for exercising retries.
+
+        s3 = LocalS3("/tmp/s3")
+        storage = S3ParquetStorage(bucket_name="test", s3_client=s3)
+    """
+
+    def __init__(self, root: str, *, min_part_size: int = MIN_PART_SIZE):
+        self.root = root
+        self.min_part_size = min_part_size
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._fail_parts = 0
+        self._corrupt_parts = 0
+        os.makedirs(os.path.join(root, ".multipart"), exist_ok=True)
+
+    # --- fault injection ---
+    def fail_next_parts(self, n: int) -> None:
+        with self._lock:
+            self._fail_parts += n
+
+    def corrupt_next_parts(self, n: int) -> None:
+        with self._lock:
+            self._corrupt_parts += n
+
+    # --- helpers ---
+    def object_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    @staticmethod
+    def _check_md5(body: bytes, content_md5: Optional[str]) -> bytes:
+        digest = hashlib.md5(body).digest()
+        if content_md5 is not None and base64.b64decode(content_md5) != digest:
+            raise LocalS3Error("BadDigest", "Content-MD5 does not match the body")
+        return digest
+
+    def _write(self, path: str, body: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def _upload_dir(self, upload_id: str) -> str:
+        path = os.path.join(self.root, ".multipart", upload_id)
+        if not os.path.isdir(path):
+            raise LocalS3Error("NoSuchUpload", upload_id)
+        return path
+
+    # --- boto3 S3 client API ---
+    def put_object(self, *, Bucket: str, Key: str, Body: Any, ContentMD5: Optional[str] = None,
+                   **kwargs) -> Dict[str, Any]:
+        self._count("put_object")
+        body = Body.read() if hasattr(Body, "read") else bytes(Body)
+        digest = self._check_md5(body, ContentMD5)
+        self._write(self.object_path(Bucket, Key), body)
+        return {"ETag": f'"{digest.hex()}"'}
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, **kwargs) -> None:
+        self._count("upload_file")
+        with open(Filename, "rb") as f:
+            self._write(self.object_path(Bucket, Key), f.read())
+
+    def get_object(self, *, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        self._count("get_object")
+        path = self.object_path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise LocalS3Error("NoSuchKey", Key)
+        with open(path, "rb") as f:
+            body = f.read()
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+    def list_objects_v2(self, *, Bucket: str, Prefix: str = "", **kwargs) -> Dict[str, Any]:
+        self._count("list_objects_v2")
+        base = os.path.join(self.root, Bucket)
+        contents: List[Dict[str, Any]] = []
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                key = os.path.relpath(path, base).replace(os.sep, "/")
+                if key.startswith(Prefix) and not name.endswith(".tmp"):
+                    contents.append({"Key": key, "Size": os.path.getsize(path)})
+        contents.sort(key=lambda c: c["Key"])
+        return {"Contents": contents, "KeyCount": len(contents)}
+
+    def create_multipart_upload(self, *, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        self._count("create_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, ".multipart", upload_id))
+        with open(os.path.join(self.root, ".multipart", upload_id, "target"), "w") as f:
+            f.write(f"{Bucket}\n{Key}")
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def upload_part(self, *, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: Any,
+                    ContentMD5: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        self._count("upload_part")
+        with self._lock:
+            fail = self._fail_parts > 0
+            self._fail_parts -= fail
+            corrupt = not fail and self._corrupt_parts > 0
+            self._corrupt_parts -= corrupt
+        if fail:
+            raise LocalS3Error("InternalError", "injected failure")
+        if not 1 <= PartNumber <= 10000:
+            raise LocalS3Error("InvalidArgument", f"part number {PartNumber}")
+        body = Body.read() if hasattr(Body, "read") else bytes(Body)
+        digest = self._check_md5(body, ContentMD5)
+        self._write(os.path.join(self._upload_dir(UploadId), f"{PartNumber:05d}"), body)
+        etag = hashlib.md5(b"corrupted" + body).hexdigest() if corrupt else digest.hex()
+        return {"ETag": f'"{etag}"'}
+
+    def complete_multipart_upload(self, *, Bucket: str, Key: str, UploadId: str,
+                                  MultipartUpload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        self._count("complete_multipart_upload")
+        updir = self._upload_dir(UploadId)
+        parts = MultipartUpload.get("Parts", [])
+        numbers = [p["PartNumber"] for p in parts]
+        if not parts or numbers != sorted(set(numbers)):
+            raise LocalS3Error("InvalidPartOrder", "parts must be listed in ascending order")
+        digests = []
+        bodies = []
+        for i, part in enumerate(parts):
+            path = os.path.join(updir, f"{part['PartNumber']:05d}")
+            if not os.path.isfile(path):
+                raise LocalS3Error("InvalidPart", f"part {part['PartNumber']} was not uploaded")
+            with open(path, "rb") as f:
+                body = f.read()
+            digest = hashlib.md5(body).digest()
+            if part["ETag"].strip('"') != digest.hex():
+                raise LocalS3Error("InvalidPart", f"ETag mismatch for part {part['PartNumber']}")
+            if i < len(parts) - 1 and len(body) < self.min_part_size:
+                raise LocalS3Error("EntityTooSmall", f"part {part['PartNumber']} is {len(body)} bytes")
+            digests.append(digest)
+            bodies.append(body)
+        self._write(self.object_path(Bucket, Key), b"".join(bodies))
+        shutil.rmtree(updir, ignore_errors=True)
+        etag = f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(parts)}"
+        return {"Bucket": Bucket, "Key": Key, "ETag": f'"{etag}"'}
+
+    def abort_multipart_upload(self, *, Bucket: str, Key: str, UploadId: str, **kwargs) -> Dict[str, Any]:
+        self._count("abort_multipart_upload")
+        shutil.rmtree(self._upload_dir(UploadId), ignore_errors=True)
+        return {}
+
+    def pending_uploads(self) -> List[str]:
+        """Upload ids started but neither completed nor aborted."""
+        return sorted(os.listdir(os.path.join(self.root, ".multipart")))
@@ -0,0 +1,200 @@
+# src/xetrade/utils/s3_upload.py
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Union
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+MIN_PART_SIZE = 5 * MiB  # S3 rejects smaller parts except the last
+
+class S3UploadError(Exception):
+    """An upload failed after all retries (a multipart upload is aborted first)."""
+
+@dataclass
+class UploadStats:
+    uploads: int = 0            # objects completed
+    multipart: int = 0          # of which multipart
+    parts: int = 0
+    bytes: int = 0
+    retries: int = 0
+    checksum_mismatches: int = 0
+    failures: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    total_upload_ms: float = 0.0
+
+@dataclass(frozen=True)
+class UploadResult:
+    key: str
+    size: int
+    etag: str
+    parts: int
+    elapsed_ms: float
+
+def _md5(data: Union[bytes, memoryview]) -> tuple:
+    digest = hashlib.md5(data).digest()
+    return digest.hex(), base64.b64encode(digest).decode("ascii")
+
+class MultipartUploader:
+    """
+    Non-blocking S3 uploads for any client with boto3's S3 API (a boto3
+    client, or utils.s3_local.LocalS3 in tests). The blocking client calls
+    run in worker threads; the event loop only coordinates.
+
+    Objects up to part_size go up in one put_object; larger ones as a
+    multipart upload whose parts (read lazily, so at most part_concurrency
+    parts are in memory) are sent in parallel. Every request carries a
+    Content-MD5, and the returned ETag is compared with the local MD5, so a
+    corrupted part is retried rather than stored. Failed requests are
+    retried max_retries times with exponential backoff; a multipart upload
+    that still fails is aborted. At most max_uploads objects are in flight.
+
+    ETag checks assume SSE-S3 or no encryption (SSE-KMS ETags are not MD5s).
+    part_size below min_part_size (S3's 5 MiB floor) is rejected up front,
+    since S3 would only refuse it at CompleteMultipartUpload; tests against
+    LocalS3 lower both.
+    """
+
+    def __init__(self, client: Any, bucket: str, *, part_size: int = 8 * MiB,
+                 part_concurrency: int = 4, max_uploads: int = 2,
+                 max_retries: int = 3, backoff: float = 0.5,
+                 min_part_size: int = MIN_PART_SIZE):
+        if part_size < 1:
+            raise ValueError("part_size must be > 0")
+        if part_size < min_part_size:
+            raise ValueError(f"part_size must be >= {min_part_size} bytes (S3 rejects smaller parts)")
+        self.client = client
+        self.bucket = bucket
+        self.part_size = part_size
+        self.part_concurrency = part_concurrency
+        self.max_uploads = max_uploads
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = UploadStats()
+        self._uploads = asyncio.Semaphore(max_uploads)
+
+    # --- public API ---
+    async def upload_bytes(self, key: str, data: Union[bytes, bytearray, memoryview]) -> UploadResult:
+        """Upload an in-memory buffer (e.g. a Parquet file written to BytesIO); parts are sliced from it as they are sent."""
+        view = memoryview(data)
+
+        async def _read(offset: int, length: int) -> memoryview:
+            return view[offset:offset + length]
+        return await self._upload(key, len(view), _read)
+
+    async def upload_file(self, path: str, key: str) -> UploadResult:
+        """Upload a local file, reading each part only when it is about to be sent."""
+        size = os.path.getsize(path)
+
+        def _read_sync(offset: int, length: int) -> bytes:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+
+        async def _read(offset: int, length: int) -> bytes:
+            return await asyncio.to_thread(_read_sync, offset, length)
+        return await self._upload(key, size, _read)
+
+    def metrics(self) -> Dict[str, Any]:
+        row = asdict(self.stats)
+        row["avg_upload_ms"] = row["total_upload_ms"] / row["uploads"] if row["uploads"] else 0.0
+        return row
+
+    # --- internals ---
+    async def _upload(self, key: str, size: int,
+                      read: Callable[[int, int], Awaitable[Union[bytes, memoryview]]]) -> UploadResult:
+        async with self._uploads:
+            self.stats.in_flight += 1
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+            start = time.perf_counter()
+            try:
+                if size <= self.part_size:
+                    etag = await self._put(key, await read(0, size))
+                    parts = 1
+                else:
+                    etag, parts = await self._multipart(key, size, read)
+            except Exception:
+                self.stats.failures += 1
+                raise
+            finally:
+                self.stats.in_flight -= 1
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats.uploads += 1
+            self.stats.bytes += size
+            self.stats.total_upload_ms += elapsed_ms
+            return UploadResult(key=key, size=size, etag=etag, parts=parts, elapsed_ms=elapsed_ms)
+
+    async def _with_retries(self, what: str, attempt: Callable[[], Any]) -> Any:
+        """Run a blocking client call in a thread, retrying with exponential backoff."""
+        delay = self.backoff
+        for n in range(self.max_retries + 1):
+            try:
+                return await asyncio.to_thread(attempt)
+            except Exception as e:
+                if n == self.max_retries:
+                    raise S3UploadError(f"{what} failed after {n + 1} attempts: {e}") from e
+                self.stats.retries += 1
+                logger.warning(f"{what} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    def _checked(self, what: str, call: Callable[[], Dict[str, Any]], md5_hex: str) -> Callable[[], str]:
+        def _attempt() -> str:
+            etag = call()["ETag"].strip('"')
+            if etag != md5_hex:
+                self.stats.checksum_mismatches += 1
+                raise S3UploadError(f"{what}: ETag {etag} != MD5 {md5_hex}")
+            return etag
+        return _attempt
+
+    async def _put(self, key: str, body: Union[bytes, memoryview]) -> str:
+        md5_hex, md5_b64 = _md5(body)
+        body = bytes(body)
+        call = lambda: self.client.put_object(Bucket=self.bucket, Key=key, Body=body, ContentMD5=md5_b64)
+        return await self._with_retries(f"put {key}", self._checked(f"put {key}", call, md5_hex))
+
+    async def _multipart(self, key: str, size: int,
+                         read: Callable[[int, int], Awaitable[Union[bytes, memoryview]]]) -> tuple:
+        resp = await self._with_retries(
+            f"create {key}", lambda: self.client.create_multipart_upload(Bucket=self.bucket, Key=key))
+        upload_id = resp["UploadId"]
+        slots = asyncio.Semaphore(self.part_concurrency)
+        n_parts = -(-size // self.part_size)
+
+        async def _part(number: int) -> Dict[str, Any]:
+            async with slots:
+                offset = (number - 1) * self.part_size
+                body = bytes(await read(offset, min(self.part_size, size - offset)))
+                md5_hex, md5_b64 = _md5(body)
+                what = f"part {number}/{n_parts} of {key}"
+                call = lambda: self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                       PartNumber=number, Body=body, ContentMD5=md5_b64)
+                etag = await self._with_retries(what, self._checked(what, call, md5_hex))
+                self.stats.parts += 1
+                return {"ETag": f'"{etag}"', "PartNumber": number}
+
+        tasks = [asyncio.create_task(_part(i)) for i in range(1, n_parts + 1)]
+        try:
+            parts: List[Dict[str, Any]] = await asyncio.gather(*tasks)
+            resp = await self._with_retries(f"complete {key}", lambda: self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}))
+        except BaseException:
+            # includes cancellation: stop the other parts and don't leave orphaned parts in the bucket
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await asyncio.to_thread(self.client.abort_multipart_upload,
+                                        Bucket=self.bucket, Key=key, UploadId=upload_id)
+            except Exception as e:
+                logger.error(f"abort of {key} ({upload_id}) failed: {e}")
+            raise
+        self.stats.multipart += 1
+        return resp["ETag"].strip('"'), n_parts
@@ -1,10 +1,18 @@
 # src/xetrade/utils/symbol_mapper.py
 from __future__ import annotations
+import os
 import re
-from typing import Dict, List, Optional, Tuple, Set
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Set
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
+_MULTIPLIER_RE = re.compile(r'^(\d+)([A-Z]+)$')
+
 class QuoteCurrencyType(Enum):
     """Types of quote currencies for classification."""
     USD = "USD"           # US Dollar
@@ -38,9 +46,16 @@ class UniversalSymbolMapper:
     - Suffixes (e.g., -USD vs -USDT)
     - Quote currency notation (e.g., USD vs USDT vs USDC)
     - Separators (e.g., BTC-USDT vs BTCUSDT vs BTC/USDT)
+
+    The tables are frozen (tuples and read-only mappings) once built, and
+    everything derived from them is precomputed: quote suffixes sorted by
+    length, one regex each for noise, contract flags and separators.
+    map_symbol results are memoized (LRU, cache_size entries), which is
+    only sound because the tables can't change. Use get_symbol_mapper()
+    for the shared instance instead of constructing one per call.
     """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 65536):
         # Common separators
         self.separators = ['-', '_', '/']
         
@@ -244,6 +259,45 @@ class UniversalSymbolMapper:
             "USDJ": "USDJ",
             "USDP": "USDP",
         }
+
+        self._cache_size = cache_size
+        self._freeze()
+        self._map_cached = lru_cache(maxsize=cache_size)(self._map_symbol)
+
+    def __getstate__(self) -> Dict:
+        # tables only: the read-only views don't pickle and the cache is per process
+        return {k: dict(v) if isinstance(v, MappingProxyType) else v
+                for k, v in self.__dict__.items() if k != "_map_cached"}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._freeze()
+        self._map_cached = lru_cache(maxsize=self._cache_size)(self._map_symbol)
+
+    def _freeze(self) -> None:
+        """Make the tables read-only and precompute what the parsers need from them."""
+        for name in ("separators", "known_quotes", "contract_flags", "exchange_noise", "prefix_patterns"):
+            setattr(self, name, tuple(getattr(self, name)))
+        for name in ("asset_aliases", "stablecoin_to_fiat", "quote_mappings", "asset_mappings"):
+            setattr(self, name, MappingProxyType(dict(getattr(self, name))))
+
+        # stable sort keeps the priority order among quotes of equal length
+        self._quotes_by_len = tuple(sorted(self.known_quotes, key=len, reverse=True))
+        # the leftmost match anchored at the end is the longest known quote suffix
+        self._quote_suffix_re = re.compile("(?:" + "|".join(re.escape(q) for q in self._quotes_by_len) + ")$")
+        by_len = lambda tokens: sorted(tokens, key=len, reverse=True)
+        # noise and flags are separate passes: noise can contain a flag ('SPOT:',
+        # 'FUTURES:'), and a separator in front of it must not let '-FUT' win
+        noise = "|".join(re.escape(n) for n in by_len(self.exchange_noise))
+        flags = "|".join(re.escape(f) for f in by_len(self.contract_flags))
+        seps = "".join(re.escape(c) for c in self.separators)
+        self._noise_re = re.compile(noise)
+        self._flag_re = re.compile(f"[{seps}]?(?:{flags})")
+        self._sep_re = re.compile(f"[{seps}]+")
+
+    def cache_info(self):
+        """Hit/miss statistics of the map_symbol cache."""
+        return self._map_cached.cache_info()
     
     def normalize_symbol(self, symbol: str, exchange: str = "unknown") -> str:
         """
@@ -256,26 +310,9 @@ class UniversalSymbolMapper:
         Returns:
             Normalized symbol string
         """
-        # Convert to uppercase and remove spaces
-        s = symbol.upper().strip()
-        
-        # Remove exchange-specific noise
-        for noise in self.exchange_noise:
-            s = s.replace(noise, "")
-        
-        # Replace separators with single dash
-        for sep in self.separators:
-            s = s.replace(sep, "-")
-        
-        # Remove contract flags
-        for flag in self.contract_flags:
-            s = s.replace(f"-{flag}", "").replace(flag, "")
-        
-        # Clean up multiple dashes and strip
-        s = re.sub(r'-+', '-', s)
-        s = s.strip('-')
-        
-        return s
+        # Uppercase, strip noise and contract flags, then collapse separators into single dashes
+        s = self._flag_re.sub("", self._noise_re.sub("", symbol.upper().strip()))
+        return self._sep_re.sub("-", s).strip('-')
     
     def strip_multiplier(self, token: str) -> Tuple[str, int]:
         """
@@ -287,7 +324,7 @@ class UniversalSymbolMapper:
         Returns:
             Tuple of (base_token, multiplier)
         """
-        match = re.match(r'^(\d+)([A-Z]+)$', token)
+        match = _MULTIPLIER_RE.match(token)
         if match:
             multiplier = int(match.group(1))
             base_token = match.group(2)
@@ -304,20 +341,25 @@ class UniversalSymbolMapper:
         Returns:
             Tuple of (base, quote, multiplier)
         """
+        split = self._split(symbol)
+        if split is None:
+            raise ValueError(f"Cannot infer quote currency from symbol: {symbol}")
+        return split
+
+    def _split(self, symbol: str) -> Optional[Tuple[str, str, int]]:
+        """split_base_quote without the exception (the bulk path hits unparseable symbols often)."""
         parts = symbol.split('-')
         
         if len(parts) == 2:
             # Clear separator case: BTC-USDT
             base_part, quote = parts
         else:
-            # No separator case: BTCUSDT
-            # Try to infer by scanning from end for known quotes
-            for quote in sorted(self.known_quotes, key=len, reverse=True):
-                if symbol.endswith(quote):
-                    base_part = symbol[:-len(quote)]
-                    break
-            else:
-                raise ValueError(f"Cannot infer quote currency from symbol: {symbol}")
+            # No separator case: BTCUSDT; take the longest known quote it ends with
+            match = self._quote_suffix_re.search(symbol)
+            if match is None:
+                return None
+            quote = match.group()
+            base_part = symbol[:match.start()]
         
         # Strip multiplier from base
         base, multiplier = self.strip_multiplier(base_part)
@@ -364,25 +406,49 @@ class UniversalSymbolMapper:
             exchange: Exchange name for context
             
         Returns:
-            SymbolMapping with universal symbol and confidence
+            SymbolMapping with universal symbol and confidence (memoized:
+            repeated calls return the same object, so don't mutate metadata)
+        """
+        return self._map_cached(exchange_symbol, exchange)
+
+    def _map_symbol(self, exchange_symbol: str, exchange: str) -> SymbolMapping:
+        universal, base, quote, quote_type, multiplier, confidence, stablecoin_type, error = \
+            self._map_row(exchange_symbol, exchange)
+        if error is not None:
+            return SymbolMapping(
+                exchange_symbol=exchange_symbol,
+                universal_symbol=universal,
+                base_asset=base,
+                quote_asset=quote,
+                quote_type=quote_type,
+                confidence=confidence,
+                metadata={"error": error}
+            )
+        return SymbolMapping(
+            exchange_symbol=exchange_symbol,
+            universal_symbol=universal,
+            base_asset=base,
+            quote_asset=quote,
+            quote_type=quote_type,
+            confidence=confidence,
+            metadata={"stablecoin_type": stablecoin_type, "multiplier": multiplier}
+        )
+
+    def _map_row(self, exchange_symbol: str, exchange: str) -> Tuple:
+        """
+        The fields of map_symbol's result as a plain tuple: (universal, base,
+        quote, quote_type, multiplier, confidence, stablecoin_type, error).
         """
         # Normalize the exchange symbol
         normalized_symbol = self.normalize_symbol(exchange_symbol, exchange)
         
         # Split into base and quote
-        try:
-            base, quote, multiplier = self.split_base_quote(normalized_symbol)
-        except ValueError as e:
+        split = self._split(normalized_symbol)
+        if split is None:
             # If splitting fails, return a mapping with low confidence
-            return SymbolMapping(
-                exchange_symbol=exchange_symbol,
-                universal_symbol=exchange_symbol, # Cannot map
-                base_asset=exchange_symbol,
-                quote_asset=exchange_symbol,
-                quote_type=QuoteCurrencyType.OTHER,
-                confidence=0.1,
-                metadata={"error": str(e)}
-            )
+            return (exchange_symbol, exchange_symbol, exchange_symbol, QuoteCurrencyType.OTHER, 1, 0.1, None,
+                    f"Cannot infer quote currency from symbol: {normalized_symbol}")
+        base, quote, multiplier = split
         
         # Resolve assets and get quote type
         canonical_base, canonical_quote, stablecoin_type = self.resolve_assets(base, quote)
@@ -413,15 +479,20 @@ class UniversalSymbolMapper:
         if not canonical_base or not canonical_quote:
             confidence -= 0.3
         
-        return SymbolMapping(
-            exchange_symbol=exchange_symbol,
-            universal_symbol=f"{canonical_base}/{canonical_quote}",
-            base_asset=canonical_base,
-            quote_asset=canonical_quote,
-            quote_type=quote_type,
-            confidence=confidence,
-            metadata={"stablecoin_type": stablecoin_type}
-        )
+        return (f"{canonical_base}/{canonical_quote}", canonical_base, canonical_quote, quote_type,
+                multiplier, confidence, stablecoin_type, None)
+
+    def map_many(self, exchange_symbols: Iterable[str], exchange: str = "unknown",
+                 processes: Optional[int] = None, parallel_min: int = 200_000) -> "SymbolTable":
+        """
+        Map a whole instrument list into a columnar SymbolTable (row order
+        kept). Each distinct symbol is mapped once. Lists with at least
+        parallel_min distinct symbols are split across `processes` worker
+        processes (default: CPU count); below that the pool costs more
+        than it saves.
+        """
+        return map_instruments({exchange: exchange_symbols}, processes=processes,
+                               parallel_min=parallel_min, mapper=self)
     
     def find_equivalent_symbols(self, target_symbol: str, exchange_symbols: List[str], 
                               exchange: str = "unknown") -> List[SymbolMapping]:
@@ -436,15 +507,10 @@ class UniversalSymbolMapper:
         Returns:
             List of SymbolMapping objects that map to the target
         """
-        target_base, target_quote = target_symbol.split("/", 1) if "/" in target_symbol else (None, None)
-        
-        results = []
-        for symbol in exchange_symbols:
-            mapping = self.map_symbol(symbol, exchange)
-            if mapping.universal_symbol == target_symbol:
-                results.append(mapping)
-        
-        return results
+        table = self.map_many(exchange_symbols, exchange)
+        return [self.map_symbol(sym, exchange)
+                for sym, universal in zip(table.exchange_symbol, table.universal)
+                if universal == target_symbol]
     
     def get_exchange_symbol(self, universal_symbol: str, exchange: str) -> str:
         """
@@ -515,4 +581,117 @@ class UniversalSymbolMapper:
                     symbols.append(symbol)
             result[quote_type] = symbols
         
-        return result 
\ No newline at end of file
+        return result 
+
+@lru_cache(maxsize=None)
+def get_symbol_mapper() -> UniversalSymbolMapper:
+    """Process-wide shared mapper; its tables are read-only, so sharing is safe."""
+    return UniversalSymbolMapper()
+
+# --- Bulk mapping ---
+
+Row = Tuple[str, str, str, int, float, bool]  # universal, base, quote, multiplier, confidence, parsed
+
+@dataclass(frozen=True, eq=False)
+class SymbolTable:
+    """
+    Columnar result of mapping instrument lists: one row per input symbol,
+    string columns as tuples and numeric columns as NumPy arrays. parsed is
+    False where no quote currency could be found (universal is then the
+    raw symbol and confidence 0.1).
+    """
+    exchange: Tuple[str, ...]
+    exchange_symbol: Tuple[str, ...]
+    universal: Tuple[str, ...]
+    base: Tuple[str, ...]
+    quote: Tuple[str, ...]
+    multiplier: np.ndarray   # int64
+    confidence: np.ndarray   # float64
+    parsed: np.ndarray       # bool
+
+    def __len__(self) -> int:
+        return len(self.exchange_symbol)
+
+    def reverse_index(self, min_confidence: float = 0.0) -> Dict[str, Dict[str, List[str]]]:
+        """universal symbol -> {exchange: [exchange symbols]}, parsed rows only."""
+        index: Dict[str, Dict[str, List[str]]] = {}
+        keep = self.parsed & (self.confidence >= min_confidence)
+        for i in np.flatnonzero(keep):
+            index.setdefault(self.universal[i], {}).setdefault(self.exchange[i], []).append(self.exchange_symbol[i])
+        return index
+
+    def to_arrow(self):
+        import pyarrow as pa
+        return pa.table({
+            "exchange": pa.array(self.exchange, pa.string()).dictionary_encode(),
+            "exchange_symbol": pa.array(self.exchange_symbol, pa.string()),
+            "universal": pa.array(self.universal, pa.string()),
+            "base": pa.array(self.base, pa.string()),
+            "quote": pa.array(self.quote, pa.string()),
+            "multiplier": self.multiplier,
+            "confidence": self.confidence,
+            "parsed": self.parsed,
+        })
+
+def _table_row(mapper: UniversalSymbolMapper, symbol: str, exchange: str) -> Row:
+    universal, base, quote, _, multiplier, confidence, _, error = mapper._map_row(symbol, exchange)
+    return (universal, base, quote, multiplier, confidence, error is None)
+
+_worker_mapper: Optional[UniversalSymbolMapper] = None
+
+def _init_worker(mapper: UniversalSymbolMapper) -> None:
+    # the caller's mapper, pickled once per worker, so customized tables carry over
+    global _worker_mapper
+    _worker_mapper = mapper
+
+def _map_chunk(exchange: str, symbols: List[str]) -> List[Row]:
+    return [_table_row(_worker_mapper, sym, exchange) for sym in symbols]
+
+def map_instruments(instruments: Mapping[str, Iterable[str]], processes: Optional[int] = None,
+                    parallel_min: int = 200_000, mapper: Optional[UniversalSymbolMapper] = None) -> SymbolTable:
+    """
+    Map every venue's instrument list in one pass:
+
+        table = map_instruments({"binance": ["BTCUSDT", ...], "okx": ["BTC-USDT-SWAP", ...]})
+        table.reverse_index()["BTC/USD"]  # {"binance": ["BTCUSDT"], "okx": ["BTC-USDT-SWAP"]}
+
+    Distinct (exchange, symbol) pairs are mapped once; with parallel_min
+    or more of them the work is spread over a process pool, each worker
+    getting a pickled copy of mapper (tables included).
+    """
+    mapper = mapper or get_symbol_mapper()
+    exchanges: List[str] = []
+    symbols: List[str] = []
+    for exchange, syms in instruments.items():
+        syms = list(syms)
+        exchanges.extend([exchange] * len(syms))
+        symbols.extend(syms)
+    keys = list(dict.fromkeys(zip(exchanges, symbols)))
+    workers = processes if processes is not None else (os.cpu_count() or 1)
+    if workers > 1 and len(keys) >= parallel_min:
+        by_exchange: Dict[str, List[str]] = {}
+        for exchange, sym in keys:
+            by_exchange.setdefault(exchange, []).append(sym)
+        chunk = -(-len(keys) // (workers * 4))
+        jobs = [(exchange, syms[i:i + chunk]) for exchange, syms in by_exchange.items()
+                for i in range(0, len(syms), chunk)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mapper,)) as pool:
+            parts = pool.map(_map_chunk, [j[0] for j in jobs], [j[1] for j in jobs])
+            rows: Dict[Tuple[str, str], Row] = {}
+            for (exchange, syms), part in zip(jobs, parts):
+                rows.update(zip(((exchange, sym) for sym in syms), part))
+    else:
+        # keys are distinct already, so skip the LRU (it would only churn)
+        rows = {key: _table_row(mapper, key[1], key[0]) for key in keys}
+    cols = list(zip(*(rows[key] for key in zip(exchanges, symbols)))) or [()] * 6
+    return SymbolTable(
+        exchange=tuple(exchanges),
+        exchange_symbol=tuple(symbols),
+        universal=tuple(cols[0]),
+        base=tuple(cols[1]),
+        quote=tuple(cols[2]),
+        multiplier=np.array(cols[3], dtype=np.int64),
+        confidence=np.array(cols[4], dtype=np.float64),
+        parsed=np.array(cols[5], dtype=bool),
+    )
+
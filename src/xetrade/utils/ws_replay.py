@@ -0,0 +1,94 @@
+# src/xetrade/utils/ws_replay.py
+from __future__ import annotations
+import asyncio
+import base64
+import json
+from typing import Any, List, Optional, Union
+
+from aiohttp import web, WSMsgType
+
+Frame = Union[str, bytes, dict, list]
+
+class ReplayWebSocketServer:
+    """
+    Local WebSocket server that plays back a fixed list of frames to every
+    client, so OrderBookStream can be exercised without a venue connection.
+
+    Frames can be str/bytes (sent as-is) or dicts/lists (JSON-encoded).
+    Playback starts after the client's first frame (its subscribe message),
+    with 'interval' seconds between frames. Frames sent by clients are kept
+    in 'received'.
+
+        async with ReplayWebSocketServer.from_file("btc.jsonl") as url:
+            async for book in ex.stream_l2_orderbook(pair, ws_url=url, snapshot=...):
+                ...
+    """
+
+    def __init__(self, frames: List[Frame], *, interval: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, close_after: bool = True):
+        self.frames = list(frames)
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.close_after = close_after
+        self.received: List[Any] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ReplayWebSocketServer":
+        """Load frames recorded by OrderBookStream(record_path=...)."""
+        frames: List[Frame] = []
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                frames.append(base64.b64decode(row["b64"]) if "b64" in row else row["text"])
+        return cls(frames, **kwargs)
+
+    async def _handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        first = await ws.receive()
+        if first.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+            self.received.append(first.data)
+        for frame in self.frames:
+            if ws.closed:
+                break
+            if isinstance(frame, bytes):
+                await ws.send_bytes(frame)
+            elif isinstance(frame, str):
+                await ws.send_str(frame)
+            else:
+                await ws.send_str(json.dumps(frame))
+            if self.interval:
+                await asyncio.sleep(self.interval)
+        if self.close_after:
+            await ws.close()
+        else:
+            async for msg in ws:
+                if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    self.received.append(msg.data)
+        return ws
+
+    async def start(self) -> str:
+        """Start listening; returns the ws:// URL to connect to."""
+        app = web.Application()
+        app.router.add_get("/", self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"ws://{self.host}:{port}/"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> str:
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
@@ -0,0 +1,29 @@
+# tests/test_decode.py
+import numpy as np
+
+from xetrade.utils.decode import float_pairs, parse_level_dicts, parse_levels
+
+def test_parse_levels_uniform_rows():
+    px, qty = parse_levels([["1.5", "2"], ["1.4", "3"]])
+    assert px.dtype == np.float64 and px.flags.c_contiguous
+    assert px.tolist() == [1.5, 1.4]
+    assert qty.tolist() == [2.0, 3.0]
+
+def test_parse_levels_uses_first_two_columns():
+    px, qty = parse_levels([["100.1", "0.5", "0", "2"], ["100.0", "1", "0", "1"]])
+    assert px.tolist() == [100.1, 100.0]
+    assert qty.tolist() == [0.5, 1.0]
+
+def test_parse_levels_ragged_rows():
+    px, qty = parse_levels([["1", "2"], ["3", "4", "5"]])
+    assert px.tolist() == [1.0, 3.0]
+    assert qty.tolist() == [2.0, 4.0]
+
+def test_parse_levels_empty():
+    px, qty = parse_levels([])
+    assert px.shape == qty.shape == (0,)
+
+def test_parse_level_dicts_and_float_pairs():
+    px, qty = parse_level_dicts([{"price": "10", "size": "1"}])
+    assert (px.tolist(), qty.tolist()) == ([10.0], [1.0])
+    assert float_pairs([["1", "2", "7"]]) == [(1.0, 2.0)]
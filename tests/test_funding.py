@@ -0,0 +1,81 @@
+# tests/test_funding.py
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from xetrade.models import FundingPoint
+from xetrade.services.funding import (
+    apr_from_periodic, apr_from_periodic_batch, apy_from_periodic, apy_from_periodic_batch,
+    ewma_funding, rolling_funding, series_to_arrays, summarize_arrays, summarize_history,
+)
+
+HOUR = 3600_000
+
+def _history(n=2000, seed=3):
+    """Hourly and 8-hourly stretches with a few outages, rates around 1e-4."""
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([HOUR, 8 * HOUR], size=n, p=[0.7, 0.3])
+    steps[rng.choice(n, size=5, replace=False)] = 3 * 24 * HOUR  # gaps
+    ts = 1_600_000_000_000 + np.cumsum(steps).astype(np.int64)
+    rates = 1e-4 + 5e-5 * rng.standard_normal(n)
+    return ts, rates
+
+def _frame(ts, rates):
+    return pd.Series(rates, index=pd.to_datetime(ts, unit="ms"))
+
+def test_rolling_matches_pandas():
+    ts, rates = _history()
+    got = rolling_funding(ts, rates, 7 * 24 * HOUR)
+    roll = _frame(ts, rates).rolling("7D")
+    np.testing.assert_array_equal(got.count, roll.count().to_numpy())
+    np.testing.assert_allclose(got.total, roll.sum().to_numpy(), rtol=1e-12, atol=1e-18)
+    np.testing.assert_allclose(got.mean, roll.mean().to_numpy(), rtol=1e-12, atol=1e-18)
+    np.testing.assert_allclose(got.std, roll.std().to_numpy(), rtol=1e-9, atol=1e-15, equal_nan=True)
+    assert math.isnan(got.std[0])  # one point: no sample std
+
+def test_ewma_matches_pandas():
+    ts, rates = _history()
+    got = ewma_funding(ts, rates, 24 * HOUR)
+    want = _frame(ts, rates).ewm(halflife=pd.Timedelta(hours=24), times=pd.to_datetime(ts, unit="ms")).mean()
+    np.testing.assert_allclose(got, want.to_numpy(), rtol=1e-12)
+
+def test_ewma_across_chunk_boundaries():
+    # a 1h half-life gives ~866h chunks, so 2000h of hourly data spans three
+    ts = np.arange(2000, dtype=np.int64) * HOUR
+    rates = np.sin(np.arange(2000) / 50.0) * 1e-4
+    got = ewma_funding(ts, rates, HOUR)
+    age = (ts[:, None] - ts[None, :]) / HOUR
+    w = np.where(age >= 0, 0.5 ** np.maximum(age, 0), 0.0)  # brute force, O(n^2)
+    want = (w @ rates) / w.sum(axis=1)
+    np.testing.assert_allclose(got, want, rtol=1e-12, atol=1e-20)
+    assert np.isfinite(got).all()
+
+def test_empty_input():
+    empty = np.array([], dtype=np.int64)
+    roll = rolling_funding(empty, empty.astype(float), HOUR)
+    assert roll.count.size == roll.total.size == roll.mean.size == roll.std.size == 0
+    assert ewma_funding(empty, empty.astype(float), HOUR).size == 0
+    assert summarize_arrays([], 8.0).count == 0
+    ts, rates = series_to_arrays([])
+    assert ts.dtype == np.int64 and ts.size == rates.size == 0
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        rolling_funding([2, 1], [0.0, 0.0], HOUR)
+    with pytest.raises(ValueError):
+        ewma_funding([0, 1], [0.0], HOUR)
+    with pytest.raises(ValueError):
+        rolling_funding([0], [0.0], 0)
+
+def test_batch_conversions_match_scalar():
+    rates = np.array([1e-4, -3e-4, 0.0, 2e-3])
+    hours = np.array([8.0, 1.0, 4.0, 8.0])
+    np.testing.assert_allclose(apr_from_periodic_batch(rates, hours),
+                               [apr_from_periodic(r, h) for r, h in zip(rates, hours)], rtol=1e-15)
+    np.testing.assert_allclose(apy_from_periodic_batch(rates, 8.0),
+                               [apy_from_periodic(r, 8.0) for r in rates], rtol=1e-10)
+    series = [FundingPoint(ts_ms=int(i), rate=float(r)) for i, r in enumerate(rates)]
+    a, b = summarize_arrays(rates, 8.0), summarize_history(series, 8.0)
+    assert a.count == b.count and a.mean_apr == pytest.approx(b.mean_apr, rel=1e-15)
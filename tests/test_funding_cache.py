@@ -0,0 +1,90 @@
+# tests/test_funding_cache.py
+import asyncio
+
+from xetrade.exchanges.base import BaseExchange
+from xetrade.models import FundingPoint, Pair
+from xetrade.services.funding_cache import FundingHistoryCache, merge_ranges, missing_ranges
+
+PAIR = Pair.parse("BTC-USDT")
+H8 = 8 * 3600_000
+DAY = 24 * 3600_000
+
+class FakeVenue(BaseExchange):
+    """Settles every 8h on the hour; records every history request."""
+    name = "fake"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def get_best_bid_ask(self, pair):
+        raise NotImplementedError
+
+    async def get_l2_orderbook(self, pair, depth=100):
+        raise NotImplementedError
+
+    async def get_funding_history(self, pair, start_ms, end_ms):
+        self.calls.append((start_ms, end_ms))
+        first = -(-start_ms // H8) * H8
+        return [FundingPoint(ts_ms=ts, rate=ts / 1e15) for ts in range(first, end_ms + 1, H8)]
+
+def test_merge_ranges():
+    assert merge_ranges([]) == []
+    assert merge_ranges([(10, 20), (0, 5)]) == [(0, 5), (10, 20)]
+    assert merge_ranges([(0, 5), (6, 9)]) == [(0, 9)]            # touching
+    assert merge_ranges([(0, 10), (3, 4), (8, 15)]) == [(0, 15)]  # contained and overlapping
+    assert merge_ranges([(5, 5), (5, 5)]) == [(5, 5)]
+
+def test_missing_ranges():
+    assert missing_ranges([], 0, 10) == [(0, 10)]
+    assert missing_ranges([(0, 10)], 0, 10) == []
+    assert missing_ranges([(-5, 20)], 0, 10) == []
+    assert missing_ranges([(3, 5)], 0, 10) == [(0, 2), (6, 10)]
+    assert missing_ranges([(0, 2), (5, 6), (9, 12)], 0, 10) == [(3, 4), (7, 8)]
+    assert missing_ranges([(-10, -1), (11, 20)], 0, 10) == [(0, 10)]  # all outside
+    assert missing_ranges([(0, 4)], 4, 4) == []
+    assert missing_ranges([(0, 4)], 5, 5) == [(5, 5)]
+
+def test_get_history_fetches_only_gaps_and_persists(tmp_path):
+    now = 100 * DAY
+    ex = FakeVenue()
+
+    async def run():
+        cache = FundingHistoryCache(str(tmp_path))
+        first = await cache.get_history(ex, PAIR, 10 * DAY, 20 * DAY, now_ms=now)
+        again = await cache.get_history(ex, PAIR, 12 * DAY, 18 * DAY, now_ms=now)
+        wider = await cache.get_history(ex, PAIR, 5 * DAY, 25 * DAY, now_ms=now)
+        return cache, first, again, wider
+
+    cache, first, again, wider = asyncio.run(run())
+    assert ex.calls == [(10 * DAY, 20 * DAY), (5 * DAY, 10 * DAY - 1), (20 * DAY + 1, 25 * DAY)]
+    assert [p.ts_ms for p in first] == list(range(10 * DAY, 20 * DAY + 1, H8))
+    assert [p.ts_ms for p in again] == list(range(12 * DAY, 18 * DAY + 1, H8))
+    assert [p.ts_ms for p in wider] == list(range(5 * DAY, 25 * DAY + 1, H8))
+    assert cache.coverage("fake", PAIR) == [(5 * DAY, 25 * DAY)]
+    assert cache.stats.full_hits == 1 and cache.stats.fetches == 3
+
+    # a fresh cache on the same directory answers from disk
+    ex.calls.clear()
+    reloaded = FundingHistoryCache(str(tmp_path))
+    series = asyncio.run(reloaded.get_history(ex, PAIR, 5 * DAY, 25 * DAY, now_ms=now))
+    assert ex.calls == []
+    assert series == wider
+
+def test_unsettled_tail_is_refetched(tmp_path):
+    now = 30 * DAY
+    ex = FakeVenue()
+    cache = FundingHistoryCache(str(tmp_path), settle_ms=H8)
+
+    async def run():
+        await cache.get_history(ex, PAIR, 20 * DAY, now, now_ms=now)
+        return await cache.get_history(ex, PAIR, 20 * DAY, now, now_ms=now)
+
+    series = asyncio.run(run())
+    # only history up to now - settle_ms counts as covered; the last period is asked for again
+    assert cache.coverage("fake", PAIR) == [(20 * DAY, now - H8)]
+    assert ex.calls == [(20 * DAY, now), (now - H8 + 1, now)]
+    assert [p.ts_ms for p in series] == list(range(20 * DAY, now + 1, H8))
+
+def test_empty_range():
+    assert asyncio.run(FundingHistoryCache("unused").get_history(FakeVenue(), PAIR, 10, 5)) == []
@@ -0,0 +1,88 @@
+# tests/test_http.py
+import asyncio
+
+from aiohttp import web
+
+from xetrade.utils.http import HTTPClient
+from xetrade.utils.rate_limit import RateLimiter
+
+class _CountingServer:
+    """Local JSON endpoint that answers slowly and counts the requests it gets."""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.requests = 0
+        self._runner = None
+
+    async def _handler(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        return web.json_response({"n": self.requests, "q": request.query.get("q")})
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_get("/", self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        return f"http://127.0.0.1:{self._runner.addresses[0][1]}/"
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+def _client(**kwargs) -> HTTPClient:
+    return HTTPClient(pool_configs={}, rate_limiter=RateLimiter(), **kwargs)
+
+def test_concurrent_identical_gets_share_one_request():
+    server = _CountingServer()
+
+    async def run():
+        client = _client()
+        async with server as url:
+            results = await asyncio.gather(*(client.get_json(url, params={"q": "x"}, pool="t") for _ in range(10)))
+        stats = client.pool_stats()["t"]
+        await client.close()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert server.requests == 1
+    assert results == [{"n": 1, "q": "x"}] * 10
+    assert stats["requests"] == 1 and stats["coalesced"] == 9
+
+def test_cancelled_caller_does_not_cancel_shared_fetch():
+    server = _CountingServer()
+
+    async def run():
+        client = _client()
+        async with server as url:
+            first = asyncio.create_task(client.get_json(url, pool="t"))
+            second = asyncio.create_task(client.get_json(url, pool="t"))
+            await asyncio.sleep(0.02)
+            first.cancel()
+            result = await second
+        await client.close()
+        return first, result
+
+    first, result = asyncio.run(run())
+    assert first.cancelled()
+    assert result == {"n": 1, "q": None}
+    assert server.requests == 1
+
+def test_coalesce_false_bypasses_inflight_and_cache():
+    server = _CountingServer(delay=0.05)
+
+    async def run():
+        client = _client(default_cache_ttl=60.0)
+        async with server as url:
+            await asyncio.gather(*(client.get_json(url, pool="t", coalesce=False) for _ in range(3)))
+            await client.get_json(url, pool="t", coalesce=False)
+            shared = await client.get_json(url, pool="t")
+            cached = await client.get_json(url, pool="t")
+        stats = client.pool_stats()["t"]
+        await client.close()
+        return shared, cached, stats
+
+    shared, cached, stats = asyncio.run(run())
+    assert server.requests == 5  # four uncoalesced + one for the first coalesced call
+    assert cached is shared and stats["cache_hits"] == 1
+    assert stats["coalesced"] == 0
@@ -0,0 +1,74 @@
+# tests/test_paginate_funding.py
+import asyncio
+
+import pytest
+
+from xetrade.exchanges.base import BaseExchange
+from xetrade.models import FundingPoint, Pair
+
+PAIR = Pair.parse("BTC-USDT")
+HOUR = 3600_000
+
+class FakeFundingVenue(BaseExchange):
+    """
+    Settles every 4h while claiming 8h, so windows sized for one page hold
+    about twice the page limit; full pages are cut from the middle, leaving
+    gaps at both ends of the window for the refetch to fill.
+    """
+    name = "fake"
+    funding_interval_hours = 8.0
+    funding_page_limit = 10
+    funding_fetch_concurrency = 4
+
+    def __init__(self, fail_window_start=None):
+        super().__init__()
+        self.fail_window_start = fail_window_start
+        self.calls = []
+        self.completed = 0
+        self.cancelled = 0
+
+    async def get_best_bid_ask(self, pair):
+        raise NotImplementedError
+
+    async def get_l2_orderbook(self, pair, depth=100):
+        raise NotImplementedError
+
+    async def _fetch_funding_page(self, pair, start_ms, end_ms):
+        self.calls.append((start_ms, end_ms))
+        if start_ms == self.fail_window_start:
+            raise RuntimeError("venue error")
+        try:
+            await asyncio.sleep(0.01 if self.fail_window_start is None else 0.2)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.completed += 1
+        first = -(-start_ms // (4 * HOUR)) * 4 * HOUR
+        page = [FundingPoint(ts_ms=ts, rate=ts / 1e15) for ts in range(first, end_ms + 1, 4 * HOUR)]
+        if len(page) > self.funding_page_limit:
+            skip = min(3, len(page) - self.funding_page_limit)
+            page = page[skip:skip + self.funding_page_limit]
+        return page[::-1]  # newest first, as most venues return them
+
+def test_paginate_funding_fills_truncated_pages():
+    ex = FakeFundingVenue()
+    start, end = 0, 30 * 24 * HOUR
+    series = asyncio.run(ex._paginate_funding(PAIR, start, end))
+    ts = [p.ts_ms for p in series]
+    assert ts == list(range(start, end + 1, 4 * HOUR))  # ascending, no gaps, no duplicates
+    assert all(p.rate == p.ts_ms / 1e15 for p in series)
+    assert len(ex.calls) > -(-(end - start) // (9 * 8 * HOUR))  # full pages triggered refetches
+
+def test_paginate_funding_cancels_other_windows_on_failure():
+    ex = FakeFundingVenue(fail_window_start=9 * 8 * HOUR)  # the second window
+
+    async def run():
+        with pytest.raises(RuntimeError, match="venue error"):
+            await ex._paginate_funding(PAIR, 0, 4 * 9 * 8 * HOUR - 1)
+        # checked before asyncio.run's own cleanup would cancel any stragglers
+        return len(ex.calls), ex.completed, ex.cancelled
+
+    assert asyncio.run(run()) == (4, 0, 3)
+
+def test_paginate_funding_empty_range():
+    assert asyncio.run(FakeFundingVenue()._paginate_funding(PAIR, 10, 5)) == []
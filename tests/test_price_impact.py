@@ -0,0 +1,77 @@
+# tests/test_price_impact.py
+import math
+import random
+
+import numpy as np
+import pytest
+
+from xetrade.models import ColumnarOrderBook, Level, OrderBook
+from xetrade.services.price_impact import impact_curve, price_impact_pct, walk_book, walk_book_batch
+
+def _random_book(rng: random.Random) -> OrderBook:
+    mid = rng.uniform(0.01, 50_000)
+    tick = mid * 1e-4
+    def side(sign):
+        n = rng.randint(1, 60)
+        # some empty levels, as venues send qty 0 for removed prices
+        return [Level(price=mid + sign * tick * (i + 1), qty=0.0 if rng.random() < 0.05 else rng.uniform(0.0, 20.0))
+                for i in range(n)]
+    return OrderBook(bids=side(-1), asks=side(1), ts_ms=0)
+
+def _sizes(book: OrderBook, side, rng: random.Random):
+    levels = book.asks if side == "buy" else book.bids
+    caps = np.cumsum([lvl.price * lvl.qty for lvl in levels])
+    depth = float(caps[-1]) if caps[-1] > 0 else 1.0
+    sizes = [rng.uniform(1e-6, 1.5 * depth) for _ in range(20)]
+    sizes += [float(c) for c in caps if c > 0][:5]  # exactly on a level boundary
+    sizes.append(2 * depth)  # more than the book holds
+    return sizes
+
+def _same(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+def test_batch_matches_scalar_walk_exactly():
+    rng = random.Random(6)
+    for _ in range(300):
+        book = _random_book(rng)
+        for side in ("buy", "sell"):
+            sizes = _sizes(book, side, rng)
+            avg, filled = walk_book_batch(book, side, sizes)
+            for i, size in enumerate(sizes):
+                s_avg, s_filled = walk_book(book, side, size)
+                assert _same(float(avg[i]), s_avg) and float(filled[i]) == s_filled, (side, size)
+            # ColumnarOrderBook input goes through the array path and must agree too
+            c_avg, c_filled = walk_book(ColumnarOrderBook.from_orderbook(book), side, sizes[0])
+            assert _same(c_avg, float(avg[0])) and c_filled == float(filled[0])
+
+def test_insufficient_depth_fills_what_is_there():
+    book = OrderBook(bids=[Level(99.0, 1.0)], asks=[Level(100.0, 1.0), Level(101.0, 2.0)], ts_ms=0)
+    avg, filled = walk_book(book, "buy", 10_000.0)
+    assert filled == 3.0
+    assert avg == pytest.approx((100.0 + 202.0) / 3.0)
+    b_avg, b_filled = walk_book_batch(book, "buy", [10_000.0, 150.0])
+    assert b_filled.tolist() == [3.0, 1.0 + 50.0 / 101.0]
+    assert b_avg[0] == avg
+
+def test_empty_book_side():
+    book = OrderBook(bids=[], asks=[Level(100.0, 1.0)], ts_ms=0)
+    avg, filled = walk_book(book, "sell", 50.0)
+    assert math.isnan(avg) and filled == 0.0
+    b_avg, b_filled = walk_book_batch(book, "sell", [50.0, 100.0])
+    assert np.isnan(b_avg).all() and (b_filled == 0.0).all()
+    assert math.isnan(price_impact_pct(book, "sell", 50.0))
+
+def test_impact_curve_matches_price_impact_pct():
+    book = _random_book(random.Random(1))
+    sizes = [10.0, 1_000.0, 100_000.0]
+    curves = impact_curve(book, sizes)
+    for side in ("buy", "sell"):
+        for size, pct in zip(sizes, curves[side].impact_pct):
+            assert _same(float(pct), price_impact_pct(book, side, size))
+
+def test_non_positive_size_rejected():
+    book = _random_book(random.Random(2))
+    with pytest.raises(ValueError):
+        walk_book(book, "buy", 0.0)
+    with pytest.raises(ValueError):
+        walk_book_batch(book, "buy", [1.0, -1.0])
@@ -0,0 +1,52 @@
+# tests/test_s3_upload.py
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from xetrade.utils.s3_local import LocalS3
+from xetrade.utils.s3_upload import MultipartUploader, S3UploadError
+
+PART = 1024
+
+def _uploader(s3, **kwargs):
+    return MultipartUploader(s3, "bucket", part_size=PART, backoff=0.0, min_part_size=PART, **kwargs)
+
+def test_part_size_below_s3_minimum_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        MultipartUploader(LocalS3(str(tmp_path)), "bucket", part_size=PART)
+
+def test_multipart_round_trip(tmp_path):
+    s3 = LocalS3(str(tmp_path), min_part_size=PART)
+    data = os.urandom(PART * 3 + 100)
+    up = _uploader(s3)
+    result = asyncio.run(up.upload_bytes("a/b.parquet", data))
+    body = s3.get_object(Bucket="bucket", Key="a/b.parquet")["Body"].read()
+    assert body == data
+    assert result.parts == 4
+    digests = b"".join(hashlib.md5(data[i:i + PART]).digest() for i in range(0, len(data), PART))
+    assert result.etag == f"{hashlib.md5(digests).hexdigest()}-4"
+    assert up.stats.multipart == 1 and up.stats.retries == 0
+
+def test_corrupted_part_is_retried(tmp_path):
+    s3 = LocalS3(str(tmp_path), min_part_size=PART)
+    s3.corrupt_next_parts(2)
+    data = os.urandom(PART * 2 + 1)
+    up = _uploader(s3)
+    asyncio.run(up.upload_bytes("k", data))
+    assert s3.get_object(Bucket="bucket", Key="k")["Body"].read() == data
+    assert up.stats.checksum_mismatches == 2
+    assert up.stats.retries == 2
+    assert up.stats.failures == 0
+
+def test_persistent_failure_aborts_upload(tmp_path):
+    s3 = LocalS3(str(tmp_path), min_part_size=PART)
+    s3.fail_next_parts(100)
+    up = _uploader(s3, max_retries=2)
+    with pytest.raises(S3UploadError):
+        asyncio.run(up.upload_bytes("k", os.urandom(PART * 3)))
+    assert s3.pending_uploads() == []
+    assert s3.calls.get("abort_multipart_upload") == 1
+    assert s3.calls.get("complete_multipart_upload") is None
+    assert up.stats.failures == 1
@@ -0,0 +1,131 @@
+# tests/test_streaming.py
+import asyncio
+
+from xetrade.exchanges.binance import Binance
+from xetrade.exchanges.kucoin import KuCoin
+from xetrade.exchanges.okx import OKX, okx_checksum
+from xetrade.models import BookDelta, Pair
+from xetrade.services.streaming import OrderBookStream
+from xetrade.utils.http import http
+from xetrade.utils.ws_replay import ReplayWebSocketServer
+
+PAIR = Pair.parse("BTC-USDT")
+
+def _okx_frame(action, bids, asks, seq, prev, checksum):
+    return {
+        "arg": {"channel": "books", "instId": "BTC-USDT"},
+        "action": action,
+        "data": [{"bids": [[p, q, "0", "1"] for p, q in bids], "asks": [[p, q, "0", "1"] for p, q in asks],
+                  "ts": "1700000000000", "seqId": seq, "prevSeqId": prev, "checksum": checksum}],
+    }
+
+async def _collect(stream, n):
+    books = []
+    async for book in stream:
+        books.append(book)
+        if len(books) == n:
+            stream.close()
+            break
+    await http.close()
+    return books
+
+def test_okx_checksum_verified_then_mismatch_resubscribes():
+    snap_bids, snap_asks = [("100.0", "1")], [("101.0", "2")]
+    good = okx_checksum([("100.5", "3"), ("100.0", "1")], [("101.0", "2")])
+    frames = [
+        _okx_frame("snapshot", snap_bids, snap_asks, 10, -1, okx_checksum(snap_bids, snap_asks)),
+        _okx_frame("update", [("100.5", "3")], [], 11, 10, good),
+        _okx_frame("update", [("100.4", "1")], [], 12, 11, good),  # stale checksum: mismatch
+    ]
+
+    async def run():
+        async with ReplayWebSocketServer(frames) as url:
+            stream = OrderBookStream(OKX(), PAIR, 25, ws_url=url, reconnect_backoff=0.01)
+            # snapshot + good update, then the mismatch forces a resubscribe and a fresh snapshot
+            books = await _collect(stream, 3)
+        return stream, books
+
+    stream, books = asyncio.run(run())
+    assert books[1].best_bid() == 100.5
+    assert books[2].best_bid() == 100.0  # the book was rebuilt from the replayed snapshot
+    assert stream.stats.checksums_verified == 3  # snapshot, update, snapshot after resubscribe
+    assert stream.stats.checksum_mismatches == 1
+    assert stream.stats.resyncs == 1
+
+def _depth_update(first, last, bids):
+    return {"e": "depthUpdate", "E": 1700000000000, "s": "BTCUSDT", "U": first, "u": last,
+            "b": [[p, q] for p, q in bids], "a": []}
+
+def test_binance_buffered_deltas_resync_when_snapshot_is_too_old():
+    frames = [
+        _depth_update(105, 106, [("99.5", "1")]),
+        _depth_update(107, 108, [("99.8", "2")]),
+        _depth_update(109, 110, [("99.9", "3")]),
+    ]
+    snapshots = [100, 106]  # the first snapshot predates the buffered deltas: a gap
+
+    async def snapshot():
+        return BookDelta(bids=[(99.0, 1.0)], asks=[(101.0, 1.0)], ts_ms=1700000000000,
+                         is_snapshot=True, last_seq=snapshots.pop(0))
+
+    async def run():
+        async with ReplayWebSocketServer(frames, interval=0.05) as url:
+            stream = OrderBookStream(Binance(), PAIR, 20, ws_url=url, snapshot=snapshot)
+            books = await _collect(stream, 2)
+        return stream, books
+
+    stream, books = asyncio.run(run())
+    assert stream.stats.gaps == 1
+    assert stream.stats.resyncs == 1
+    assert stream.stats.updates_applied == 2
+    assert snapshots == []
+    # 105-106 is covered by the second snapshot and never applied
+    assert [lvl.price for lvl in books[-1].bids] == [99.9, 99.8, 99.0]
+
+def _l2update(start, end, bids):
+    return {"type": "message", "topic": "/market/level2:BTC-USDT", "subject": "trade.l2update",
+            "data": {"sequenceStart": start, "sequenceEnd": end, "symbol": "BTC-USDT", "time": 1700000000000,
+                     "changes": {"bids": [[p, q, str(seq)] for p, q, seq in bids], "asks": []}}}
+
+def test_kucoin_drops_rows_already_in_snapshot():
+    frames = [
+        # straddles the snapshot (seq 105): row 104 is already in it, row 106 is not
+        _l2update(104, 106, [("99.0", "5", 104), ("99.5", "2", 106)]),
+        _l2update(107, 107, [("99.8", "1", 107)]),
+    ]
+
+    async def snapshot():
+        return BookDelta(bids=[(99.0, 1.0)], asks=[(101.0, 1.0)], ts_ms=1700000000000,
+                         is_snapshot=True, last_seq=105)
+
+    async def run():
+        async with ReplayWebSocketServer(frames, interval=0.05) as url:
+            stream = OrderBookStream(KuCoin(), PAIR, 20, ws_url=url, snapshot=snapshot)
+            books = await _collect(stream, 2)
+        return stream, books
+
+    stream, books = asyncio.run(run())
+    assert stream.stats.gaps == 0
+    assert stream.stats.updates_applied == 2
+    # 99.0 keeps the snapshot size instead of the older 5 from row 104
+    assert [(lvl.price, lvl.qty) for lvl in books[-1].bids] == [(99.8, 1.0), (99.5, 2.0), (99.0, 1.0)]
+
+def test_recorded_frames_replay_identically(tmp_path):
+    path = str(tmp_path / "binance.jsonl")
+    frames = [_depth_update(101, 102, [("99.5", "1")]), _depth_update(103, 104, [("99.8", "2")])]
+
+    async def snapshot():
+        return BookDelta(bids=[(99.0, 1.0)], asks=[(101.0, 1.0)], ts_ms=1700000000000,
+                         is_snapshot=True, last_seq=100)
+
+    async def run(server, **kwargs):
+        async with server as url:
+            stream = OrderBookStream(Binance(), PAIR, 20, ws_url=url, snapshot=snapshot, **kwargs)
+            books = await _collect(stream, 2)
+        return stream, books
+
+    recorder, live = asyncio.run(run(ReplayWebSocketServer(frames, interval=0.05), record_path=path))
+    assert recorder._record_file is None  # closed with the stream
+    replayer, replayed = asyncio.run(run(ReplayWebSocketServer.from_file(path, interval=0.05)))
+    assert replayer.stats.frames == recorder.stats.frames == 2
+    assert [b.bids for b in replayed] == [b.bids for b in live]
@@ -0,0 +1,102 @@
+# tests/test_symbol_mapper.py
+import itertools
+import pickle
+import random
+import re
+
+from xetrade.utils.symbol_mapper import UniversalSymbolMapper, map_instruments
+
+def _replace_normalize(mapper, symbol):
+    """normalize_symbol as it was before the regexes: one str.replace per token."""
+    s = symbol.upper().strip()
+    for noise in mapper.exchange_noise:
+        s = s.replace(noise, "")
+    for sep in mapper.separators:
+        s = s.replace(sep, "-")
+    for flag in mapper.contract_flags:
+        s = s.replace(f"-{flag}", "").replace(flag, "")
+    s = re.sub(r'-+', '-', s)
+    return s.strip('-')
+
+def _corpus(n=20_000, seed=7):
+    bases = ["BTC", "ETH", "1000BONK", "XBT", "SOLANA", "PERPX", "FUTU", "SPOTT", ""]
+    quotes = ["USDT", "USD", "USDC", "BTC", "EUR", "XYZ", ""]
+    seps = ["", "-", "_", "/", "--"]
+    flags = ["", "PERP", "SWAP", "FUT", "QUARTERLY", "SPOT"]
+    noise = ["", "SPOT:", "FUTURES:", ".P", ":USDT"]
+    venues = ["", "BINANCE", "OKX", "BYBIT"]
+    # separator + noise, the cases where flag matching could cut into the noise
+    fixed = ["BINANCE-FUTURES:BTCUSDT", "OKX_SPOT:ETHUSDT", "BTC/SPOT:", "BTC-USDT-SWAP", "BTCUSDT.P",
+             "ETH_USDT_PERP", "BTC-USD-FUTURES:", "FUTURES:BTC-PERP", "btc/usdt:usdt", " sol-usdc-spot "]
+    fixed += [f"{v}{sep}{n}{b}{q}" for v, sep, n, b, q in itertools.product(venues, seps, noise, bases[:3], quotes[:2])]
+    rng = random.Random(seed)
+    out = list(fixed)
+    for _ in range(n):
+        parts = [rng.choice(venues), rng.choice(seps), rng.choice(noise), rng.choice(bases), rng.choice(seps),
+                 rng.choice(quotes), rng.choice(seps), rng.choice(flags), rng.choice(noise)]
+        sym = "".join(parts)
+        out.append(sym.lower() if rng.random() < 0.1 else sym)
+    return out
+
+def test_normalize_matches_str_replace():
+    mapper = UniversalSymbolMapper()
+    mismatches = [(s, mapper.normalize_symbol(s), _replace_normalize(mapper, s))
+                  for s in _corpus() if mapper.normalize_symbol(s) != _replace_normalize(mapper, s)]
+    assert mismatches == []
+
+def test_separator_before_noise():
+    mapper = UniversalSymbolMapper()
+    assert mapper.normalize_symbol("BINANCE-FUTURES:BTCUSDT") == "BINANCE-BTCUSDT"
+    assert mapper.normalize_symbol("OKX_SPOT:ETHUSDT") == "OKX-ETHUSDT"
+    assert mapper.map_symbol("BTC/SPOT:").universal_symbol == "/BTC"
+
+def test_caret_noise_removed_whole():
+    # the one intended difference: '^SPOT:' used to leave a stray '^'
+    mapper = UniversalSymbolMapper()
+    assert mapper.normalize_symbol("^SPOT:BTCUSDT") == "BTCUSDT"
+    assert mapper.map_symbol("^SPOT:BTCUSDT").universal_symbol == "BTC/USD"
+
+class _AliasedMapper(UniversalSymbolMapper):
+    """Per-instance aliases: the pool path must use this instance's tables, not fresh defaults."""
+
+    def __init__(self, extra_aliases=None, **kwargs):
+        super().__init__(**kwargs)
+        self.asset_aliases = {**self.asset_aliases, **(extra_aliases or {})}
+        self._freeze()
+
+INSTRUMENTS = {
+    "binance": ["BTCUSDT", "ETHUSDT", "1000BONKUSDT", "BTCUSDT", "NOQUOTE"],
+    "okx": ["BTC-USDT-SWAP", "ETH-USDC", "XBT-USD"],
+}
+
+def test_map_instruments_matches_map_symbol():
+    mapper = UniversalSymbolMapper()
+    table = map_instruments(INSTRUMENTS, processes=1, mapper=mapper)
+    assert len(table) == 8
+    for i, (exchange, sym) in enumerate(zip(table.exchange, table.exchange_symbol)):
+        m = mapper.map_symbol(sym, exchange)
+        assert (table.universal[i], table.base[i], table.quote[i]) == (m.universal_symbol, m.base_asset, m.quote_asset)
+        assert table.confidence[i] == m.confidence
+        assert bool(table.parsed[i]) == ("error" not in m.metadata)
+        assert table.multiplier[i] == m.metadata.get("multiplier", 1)
+
+def test_reverse_index():
+    index = map_instruments(INSTRUMENTS, processes=1).reverse_index()
+    assert index["BTC/USD"] == {"binance": ["BTCUSDT", "BTCUSDT"], "okx": ["BTC-USDT-SWAP", "XBT-USD"]}
+    assert index["BONK/USD"] == {"binance": ["1000BONKUSDT"]}
+    assert "NOQUOTE" not in index  # unparsed rows are left out
+    assert map_instruments(INSTRUMENTS, processes=1).reverse_index(min_confidence=2.0) == {}
+
+def test_process_pool_matches_serial_and_keeps_custom_tables():
+    mapper = _AliasedMapper({"XBT": "ETH"})
+    serial = map_instruments(INSTRUMENTS, processes=1, mapper=mapper)
+    pooled = map_instruments(INSTRUMENTS, processes=2, parallel_min=1, mapper=mapper)
+    assert pooled.universal == serial.universal
+    assert pooled.exchange_symbol == serial.exchange_symbol
+    assert (pooled.confidence == serial.confidence).all()
+    assert pooled.universal[serial.exchange_symbol.index("XBT-USD")] == "ETH/USD"
+
+def test_mapper_pickles_with_its_tables():
+    clone = pickle.loads(pickle.dumps(_AliasedMapper({"XBT": "ETH"})))
+    assert clone.map_symbol("XBTUSDT").universal_symbol == "ETH/USD"
+    assert clone.cache_info().currsize == 1